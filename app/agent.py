@@ -1,18 +1,40 @@
+import contextvars
 import datetime
 import time
 import threading
-from typing import Any, Dict, List, Callable
-from openai import OpenAI
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Callable, Optional, Tuple
+from openai import OpenAI, DefaultHttpxClient, NotFoundError
 import os
 import json
+import re
+import socket
+import uuid
 import logging
 from dotenv import load_dotenv
 from .core.config import settings
 from .repositories.twilio_repository import TwilioRepository
-from .db.session import get_db
+from .db.session import SessionLocal
 from sqlalchemy.orm import Session
-from fastapi import Depends
-from .schemas.thread import ThreadCreate
+from .utils.cache_util import TTLCache
+from .utils.deadline_util import (
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_scope,
+    remaining_timeout,
+)
+from .utils.http_util import ConnectionReuseTracker, pool_limits
+from .utils.lock_util import KeyedLockRegistry
+from .utils.metrics_util import metrics
+from .utils.tool_output_util import serialize_tool_output
+from .repositories.conversation_lease_repository import ConversationLeaseRepository
+from .services.active_run_service import active_run_registry
+from .services.run_poller_service import run_poller
+from .services.thread_lifecycle_service import thread_lifecycle
+from .services.thread_pool_service import thread_pool
+from .services.turn_checkpoint_service import TurnCheckpoint
 
 load_dotenv()
 
@@ -26,114 +48,413 @@ logger = logging.getLogger(__name__)
 # user_threads: Dict[str, str] = {}  # Store thread IDs for each user
 # active_runs: Dict[str, str] = {}  # Track active runs for each thread
 
-# Add global locks for thread-safe operations
-threads_lock = threading.RLock()  # For user_threads dict
-runs_lock = threading.RLock()  # For active_runs dict
+# One lock per mobile number: turns of the same user are serialized,
+# unrelated users never contend
+conversation_locks = KeyedLockRegistry("conversation_locks")
+_lease_identity = f"{socket.gethostname()}:{os.getpid()}"
+# mobile number -> OpenAI thread ID; the Threads table is the source of truth.
+# Entries expire so that threads rotated or collected by another process are
+# picked up
+thread_cache = TTLCache(
+    maxsize=settings.THREAD_CACHE_SIZE,
+    ttl=settings.THREAD_CACHE_TTL_SECONDS,
+    name="thread_cache",
+)
+
+# Process-wide OpenAI client and assistant manager
+_singleton_lock = threading.RLock()
+_openai_client: Optional[OpenAI] = None
+_assistant_manager: Optional["AssistantManager"] = None
+openai_connection_tracker = ConnectionReuseTracker("openai.http")
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_BLOCKING_RUN_RE = re.compile(r"(?:while a run|already has an active run) (run_\w+)")
+# How long to wait for a cancelled blocking run to stop
+BLOCKING_RUN_CANCEL_WAIT_SECONDS = 10
+
+# Tools with side effects; they run one at a time, in the order requested
+WRITE_TOOLS = {"bookappointment", "cancelappointment", "updateprofile", "store_profile"}
+# Also run one at a time: getProfile stores the profile it fetched locally
+SERIALIZED_TOOLS = WRITE_TOOLS | {"getprofile"}
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Return the bounded executor that runs tool calls of all conversations."""
+    global _tool_executor
+    if _tool_executor is None:
+        with _singleton_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=settings.TOOL_EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="tool",
+                )
+    return _tool_executor
+
+
+def acquire_conversation_lease(user_id: str) -> Optional[str]:
+    """
+    Take the cross-process lease on a user's conversation when
+    ``CONVERSATION_LEASE_ENABLED`` is set, waiting up to
+    ``CONVERSATION_LOCK_TIMEOUT_SECONDS``. Returns the owner token to release
+    with, or None when leases are disabled.
+    """
+    if not settings.CONVERSATION_LEASE_ENABLED:
+        return None
+    owner = f"{_lease_identity}:{uuid.uuid4().hex[:8]}"
+    deadline = time.time() + settings.CONVERSATION_LOCK_TIMEOUT_SECONDS
+    wait = 0.2
+    while True:
+        db = SessionLocal()
+        try:
+            acquired = ConversationLeaseRepository(db).acquire(
+                user_id, owner, settings.CONVERSATION_LEASE_SECONDS
+            )
+        finally:
+            db.close()
+        if acquired:
+            return owner
+        if time.time() >= deadline:
+            raise TimeoutError(f"Conversation for {user_id} is busy in another worker")
+        metrics.increment("conversation_leases.contended")
+        time.sleep(wait)
+        wait = min(2.0, wait * 2)
+
+
+def release_conversation_lease(user_id: str, owner: Optional[str]) -> None:
+    if owner is None:
+        return
+    db = SessionLocal()
+    try:
+        ConversationLeaseRepository(db).release(user_id, owner)
+    except Exception as e:
+        logger.error(f"Error releasing conversation lease for {user_id}: {e}")
+    finally:
+        db.close()
+
+
+def blocking_run_id(error: Exception) -> Optional[str]:
+    """
+    Run ID named by OpenAI's "while a run ... is active" or "already has an
+    active run" error, if any.
+    """
+    match = _BLOCKING_RUN_RE.search(str(error))
+    return match.group(1) if match else None
+
+
+def is_write_tool(tool_call: Any) -> bool:
+    return tool_call.function.name.lower() in WRITE_TOOLS
+
+
+def runs_serialized(tool_call: Any) -> bool:
+    return tool_call.function.name.lower() in SERIALIZED_TOOLS
+
+
+def write_calls(
+    tool_calls: List[Any], outputs: List[Dict[str, str]]
+) -> Tuple[List[Any], List[Dict[str, str]]]:
+    """The write tool calls among ``tool_calls`` with their outputs."""
+    writes = [
+        (tool_call, output)
+        for tool_call, output in zip(tool_calls, outputs)
+        if is_write_tool(tool_call)
+    ]
+    return [tool_call for tool_call, _ in writes], [output for _, output in writes]
+
+
+def tool_skipped_output(tool_call: Any) -> Dict[str, str]:
+    """Output for a serialized call not run because an earlier one timed out."""
+    message = (
+        f"{tool_call.function.name} was not run because an earlier step did not "
+        "finish in time. Check the outcome of that step before retrying."
+    )
+    return {
+        "tool_call_id": tool_call.id,
+        "output": json.dumps({"status": "error", "message": message}),
+    }
+
+
+def tool_timeout_output(tool_call: Any, timeout: float) -> Dict[str, str]:
+    """Output submitted for a tool call that did not finish within ``timeout``."""
+    logger.error(f"Tool {tool_call.function.name} timed out after {timeout}s")
+    metrics.increment("tools.timeouts")
+    message = f"{tool_call.function.name} did not respond within {timeout:.0f} seconds."
+    if is_write_tool(tool_call):
+        # The call may still complete in the background
+        message += " Its outcome is unknown; check before retrying."
+    return {
+        "tool_call_id": tool_call.id,
+        "output": json.dumps({"status": "error", "message": message}),
+    }
+
+
+def get_openai_client() -> OpenAI:
+    """Return the shared OpenAI client backed by one pooled keep-alive httpx client."""
+    global _openai_client
+    if _openai_client is None:
+        with _singleton_lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=settings.OPENAI_REQUEST_TIMEOUT_SECONDS,
+                    max_retries=settings.OPENAI_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(
+                        limits=pool_limits(
+                            settings.OPENAI_MAX_CONNECTIONS,
+                            settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                            settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                        ),
+                        event_hooks={
+                            "response": [openai_connection_tracker.on_response]
+                        },
+                    ),
+                )
+    return _openai_client
+
+
+def get_assistant_manager() -> "AssistantManager":
+    """Return the process-wide AssistantManager, creating it on first use."""
+    global _assistant_manager
+    if _assistant_manager is None:
+        with _singleton_lock:
+            if _assistant_manager is None:
+                _assistant_manager = AssistantManager(
+                    settings.OPENAI_API_KEY, settings.OPENAI_ASSISTANT_ID
+                )
+    return _assistant_manager
 
 
 class AssistantManager:
-    def __init__(self, api_key: str, assistant_id: str, db: Session = Depends(get_db)):
+    """
+    Runs assistant conversations. A single instance is shared by all worker
+    threads (see ``get_assistant_manager``): it holds no per-request state and
+    opens a short-lived database session for every repository call.
+    """
+
+    def __init__(self, api_key: str, assistant_id: str, db: Session = None):
         """Initialize the AssistantManager with API key and assistant ID."""
-        self.client = OpenAI(api_key=api_key)
+        if api_key == settings.OPENAI_API_KEY:
+            self.client = get_openai_client()
+        else:
+            self.client = OpenAI(api_key=api_key)
         self.assistant_id = assistant_id
-        self.twilio_repo = TwilioRepository(db)
         # Cache function mappings to avoid recreating on each tool call
         self._function_mapping = None
+        self._function_mapping_lock = threading.Lock()
+
+    @contextmanager
+    def _twilio_repo(self):
+        """Yield a TwilioRepository bound to a short-lived session."""
+        db = SessionLocal()
+        try:
+            yield TwilioRepository(db)
+        finally:
+            db.close()
+
+    @contextmanager
+    def conversation_guard(self, user_id: str):
+        """Serialize turns of one user in this process and, with leases, across workers."""
+        with conversation_locks.hold(
+            user_id, timeout=settings.CONVERSATION_LOCK_TIMEOUT_SECONDS
+        ):
+            owner = acquire_conversation_lease(user_id)
+            try:
+                yield
+            finally:
+                release_conversation_lease(user_id, owner)
 
     def get_or_create_thread(self, user_id: str) -> str:
         """Get existing thread for user or create new one."""
-        with threads_lock:
-            logger.info(f"Checking existing thread for user: {user_id}")
-            existing_thread = self.twilio_repo.get_thread_by_number(user_id)
-            if existing_thread:
-                logger.info(f"Found existing thread: {existing_thread.thread_id}")
-                return existing_thread.thread_id
-
-            logger.info(f"Creating new thread for user: {user_id}")
-            thread = self.client.beta.threads.create()
-            self.twilio_repo.create_thread(
-                ThreadCreate(mobile_number=user_id, thread_id=thread.id)
+        existing_thread_id = self._find_thread_id(user_id) or self._adopt_pooled_thread(
+            user_id
+        )
+        if existing_thread_id:
+            return existing_thread_id
+
+        logger.info(f"Creating new thread for user: {user_id}")
+        thread = self.client.beta.threads.create()
+        thread_id = self._save_thread(user_id, thread.id)
+        if thread_id != thread.id:
+            self._discard_thread(thread.id)
+        return thread_id
+
+    def _find_thread_id(self, user_id: str) -> Optional[str]:
+        """Look up the thread ID for a user, from the cache or the database."""
+        thread_id = thread_cache.get(user_id)
+        if thread_id:
+            return thread_id
+        logger.info(f"Checking existing thread for user: {user_id}")
+        with self._twilio_repo() as twilio_repo:
+            existing_thread = twilio_repo.get_thread_by_number(user_id)
+        if existing_thread:
+            logger.info(f"Found existing thread: {existing_thread.thread_id}")
+            thread_cache.set(user_id, existing_thread.thread_id)
+            return existing_thread.thread_id
+        return None
+
+    def _reload_thread_id(self, user_id: str) -> Optional[str]:
+        """Drop the cached thread ID of a user and read it from the database."""
+        thread_cache.pop(user_id)
+        return self._find_thread_id(user_id)
+
+    def _save_thread(self, user_id: str, thread_id: str) -> str:
+        """Store a new thread for a user and return the thread ID that won."""
+        with self._twilio_repo() as twilio_repo:
+            thread_id = twilio_repo.create_thread_if_absent(user_id, thread_id)
+        thread_cache.set(user_id, thread_id)
+        return thread_id
+
+    def _adopt_pooled_thread(self, user_id: str) -> Optional[str]:
+        """Assign a pre-created thread from the pool to a new user, if any."""
+        pooled_thread_id = thread_pool.take()
+        if not pooled_thread_id:
+            return None
+        logger.info(f"Using pre-created thread {pooled_thread_id} for user: {user_id}")
+        thread_id = self._save_thread(user_id, pooled_thread_id)
+        if thread_id != pooled_thread_id:
+            self._discard_thread(pooled_thread_id)
+        return thread_id
+
+    def _save_new_stream_thread(self, user_id: str, thread_id: str) -> None:
+        """Store the thread created by a streamed createAndRun."""
+        stored_thread_id = self._save_thread(user_id, thread_id)
+        if stored_thread_id != thread_id:
+            # The run is already streaming on the new thread; finish the turn
+            # there and continue on the stored thread from the next message
+            logger.warning(
+                f"Thread for {user_id} was created concurrently, {thread_id} is used for this turn only"
             )
-            return thread.id
+
+    def _discard_thread(self, thread_id: str) -> None:
+        """Delete an OpenAI thread that lost the creation race."""
+        try:
+            self.client.beta.threads.delete(thread_id)
+        except Exception as e:
+            logger.warning(f"Could not delete unused thread {thread_id}: {e}")
 
     def get_active_run(self, thread_id: str) -> str:
         """Retrieve active run ID for a thread."""
-        with runs_lock:
-            run_id = self.twilio_repo.get_active_run(thread_id)
-            logger.info(f"Active run for thread {thread_id}: {run_id}")
-            return run_id
+        return active_run_registry.get(thread_id)
 
     def store_active_run(self, thread_id: str, run_id: str) -> None:
         """Store the active run for a thread."""
-        with runs_lock:
-            logger.info(f"Storing active run {run_id} for thread {thread_id}")
-            self.twilio_repo.store_active_run(thread_id, run_id)
+        logger.info(f"Storing active run {run_id} for thread {thread_id}")
+        active_run_registry.store(thread_id, run_id)
 
     def delete_active_run(self, thread_id: str) -> None:
         """Delete active run when completed or failed."""
-        with runs_lock:
-            logger.info(f"Deleting active run for thread {thread_id}")
-            self.twilio_repo.delete_active_run(thread_id)
+        logger.info(f"Deleting active run for thread {thread_id}")
+        active_run_registry.delete(thread_id)
 
     def cleanup_active_run(self, thread_id: str) -> None:
         """Clean up any existing active run for a thread."""
-        with runs_lock:
-            run_id = self.get_active_run(thread_id)
-            if run_id:
-                try:
-                    run = self.client.beta.threads.runs.retrieve(
+        run_id = self.get_active_run(thread_id)
+        if run_id:
+            try:
+                run = self.client.beta.threads.runs.retrieve(
+                    thread_id=thread_id, run_id=run_id
+                )
+                if run.status in ["queued", "in_progress", "requires_action"]:
+                    self.client.beta.threads.runs.cancel(
                         thread_id=thread_id, run_id=run_id
                     )
-                    if run.status in ["queued", "in_progress", "requires_action"]:
-                        self.client.beta.threads.runs.cancel(
-                            thread_id=thread_id, run_id=run_id
-                        )
-                except Exception as e:
-                    logger.error(f"Error cleaning up run: {e}")
-                finally:
-                    self.delete_active_run(thread_id)
+            except Exception as e:
+                logger.error(f"Error cleaning up run: {e}")
+            finally:
+                self.delete_active_run(thread_id)
 
-    def add_message_to_thread(self, user_id: str, question: str) -> None:
-        """Add a message to the user's thread with active run check."""
-        thread_id = self.get_or_create_thread(user_id)
-        logger.debug(f"thread {thread_id} for user {user_id} and question: {question} ")
+    def cancel_blocking_run(self, thread_id: str, error: Exception) -> bool:
+        """
+        Cancel a run this process does not know about (e.g. left behind by a
+        crashed worker) when OpenAI rejects a request because of it, and wait
+        until it has stopped. Returns False when ``error`` names no run.
+        """
+        run_id = blocking_run_id(error)
+        if not run_id:
+            return False
+        logger.warning(f"Cancelling run {run_id} blocking thread {thread_id}")
+        metrics.increment("openai.blocking_runs_cancelled")
+        try:
+            client = self._budgeted_client("cancelling a blocking run")
+            client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            run_poller.wait(
+                client,
+                thread_id,
+                run_id,
+                remaining_timeout(
+                    BLOCKING_RUN_CANCEL_WAIT_SECONDS, "cancelling a blocking run"
+                ),
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as cancel_error:
+            logger.error(f"Failed to cancel blocking run {run_id}: {cancel_error}")
+        return True
 
+    @staticmethod
+    def _with_timestamp(question: str) -> str:
+        """Append the current date and time so the assistant can resolve 'tomorrow'."""
         current_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        question = f"{question}\n\n(Current Date and Time: {current_datetime})"
+        return f"{question}\n\n(Current Date and Time: {current_datetime})"
 
-        # Optimized retry logic with shorter initial delay
-        max_retries = 3
-        retry_delay = 0.5
+    def record_exchange(self, user_id: str, question: str, answer: str) -> None:
+        """
+        Append a turn answered without a run (see ``intent_router_util``) to
+        the user's thread, so later runs can refer to it.
+        """
+        with self.conversation_guard(user_id):
+            self._append_exchange(user_id, question, answer)
 
-        for attempt in range(max_retries):
-            try:
-                self.client.beta.threads.messages.create(
-                    thread_id=thread_id, role="user", content=question
-                )
-                return
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    logger.warning(
-                        f"Retry {attempt + 1}/{max_retries} adding message: {e}"
-                    )
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    logger.error(
-                        f"Failed to add message after {max_retries} attempts: {e}"
-                    )
-                    raise
+    def _append_exchange(self, user_id: str, question: str, answer: str) -> None:
+        thread_id = self._find_thread_id(user_id)
+        if not thread_id:
+            # Nothing to continue yet; the first run starts a fresh thread
+            return
+        try:
+            client = self._budgeted_client("recording the exchange")
+            client.beta.threads.messages.create(
+                thread_id=thread_id, role="user", content=self._with_timestamp(question)
+            )
+            client.beta.threads.messages.create(
+                thread_id=thread_id, role="assistant", content=answer
+            )
+            thread_lifecycle.record_turn(thread_id, user_id, None)
+        except Exception as e:
+            logger.warning(f"Could not record the exchange for {user_id}: {e}")
+
+    def run_conversation(
+        self, user_id: str, question: str, turn_id: Optional[str] = None
+    ) -> str:
+        """
+        Run a conversation turn with thread safety and optimized error handling.
+
+        Progress is checkpointed (see ``TurnCheckpoint``): a retry, or a
+        redelivery of the same ``turn_id`` after a crash, resumes the run that
+        already carries the user's message and reuses tool outputs that were
+        already produced instead of posting and executing them again.
+
+        The turn runs within the caller's deadline, or a new one of
+        ``TURN_DEADLINE_SECONDS``; every outbound call gets the remaining budget.
+        """
+        deadline = current_deadline() or Deadline(settings.TURN_DEADLINE_SECONDS)
+        with deadline_scope(deadline):
+            return self._run_conversation(user_id, question, turn_id, deadline)
 
-    def run_conversation(self, user_id: str, question: str) -> str:
-        """Run a conversation turn with thread safety and optimized error handling."""
-        thread_id = self.get_or_create_thread(user_id)
+    def _run_conversation(
+        self,
+        user_id: str,
+        question: str,
+        turn_id: Optional[str],
+        deadline: Deadline,
+    ) -> str:
         max_retries = 3
         retry_delay = 0.5
 
-        # Use a thread-specific lock to prevent simultaneous operations on the same thread
-        thread_lock = threading.Lock()
-
-        with thread_lock:
+        # Only one turn per user may touch the OpenAI thread at a time
+        with self.conversation_guard(user_id):
+            checkpoint = TurnCheckpoint.load(turn_id, user_id)
+            if checkpoint.completed:
+                return checkpoint.response_text
+            # New users get their thread together with the first run
+            thread_id = checkpoint.thread_id or self._find_thread_id(user_id)
             # Debug log OpenAI config
             logger.info(
                 f"OpenAI API key length: {len(settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else 0}"
@@ -146,290 +467,389 @@ class AssistantManager:
                 )
                 return "Configuration error: API credentials missing. Please contact support."
 
+            if thread_id and not checkpoint.run_id:
+                # Long or long idle threads start over from a summary
+                thread_id = thread_lifecycle.maybe_rotate(
+                    self._budgeted_client("rotating the thread"), user_id, thread_id
+                )
+
             for attempt in range(max_retries):
                 try:
-                    self.cleanup_active_run(thread_id)
-                    self.add_message_to_thread(user_id, question)
+                    if checkpoint.run_id:
+                        # The message is already on the thread
+                        run = self._resume_run(checkpoint)
+                    else:
+                        if thread_id:
+                            self.cleanup_active_run(thread_id)
+                        message = self._user_message(question)
 
-                    # Start a new run with detailed logging
-                    logger.info(
-                        f"Creating new run for thread {thread_id} with assistant {self.assistant_id}"
-                    )
-                    try:
-                        run = self.client.beta.threads.runs.create(
-                            thread_id=thread_id, assistant_id=self.assistant_id
-                        )
-                        logger.info(f"Run created successfully: {run.id}")
-                        self.store_active_run(thread_id, run.id)
-                    except Exception as run_error:
-                        logger.error(f"Error creating run: {run_error}")
-                        return f"Unable to process your request: {str(run_error)}"
-
-                    # More reasonable timeout - 60 seconds
-                    timeout = 60
+                        if settings.ASSISTANT_RUN_MODE == "stream":
+                            return self._stream_run(
+                                thread_id, user_id, message, checkpoint
+                            )
+
+                        try:
+                            run = self._start_run(thread_id, user_id, message)
+                            checkpoint.record_run(run.thread_id, run.id)
+                        except Exception as run_error:
+                            logger.error(f"Error creating run: {run_error}")
+                            return f"Unable to process your request: {str(run_error)}"
+                    thread_id = run.thread_id
+
+                    # At most 60 seconds, and never past the turn's deadline
+                    timeout = deadline.timeout(60, "polling the run")
                     start_time = time.time()
-                    # Optimized polling strategy
-                    backoff_interval = 0.5
-                    max_backoff = 5  # Cap max backoff at 5 seconds
 
+                    # The shared poller wakes us once the run needs attention
                     while time.time() - start_time < timeout:
-                        run = self.client.beta.threads.runs.retrieve(
-                            thread_id=thread_id, run_id=run.id
+                        run = run_poller.wait(
+                            self._budgeted_client("polling the run"),
+                            thread_id,
+                            run.id,
+                            timeout - (time.time() - start_time),
                         )
+                        if run is None:
+                            break
                         logger.info(f"Run status: {run.status}")
 
                         if run.status == "completed":
                             self.delete_active_run(thread_id)
-                            return self.get_latest_assistant_response(user_id)
+                            response = self.get_run_response(thread_id, run.id)
+                            checkpoint.complete(response)
+                            thread_lifecycle.record_turn(thread_id, user_id, run.usage)
+                            return response
                         elif run.status == "requires_action":
-                            # Pass the run.id directly to avoid potential race condition
-                            # where run.id might have changed
-                            current_run_id = run.id
                             self.handle_tool_calls(
                                 thread_id,
-                                current_run_id,
+                                run.id,
                                 run.required_action.submit_tool_outputs.tool_calls,
                                 user_id,
+                                checkpoint,
                             )
-                            # Reset backoff after handling tool calls
-                            backoff_interval = 0.5
-                        elif run.status in ["failed", "expired", "cancelled"]:
+                        else:
                             logger.warning(f"Run ended with status: {run.status}")
                             self.cleanup_active_run(thread_id)
                             return f"Error: {run.status}"
-                        time.sleep(backoff_interval)
-                        backoff_interval = min(
-                            max_backoff, backoff_interval * 1.5
-                        )  # Gentler exponential backoff
 
                     logger.error("Conversation run timed out")
                     # Ensure cleanup happens on timeout
                     self.cleanup_active_run(thread_id)
                     return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
 
+                except DeadlineExceeded as e:
+                    logger.error(f"Conversation turn out of time: {e}")
+                    thread_id = checkpoint.thread_id or thread_id
+                    if thread_id:
+                        self.cleanup_active_run(thread_id)
+                    return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
                 except Exception as e:
-                    if attempt < max_retries - 1:
+                    thread_id = checkpoint.thread_id or thread_id
+                    if attempt < max_retries - 1 and deadline.remaining() > retry_delay:
                         logger.warning(
                             f"Attempt {attempt + 1}/{max_retries} failed: {e}"
                         )
+                        if isinstance(e, NotFoundError) and not checkpoint.run_id:
+                            # A streamed run on a thread that no longer exists
+                            thread_id = self._reload_thread_id(user_id)
+                        elif thread_id:
+                            # e.g. a streamed run rejected by an unknown run
+                            self.cancel_blocking_run(thread_id, e)
                         time.sleep(retry_delay)
                         retry_delay *= 2
                     else:
                         logger.error(f"All {max_retries} attempts failed: {e}")
                         # Ensure cleanup happens on failure
-                        self.cleanup_active_run(thread_id)
+                        if thread_id:
+                            self.cleanup_active_run(thread_id)
                         return f"Sorry, I encountered an error: {str(e)}"
 
             return "Failed to complete the conversation after multiple attempts."
 
-    def _get_function_mapping(self, user_id: str) -> Dict[str, Callable]:
-        """Get cached function mapping or create a new one."""
-        if self._function_mapping is None:
-            # Import only once when needed rather than on every tool call
-            from .utils.tools_wrapper_util import (
-                get_sites,
-                get_products,
-                get_employee,
-                AppointmentSuggestion,
-                book_appointment,
-                cancel_appointment,
-                get_profile,
-                store_profile,
-                get_orders,
-                get_old_orders,
+    def _budgeted_client(self, operation: str) -> OpenAI:
+        """The OpenAI client with its timeout capped at the turn's remaining budget."""
+        return self.client.with_options(
+            timeout=remaining_timeout(settings.OPENAI_REQUEST_TIMEOUT_SECONDS, operation)
+        )
+
+    def _resume_run(self, checkpoint: TurnCheckpoint) -> Any:
+        """
+        Pick up the checkpointed run. If it ended without completing, start a
+        replacement run on the same thread without posting the message again.
+        """
+        thread_id = checkpoint.thread_id
+        client = self._budgeted_client("resuming the run")
+        run = client.beta.threads.runs.retrieve(
+            thread_id=thread_id, run_id=checkpoint.run_id
+        )
+        logger.info(f"Resuming run {run.id} with status {run.status}")
+        checkpoint.resume()
+        if run.status in ["failed", "expired", "cancelled", "incomplete"]:
+            run = client.beta.threads.runs.create(
+                thread_id=thread_id, assistant_id=self.assistant_id
             )
+            logger.info(f"Replacement run created: {run.id}")
+            checkpoint.record_run(thread_id, run.id)
+        self.store_active_run(thread_id, run.id)
+        return run
 
-            # Define properly typed function handlers with correct parameter unpacking
-            self._function_mapping = {
-                # Simple functions with one or no parameters
-                "getSites": lambda args: get_sites(),
-                "getProducts": lambda args: (
-                    get_products(**args)
-                    if args
-                    else get_products(args.get("siteCd"))
-                ),
-                "getOrders": lambda args: get_orders(f"+{user_id}"),
-                "get_old_orders": lambda args: (
-                    get_old_orders(**args) if args else get_old_orders()
-                ),
-                # Functions with specific required parameters
-                "getEmployees": lambda args: get_employee(
-                    args.get("items"), args.get("siteCd"),args.get("week")
-                ),
-                "AppointmentSuggestion": lambda args: AppointmentSuggestion(
-                    week=args.get("week"),
-                    employeeid=args.get("employeeId"),
-                    itemno=args.get("itemNo"),
-                    siteCd=args.get("siteCd"),
-                ),
-                "bookAppointment": lambda args: book_appointment(
-                    beginTs=args.get("beginTs"),
-                    durationMillis=args.get("durationMillis"),
-                    mobileNumber=f"+{user_id}",
-                    employeeId=args.get("employeeId"),
-                    itemNo=args.get("itemNo"),
-                    siteCd=args.get("siteCd"),
-                ),
-                "cancelAppointment": lambda args: cancel_appointment(
-                    orderId=args.get("orderId"),
-                    mobileNumber=f"+{user_id}",
-                    siteCd=args.get("siteCd"),
-                ),
-                # "getProfile": lambda args: get_profile(
-                #     args.get(
-                #         "mobile_number",
-                #         f"+{user_id}",
-                #     )
-                # ),
-                "getProfile": lambda args: get_profile(f"+{user_id}"),
-                # Support both function names for store_profile
-                "updateProfile": lambda args: store_profile(
-                    f"+{user_id}",
-                    args.get("email", ""),
-                    args.get("gender", ""),
-                    args.get("fullNm", ""),
-                    args.get("first_name", ""),
-                    args.get("last_name", ""),
-                ),
-                # Add direct mapping for store_profile (same function, different name)
-                "store_profile": lambda args: store_profile(
-                    f"+{user_id}",
-                    args.get("email", ""),
-                    args.get("gender", ""),
-                    args.get("fullNm", ""),
-                    args.get("first_name", ""),
-                    args.get("last_name", ""),
-                ),
-            }
+    def _user_message(self, question: str) -> Dict[str, str]:
+        return {"role": "user", "content": self._with_timestamp(question)}
 
-        return self._function_mapping
+    def _start_run(
+        self, thread_id: Optional[str], user_id: str, message: Dict[str, str]
+    ) -> Any:
+        """
+        Start a run that carries the user's message, in a single request.
 
-    def handle_tool_calls(
+        Existing threads get the message as ``additional_messages`` of the run;
+        new users get a pre-created thread from the pool or, when it is empty,
+        thread, message and run from one ``createAndRun`` call.
+        """
+        thread_id = thread_id or self._adopt_pooled_thread(user_id)
+        if thread_id:
+            logger.info(
+                f"Creating new run for thread {thread_id} with assistant {self.assistant_id}"
+            )
+            try:
+                run = self._create_run(thread_id, message)
+            except NotFoundError:
+                # Rotated or collected by another process after we cached it
+                stored_thread_id = self._reload_thread_id(user_id)
+                if stored_thread_id == thread_id:
+                    raise
+                logger.warning(f"Thread {thread_id} of {user_id} is gone, moving on")
+                return self._start_run(stored_thread_id, user_id, message)
+            except Exception as e:
+                # An unknown run keeps the thread busy: cancel it, retry once
+                if not self.cancel_blocking_run(thread_id, e):
+                    raise
+                run = self._create_run(thread_id, message)
+        else:
+            logger.info(f"Creating thread and run for new user: {user_id}")
+            client = self._budgeted_client("creating the run")
+            run = client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id, thread={"messages": [message]}
+            )
+            thread_id = self._save_thread(user_id, run.thread_id)
+            if thread_id != run.thread_id:
+                # Another worker created this user's thread first; move the
+                # turn onto that thread
+                self._discard_thread(run.thread_id)
+                return self._start_run(thread_id, user_id, message)
+        logger.info(f"Run created successfully: {run.id}")
+        self.store_active_run(thread_id, run.id)
+        return run
+
+    def _create_run(self, thread_id: str, message: Dict[str, str]) -> Any:
+        client = self._budgeted_client("creating the run")
+        return client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            additional_messages=[message],
+        )
+
+    def _stream_run(
         self,
-        thread_id: str,
-        run_id: str,
-        tool_calls: List[Dict[Any, Any]],
+        thread_id: Optional[str],
         user_id: str,
-    ) -> None:
-        """Handle tool calls with thread safety, improved error handling and performance."""
-        tool_outputs = []
-        function_mapping = self._get_function_mapping(user_id)
+        message: Dict[str, str],
+        checkpoint: TurnCheckpoint,
+        timeout: int = 60,
+    ) -> str:
+        """
+        Run the assistant over the streaming API.
 
+        The user's message travels with the run request (see ``_start_run``).
+        Tool calls are handled as soon as the ``requires_action`` event arrives
+        and the reply is taken from the final ``thread.message.completed``
+        event, so no status polling or extra ``messages.list`` call is needed.
+        """
+        logger.info(
+            f"Streaming new run for thread {thread_id} with assistant {self.assistant_id}"
+        )
+        timeout = remaining_timeout(timeout, "streaming the run")
         start_time = time.time()
-        total_tool_calls = len(tool_calls)
-        logger.info(f"Processing {total_tool_calls} tool calls for thread {thread_id}")
-
-        # Check if run is still active before processing tools
-
-        # Process all tool calls
-        for idx, tool_call in enumerate(tool_calls):
-            tool_start_time = time.time()
-            try:
-                function_name = tool_call.function.name
-                raw_args = tool_call.function.arguments
-
-                # Debug log for function name
-                logger.info(f"Function name requested: '{function_name}'")
-                logger.info(f"Available functions: {list(function_mapping.keys())}")
+        response_text = None
+        thread_id = thread_id or self._adopt_pooled_thread(user_id)
+        client = self._budgeted_client("streaming the run")
+        if thread_id:
+            stream_manager = client.beta.threads.runs.stream(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                additional_messages=[message],
+            )
+        else:
+            stream_manager = client.beta.threads.create_and_run_stream(
+                assistant_id=self.assistant_id, thread={"messages": [message]}
+            )
+        while stream_manager is not None:
+            pending_run = None
+            with stream_manager as stream:
+                for event in stream:
+                    if event.event == "thread.run.created":
+                        logger.info(f"Run created successfully: {event.data.id}")
+                        if not thread_id:
+                            thread_id = event.data.thread_id
+                            self._save_new_stream_thread(user_id, thread_id)
+                        self.store_active_run(thread_id, event.data.id)
+                        checkpoint.record_run(thread_id, event.data.id)
+                    elif event.event == "thread.message.completed":
+                        response_text = self._extract_assistant_text([event.data])
+                    elif event.event == "thread.run.requires_action":
+                        # The server ends this stream once the run pauses
+                        pending_run = event.data
+                        break
+                    elif event.event == "thread.run.completed":
+                        self.delete_active_run(thread_id)
+                        response_text = response_text or "No response from assistant."
+                        checkpoint.complete(response_text)
+                        thread_lifecycle.record_turn(
+                            thread_id, user_id, event.data.usage
+                        )
+                        return response_text
+                    elif event.event in [
+                        "thread.run.failed",
+                        "thread.run.expired",
+                        "thread.run.cancelled",
+                        "thread.run.incomplete",
+                    ]:
+                        logger.warning(f"Run ended with status: {event.data.status}")
+                        self.cleanup_active_run(thread_id)
+                        return f"Error: {event.data.status}"
+                    elif event.event == "error":
+                        raise RuntimeError(f"Run stream error: {event.data}")
 
-                # Safely parse arguments
-                try:
-                    arguments = json.loads(raw_args) if raw_args else {}
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse arguments: {raw_args}")
-                    arguments = {}
+                    if time.time() - start_time > timeout:
+                        break
 
-                # Log tool call details
-                arg_string = ", ".join([f"{k}={v}" for k, v in arguments.items()])
-                logger.info(
-                    f"Tool {idx+1}/{total_tool_calls}: Executing {function_name}({arg_string})"
-                )
+            if pending_run is None or time.time() - start_time > timeout:
+                break
+            tool_outputs = self._collect_tool_outputs(
+                thread_id,
+                pending_run.required_action.submit_tool_outputs.tool_calls,
+                user_id,
+                checkpoint,
+            )
+            client = self._budgeted_client("streaming the run")
+            stream_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id, run_id=pending_run.id, tool_outputs=tool_outputs
+            )
+            checkpoint.record_submitted()
 
-                handler = function_mapping.get(function_name)
-                if handler:
-                    try:
-                        result = handler(arguments)
-                        tool_execution_time = time.time() - tool_start_time
-                        result_status = result.get("status", "unknown")
-                        logger.info(
-                            f"Tool {idx+1}/{total_tool_calls}: {function_name} completed with status '{result_status}' in {tool_execution_time:.2f}s"
-                        )
-                    except TypeError as e:
-                        # Handle parameter mismatches more gracefully
-                        logger.error(f"Parameter mismatch in {function_name}: {e}")
-                        result = {
-                            "status": "error",
-                            "message": f"Parameter error: {str(e)}",
-                        }
-                else:
-                    # Check for case-insensitive matches
-                    case_insensitive_match = next(
-                        (
-                            k
-                            for k in function_mapping.keys()
-                            if k.lower() == function_name.lower()
-                        ),
-                        None,
-                    )
+        logger.error("Conversation run timed out")
+        self.cleanup_active_run(thread_id)
+        return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
 
-                    if case_insensitive_match:
-                        logger.warning(
-                            f"Case mismatch in function name. Using '{case_insensitive_match}' instead of '{function_name}'"
-                        )
-                        try:
-                            result = function_mapping[case_insensitive_match](arguments)
-                            tool_execution_time = time.time() - tool_start_time
-                            logger.info(
-                                f"Tool {idx+1}/{total_tool_calls}: {case_insensitive_match} completed in {tool_execution_time:.2f}s"
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"Error executing case-insensitive match {case_insensitive_match}: {e}"
-                            )
-                            result = {"status": "error", "message": f"Error: {str(e)}"}
-                    else:
-                        result = {"error": f"Function {function_name} not implemented"}
-                        logger.warning(
-                            f"Tool {idx+1}/{total_tool_calls}: Unimplemented function called: {function_name}"
-                        )
+    def _get_function_mapping(self) -> Dict[str, Callable]:
+        """
+        Get cached function mapping or create a new one.
 
-                        # Suggest alternatives for typos
-                        similar_functions = [
-                            k
-                            for k in function_mapping.keys()
-                            if any(c in k.lower() for c in function_name.lower())
-                        ]
-                        if similar_functions:
-                            logger.info(
-                                f"Similar functions that might match: {similar_functions}"
-                            )
+        Handlers take ``(args, user_id)`` so the mapping can be shared by every
+        conversation handled by this manager.
+        """
+        with self._function_mapping_lock:
+            if self._function_mapping is None:
+                self._function_mapping = self._build_function_mapping()
+        return self._function_mapping
 
-                # Log result summary if not too large
-                if isinstance(result, dict):
-                    result_keys = list(result.keys())
-                    logger.debug(f"Tool {idx+1} result keys: {result_keys}")
+    def _build_function_mapping(self) -> Dict[str, Callable]:
+        # Import only once when needed rather than on every tool call
+        from .utils.tools_wrapper_util import (
+            get_sites,
+            get_products,
+            get_employee,
+            AppointmentSuggestion,
+            book_appointment,
+            cancel_appointment,
+            get_profile,
+            store_profile,
+            get_orders,
+            get_old_orders,
+        )
 
-                tool_outputs.append(
-                    {"tool_call_id": tool_call.id, "output": json.dumps(result)}
-                )
+        # Define properly typed function handlers with correct parameter unpacking
+        return {
+            # Simple functions with one or no parameters
+            "getSites": lambda args, user_id: get_sites(),
+            "getProducts": lambda args, user_id: (
+                get_products(**args) if args else get_products(args.get("siteCd"))
+            ),
+            "getOrders": lambda args, user_id: get_orders(f"+{user_id}"),
+            "get_old_orders": lambda args, user_id: (
+                get_old_orders(**args) if args else get_old_orders()
+            ),
+            # Functions with specific required parameters
+            "getEmployees": lambda args, user_id: get_employee(
+                args.get("items"), args.get("siteCd"), args.get("week")
+            ),
+            "AppointmentSuggestion": lambda args, user_id: AppointmentSuggestion(
+                week=args.get("week"),
+                employeeid=args.get("employeeId"),
+                itemno=args.get("itemNo"),
+                siteCd=args.get("siteCd"),
+            ),
+            "bookAppointment": lambda args, user_id: book_appointment(
+                beginTs=args.get("beginTs"),
+                durationMillis=args.get("durationMillis"),
+                mobileNumber=f"+{user_id}",
+                employeeId=args.get("employeeId"),
+                itemNo=args.get("itemNo"),
+                siteCd=args.get("siteCd"),
+            ),
+            "cancelAppointment": lambda args, user_id: cancel_appointment(
+                orderId=args.get("orderId"),
+                mobileNumber=f"+{user_id}",
+                siteCd=args.get("siteCd"),
+            ),
+            # "getProfile": lambda args, user_id: get_profile(
+            #     args.get(
+            #         "mobile_number",
+            #         f"+{user_id}",
+            #     )
+            # ),
+            "getProfile": lambda args, user_id: get_profile(f"+{user_id}"),
+            # Support both function names for store_profile
+            "updateProfile": lambda args, user_id: store_profile(
+                f"+{user_id}",
+                args.get("email", ""),
+                args.get("gender", ""),
+                args.get("fullNm", ""),
+                args.get("first_name", ""),
+                args.get("last_name", ""),
+            ),
+            # Add direct mapping for store_profile (same function, different name)
+            "store_profile": lambda args, user_id: store_profile(
+                f"+{user_id}",
+                args.get("email", ""),
+                args.get("gender", ""),
+                args.get("fullNm", ""),
+                args.get("first_name", ""),
+                args.get("last_name", ""),
+            ),
+        }
 
-            except Exception as e:
-                tool_execution_time = time.time() - tool_start_time
-                logger.error(
-                    f"Tool {idx+1}/{total_tool_calls}: Error in {tool_call.function.name}: {str(e)} after {tool_execution_time:.2f}s"
-                )
-                tool_outputs.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps({"error": str(e)}),
-                    }
-                )
+    def handle_tool_calls(
+        self,
+        thread_id: str,
+        run_id: str,
+        tool_calls: List[Dict[Any, Any]],
+        user_id: str,
+        checkpoint: Optional[TurnCheckpoint] = None,
+    ) -> None:
+        """Handle tool calls with thread safety, improved error handling and performance."""
+        start_time = time.time()
+        checkpoint = checkpoint or TurnCheckpoint(turn_id=None, mobile_number=user_id)
+        tool_outputs = self._collect_tool_outputs(
+            thread_id, tool_calls, user_id, checkpoint
+        )
 
         try:
             submission_start = time.time()
-            self.client.beta.threads.runs.submit_tool_outputs_and_poll(
+            client = self._budgeted_client("submitting tool outputs")
+            client.beta.threads.runs.submit_tool_outputs(
                 thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs
             )
+            checkpoint.record_submitted()
             submission_time = time.time() - submission_start
             total_time = time.time() - start_time
             logger.info(
@@ -449,30 +869,229 @@ class AssistantManager:
                     f"Failed to cancel run after submission error: {cancel_error}"
                 )
 
-    def get_latest_assistant_response(self, user_id: str) -> str:
-        """Get the latest assistant response with thread safety and error handling."""
-        thread_id = self.get_or_create_thread(user_id)
+    def _collect_tool_outputs(
+        self,
+        thread_id: str,
+        tool_calls: List[Any],
+        user_id: str,
+        checkpoint: TurnCheckpoint,
+    ) -> List[Dict[str, str]]:
+        """
+        Outputs for ``tool_calls``: write tools that already ran before the
+        turn was resumed are reused from the checkpoint, everything else is
+        executed. Outputs of write tools are checkpointed before they are
+        submitted.
+        """
+        tool_outputs = checkpoint.reusable_outputs(tool_calls)
+        pending = [
+            tool_call
+            for idx, tool_call in enumerate(tool_calls)
+            if idx not in tool_outputs
+        ]
+        if pending:
+            outputs = self._run_tool_calls(thread_id, pending, user_id)
+            checkpoint.record_tool_outputs(*write_calls(pending, outputs))
+            outputs = iter(outputs)
+            for idx in range(len(tool_calls)):
+                if idx not in tool_outputs:
+                    tool_outputs[idx] = next(outputs)
+        return [tool_outputs[idx] for idx in range(len(tool_calls))]
+
+    def _run_tool_calls(
+        self, thread_id: str, tool_calls: List[Any], user_id: str
+    ) -> List[Dict[str, str]]:
+        """
+        Execute the tool calls of a run and return the outputs to submit, in
+        the order requested.
+
+        Read-only tools run concurrently on the shared tool executor while
+        write tools (and ``getProfile``, which updates the local customer
+        record) run one after another on the calling thread. Each call is
+        bounded by ``TOOL_CALL_TIMEOUT_SECONDS``.
+        """
+        total_tool_calls = len(tool_calls)
+        logger.info(f"Processing {total_tool_calls} tool calls for thread {thread_id}")
+        if total_tool_calls == 1:
+            return [self._execute_tool_call(tool_calls[0], user_id, 0, 1)]
+
+        executor = get_tool_executor()
+        timeout = remaining_timeout(settings.TOOL_CALL_TIMEOUT_SECONDS, "running tools")
+        # Each call runs in a copy of this context, so it sees the turn's deadline
+        futures = {
+            idx: executor.submit(
+                contextvars.copy_context().run,
+                self._execute_tool_call,
+                tool_call,
+                user_id,
+                idx,
+                total_tool_calls,
+            )
+            for idx, tool_call in enumerate(tool_calls)
+            if not runs_serialized(tool_call)
+        }
+        deadline = time.time() + timeout
+        tool_outputs: List[Optional[Dict[str, str]]] = [None] * total_tool_calls
+        for idx, tool_call in enumerate(tool_calls):
+            if idx in futures:
+                continue
+            # Run on this thread, so a call reported as timed out can neither
+            # start late nor overlap the next write; its service calls are
+            # bounded by the tool's own deadline
+            call_timeout = remaining_timeout(
+                settings.TOOL_CALL_TIMEOUT_SECONDS, "running tools"
+            )
+            with deadline_scope(call_timeout) as call_deadline:
+                tool_outputs[idx] = self._execute_tool_call(
+                    tool_call, user_id, idx, total_tool_calls
+                )
+            if call_deadline.expired:
+                tool_outputs[idx] = tool_timeout_output(tool_call, call_timeout)
+
+        for idx, future in futures.items():
+            try:
+                tool_outputs[idx] = future.result(
+                    timeout=max(0, deadline - time.time())
+                )
+            except FutureTimeoutError:
+                future.cancel()
+                tool_outputs[idx] = tool_timeout_output(tool_calls[idx], timeout)
+        return tool_outputs
+
+    def _execute_tool_call(
+        self, tool_call: Any, user_id: str, idx: int, total_tool_calls: int
+    ) -> Dict[str, str]:
+        """Execute a single tool call and return its ``{tool_call_id, output}`` entry."""
+        function_mapping = self._get_function_mapping()
+        tool_start_time = time.time()
         try:
-            messages = self.client.beta.threads.messages.list(
-                thread_id=thread_id, order="desc", limit=1
+            function_name = tool_call.function.name
+            raw_args = tool_call.function.arguments
+
+            # Debug log for function name
+            logger.info(f"Function name requested: '{function_name}'")
+            logger.info(f"Available functions: {list(function_mapping.keys())}")
+
+            # Safely parse arguments
+            try:
+                arguments = json.loads(raw_args) if raw_args else {}
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse arguments: {raw_args}")
+                arguments = {}
+
+            # Log tool call details
+            arg_string = ", ".join([f"{k}={v}" for k, v in arguments.items()])
+            logger.info(
+                f"Tool {idx+1}/{total_tool_calls}: Executing {function_name}({arg_string})"
+            )
+
+            handler = function_mapping.get(function_name)
+            if handler:
+                try:
+                    result = handler(arguments, user_id)
+                    tool_execution_time = time.time() - tool_start_time
+                    result_status = result.get("status", "unknown")
+                    logger.info(
+                        f"Tool {idx+1}/{total_tool_calls}: {function_name} completed with status '{result_status}' in {tool_execution_time:.2f}s"
+                    )
+                except TypeError as e:
+                    # Handle parameter mismatches more gracefully
+                    logger.error(f"Parameter mismatch in {function_name}: {e}")
+                    result = {
+                        "status": "error",
+                        "message": f"Parameter error: {str(e)}",
+                    }
+            else:
+                # Check for case-insensitive matches
+                case_insensitive_match = next(
+                    (
+                        k
+                        for k in function_mapping.keys()
+                        if k.lower() == function_name.lower()
+                    ),
+                    None,
+                )
+
+                if case_insensitive_match:
+                    logger.warning(
+                        f"Case mismatch in function name. Using '{case_insensitive_match}' instead of '{function_name}'"
+                    )
+                    try:
+                        result = function_mapping[case_insensitive_match](
+                            arguments, user_id
+                        )
+                        tool_execution_time = time.time() - tool_start_time
+                        logger.info(
+                            f"Tool {idx+1}/{total_tool_calls}: {case_insensitive_match} completed in {tool_execution_time:.2f}s"
+                        )
+                    except Exception as e:
+                        logger.error(
+                            f"Error executing case-insensitive match {case_insensitive_match}: {e}"
+                        )
+                        result = {"status": "error", "message": f"Error: {str(e)}"}
+                else:
+                    result = {"error": f"Function {function_name} not implemented"}
+                    logger.warning(
+                        f"Tool {idx+1}/{total_tool_calls}: Unimplemented function called: {function_name}"
+                    )
+
+                    # Suggest alternatives for typos
+                    similar_functions = [
+                        k
+                        for k in function_mapping.keys()
+                        if any(c in k.lower() for c in function_name.lower())
+                    ]
+                    if similar_functions:
+                        logger.info(
+                            f"Similar functions that might match: {similar_functions}"
+                        )
+
+            metrics.observe(
+                f"tools.{function_name}.seconds", time.time() - tool_start_time
             )
 
-            for msg in messages:
-                if msg.role == "assistant":
-                    # Handle different content types properly
-                    for content_item in msg.content:
-                        if content_item.type == "text":
-                            return content_item.text.value
+            # Log result summary if not too large
+            if isinstance(result, dict):
+                result_keys = list(result.keys())
+                logger.debug(f"Tool {idx+1} result keys: {result_keys}")
 
-                    # If we get here, no text content was found
-                    return "Assistant responded but no text content was found."
+            return {
+                "tool_call_id": tool_call.id,
+                "output": serialize_tool_output(function_name, result),
+            }
 
-            return "No response from assistant."
+        except Exception as e:
+            tool_execution_time = time.time() - tool_start_time
+            logger.error(
+                f"Tool {idx+1}/{total_tool_calls}: Error in {tool_call.function.name}: {str(e)} after {tool_execution_time:.2f}s"
+            )
+            return {"tool_call_id": tool_call.id, "output": json.dumps({"error": str(e)})}
 
+    def get_run_response(self, thread_id: str, run_id: str) -> str:
+        """Get the assistant message produced by a run."""
+        try:
+            messages = self.client.beta.threads.messages.list(
+                thread_id=thread_id, run_id=run_id, order="desc", limit=1
+            )
+            return self._extract_assistant_text(messages)
         except Exception as e:
             logger.error(f"Error retrieving assistant response: {e}")
             return "Error retrieving response."
 
+    @staticmethod
+    def _extract_assistant_text(messages) -> str:
+        """Return the text of the newest assistant message in ``messages``."""
+        for msg in messages:
+            if msg.role == "assistant":
+                # Handle different content types properly
+                for content_item in msg.content:
+                    if content_item.type == "text":
+                        return content_item.text.value
+
+                # If we get here, no text content was found
+                return "Assistant responded but no text content was found."
+
+        return "No response from assistant."
+
 
 # Test function for basic chatbot interaction
 def test_chatbot():
@@ -490,7 +1109,7 @@ def test_chatbot():
         logger.error("Error: OPENAI_ASSISTANT_ID not set")
         return
 
-    assistant_manager = AssistantManager(api_key, assistant_id)
+    assistant_manager = get_assistant_manager()
     while True:
         try:
             question = input("\nYou: ").strip()
@@ -498,8 +1117,7 @@ def test_chatbot():
                 print("Goodbye!")
                 break
             elif question.lower() == "new":
-                with threads_lock:
-                    user_threads.clear()
+                user_threads.clear()
                 print("Started new conversation")
                 continue
             elif not question:
@@ -0,0 +1,716 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, NotFoundError
+
+from .agent import (
+    BLOCKING_RUN_CANCEL_WAIT_SECONDS,
+    acquire_conversation_lease,
+    blocking_run_id,
+    get_assistant_manager,
+    get_tool_executor,
+    logger,
+    openai_connection_tracker,
+    release_conversation_lease,
+    runs_serialized,
+    thread_cache,
+    tool_skipped_output,
+    tool_timeout_output,
+    write_calls,
+)
+from .core.config import settings
+from .services.run_poller_service import run_poller
+from .services.thread_lifecycle_service import thread_lifecycle
+from .services.thread_pool_service import thread_pool
+from .services.turn_checkpoint_service import TurnCheckpoint
+from .utils.deadline_util import (
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_scope,
+    remaining_timeout,
+)
+from .utils.http_util import pool_limits
+from .utils.lock_util import KeyedLockRegistry
+from .utils.metrics_util import metrics
+from .utils.tool_output_util import serialize_tool_output
+
+_singleton_lock = threading.RLock()
+_async_openai_client: Optional[AsyncOpenAI] = None
+_async_assistant_manager: Optional["AsyncAssistantManager"] = None
+async_conversation_locks = KeyedLockRegistry(
+    "async_conversation_locks", factory=asyncio.Lock
+)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client.
+
+    The underlying httpx pool is bound to the event loop that first uses it,
+    so the async engine must be driven from a single long-lived loop.
+    """
+    global _async_openai_client
+    if _async_openai_client is None:
+        with _singleton_lock:
+            if _async_openai_client is None:
+                _async_openai_client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=settings.OPENAI_REQUEST_TIMEOUT_SECONDS,
+                    max_retries=settings.OPENAI_MAX_RETRIES,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=pool_limits(
+                            settings.OPENAI_MAX_CONNECTIONS,
+                            settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                            settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                        ),
+                        event_hooks={
+                            "response": [openai_connection_tracker.aon_response]
+                        },
+                    ),
+                )
+    return _async_openai_client
+
+
+def get_async_assistant_manager() -> "AsyncAssistantManager":
+    """Return the process-wide AsyncAssistantManager, creating it on first use."""
+    global _async_assistant_manager
+    if _async_assistant_manager is None:
+        with _singleton_lock:
+            if _async_assistant_manager is None:
+                _async_assistant_manager = AsyncAssistantManager(
+                    settings.OPENAI_ASSISTANT_ID
+                )
+    return _async_assistant_manager
+
+
+class AsyncAssistantManager:
+    """
+    asyncio counterpart of ``AssistantManager``.
+
+    OpenAI calls go through ``AsyncOpenAI`` and waits use ``asyncio.sleep``,
+    so a single event loop can drive many conversations at once. The booking
+    flow tools are awaited on the async TimeGlobe client; database access
+    and the other tool handlers are shared with the synchronous manager and
+    run in a thread pool.
+    """
+
+    def __init__(self, assistant_id: str, client: AsyncOpenAI = None):
+        self.client = client or get_async_openai_client()
+        self.assistant_id = assistant_id
+        self._sync = get_assistant_manager()
+        self._async_function_mapping = None
+
+    def _get_async_function_mapping(
+        self,
+    ) -> Dict[str, Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]]]:
+        """Tools with a native async handler; the rest run on the tool executor."""
+        if self._async_function_mapping is None:
+            from .utils.tools_wrapper_util import (
+                aget_products,
+                aget_employee,
+                aAppointmentSuggestion,
+                abook_appointment,
+                acancel_appointment,
+            )
+
+            self._async_function_mapping = {
+                "getProducts": lambda args, user_id: (
+                    aget_products(**args) if args else aget_products(None)
+                ),
+                "getEmployees": lambda args, user_id: aget_employee(
+                    args.get("items"), args.get("siteCd"), args.get("week")
+                ),
+                "AppointmentSuggestion": lambda args, user_id: aAppointmentSuggestion(
+                    week=args.get("week"),
+                    employeeid=args.get("employeeId"),
+                    itemno=args.get("itemNo"),
+                    siteCd=args.get("siteCd"),
+                ),
+                "bookAppointment": lambda args, user_id: abook_appointment(
+                    beginTs=args.get("beginTs"),
+                    durationMillis=args.get("durationMillis"),
+                    mobileNumber=f"+{user_id}",
+                    employeeId=args.get("employeeId"),
+                    itemNo=args.get("itemNo"),
+                    siteCd=args.get("siteCd"),
+                ),
+                "cancelAppointment": lambda args, user_id: acancel_appointment(
+                    orderId=args.get("orderId"),
+                    mobileNumber=f"+{user_id}",
+                    siteCd=args.get("siteCd"),
+                ),
+            }
+        return self._async_function_mapping
+
+    async def get_or_create_thread(self, user_id: str) -> str:
+        """Get existing thread for user or create new one."""
+        thread_id = thread_cache.get(user_id) or await asyncio.to_thread(
+            self._sync._find_thread_id, user_id
+        )
+        if not thread_id and thread_pool.enabled:
+            thread_id = await asyncio.to_thread(self._sync._adopt_pooled_thread, user_id)
+        if thread_id:
+            return thread_id
+
+        logger.info(f"Creating new thread for user: {user_id}")
+        thread = await self.client.beta.threads.create()
+        thread_id = await asyncio.to_thread(self._sync._save_thread, user_id, thread.id)
+        if thread_id != thread.id:
+            try:
+                await self.client.beta.threads.delete(thread.id)
+            except Exception as e:
+                logger.warning(f"Could not delete unused thread {thread.id}: {e}")
+        return thread_id
+
+    async def cleanup_active_run(self, thread_id: str) -> None:
+        """Clean up any existing active run for a thread."""
+        run_id = self._sync.get_active_run(thread_id)
+        if not run_id:
+            return
+        try:
+            run = await self.client.beta.threads.runs.retrieve(
+                thread_id=thread_id, run_id=run_id
+            )
+            if run.status in ["queued", "in_progress", "requires_action"]:
+                await self.client.beta.threads.runs.cancel(
+                    thread_id=thread_id, run_id=run_id
+                )
+        except Exception as e:
+            logger.error(f"Error cleaning up run: {e}")
+        finally:
+            self._sync.delete_active_run(thread_id)
+
+    async def cancel_blocking_run(self, thread_id: str, error: Exception) -> bool:
+        """See ``AssistantManager.cancel_blocking_run``."""
+        run_id = blocking_run_id(error)
+        if not run_id:
+            return False
+        logger.warning(f"Cancelling run {run_id} blocking thread {thread_id}")
+        metrics.increment("openai.blocking_runs_cancelled")
+        try:
+            client = self._budgeted_client("cancelling a blocking run")
+            await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            await run_poller.wait_async(
+                self._sync._budgeted_client("cancelling a blocking run"),
+                thread_id,
+                run_id,
+                remaining_timeout(
+                    BLOCKING_RUN_CANCEL_WAIT_SECONDS, "cancelling a blocking run"
+                ),
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as cancel_error:
+            logger.error(f"Failed to cancel blocking run {run_id}: {cancel_error}")
+        return True
+
+    async def record_exchange(self, user_id: str, question: str, answer: str) -> None:
+        """See ``AssistantManager.record_exchange``."""
+        async with async_conversation_locks.ahold(user_id):
+            await asyncio.to_thread(
+                self._sync._append_exchange, user_id, question, answer
+            )
+
+    async def run_conversation(
+        self, user_id: str, question: str, turn_id: Optional[str] = None
+    ) -> str:
+        """Run a conversation turn without blocking the event loop."""
+        deadline = current_deadline() or Deadline(settings.TURN_DEADLINE_SECONDS)
+        async with async_conversation_locks.ahold(user_id):
+            owner = await asyncio.to_thread(acquire_conversation_lease, user_id)
+            try:
+                with deadline_scope(deadline):
+                    return await self._run_conversation(
+                        user_id, question, turn_id, deadline
+                    )
+            finally:
+                await asyncio.to_thread(release_conversation_lease, user_id, owner)
+
+    async def _run_conversation(
+        self,
+        user_id: str,
+        question: str,
+        turn_id: Optional[str],
+        deadline: Deadline,
+    ) -> str:
+        checkpoint = await asyncio.to_thread(TurnCheckpoint.load, turn_id, user_id)
+        if checkpoint.completed:
+            return checkpoint.response_text
+        # New users get their thread together with the first run
+        thread_id = (
+            checkpoint.thread_id
+            or thread_cache.get(user_id)
+            or await asyncio.to_thread(self._sync._find_thread_id, user_id)
+        )
+        max_retries = 3
+        retry_delay = 0.5
+
+        if not settings.OPENAI_API_KEY or not self.assistant_id:
+            logger.error(
+                "Missing OpenAI credentials: API key or Assistant ID not configured"
+            )
+            return "Configuration error: API credentials missing. Please contact support."
+
+        if thread_id and not checkpoint.run_id:
+            # Long or long idle threads start over from a summary
+            thread_id = await asyncio.to_thread(
+                thread_lifecycle.maybe_rotate,
+                self._sync._budgeted_client("rotating the thread"),
+                user_id,
+                thread_id,
+            )
+
+        for attempt in range(max_retries):
+            try:
+                if checkpoint.run_id:
+                    run = await self._resume_run(checkpoint)
+                else:
+                    if thread_id:
+                        await self.cleanup_active_run(thread_id)
+                    message = self._sync._user_message(question)
+
+                    if settings.ASSISTANT_RUN_MODE == "stream":
+                        return await self._stream_run(
+                            thread_id, user_id, message, checkpoint
+                        )
+
+                    try:
+                        run = await self._start_run(thread_id, user_id, message)
+                        await asyncio.to_thread(
+                            checkpoint.record_run, run.thread_id, run.id
+                        )
+                    except Exception as run_error:
+                        logger.error(f"Error creating run: {run_error}")
+                        return f"Unable to process your request: {str(run_error)}"
+                thread_id = run.thread_id
+
+                # At most 60 seconds, and never past the turn's deadline
+                timeout = deadline.timeout(60, "polling the run")
+                start_time = time.time()
+
+                while time.time() - start_time < timeout:
+                    run = await run_poller.wait_async(
+                        self._sync._budgeted_client("polling the run"),
+                        thread_id,
+                        run.id,
+                        timeout - (time.time() - start_time),
+                    )
+                    if run is None:
+                        break
+                    logger.info(f"Run status: {run.status}")
+
+                    if run.status == "completed":
+                        self._sync.delete_active_run(thread_id)
+                        response = await self.get_run_response(thread_id, run.id)
+                        await asyncio.to_thread(checkpoint.complete, response)
+                        await asyncio.to_thread(
+                            thread_lifecycle.record_turn, thread_id, user_id, run.usage
+                        )
+                        return response
+                    elif run.status == "requires_action":
+                        await self.handle_tool_calls(
+                            thread_id,
+                            run.id,
+                            run.required_action.submit_tool_outputs.tool_calls,
+                            user_id,
+                            checkpoint,
+                        )
+                    else:
+                        logger.warning(f"Run ended with status: {run.status}")
+                        await self.cleanup_active_run(thread_id)
+                        return f"Error: {run.status}"
+
+                logger.error("Conversation run timed out")
+                await self.cleanup_active_run(thread_id)
+                return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
+
+            except DeadlineExceeded as e:
+                logger.error(f"Conversation turn out of time: {e}")
+                thread_id = checkpoint.thread_id or thread_id
+                if thread_id:
+                    await self.cleanup_active_run(thread_id)
+                return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
+            except Exception as e:
+                thread_id = checkpoint.thread_id or thread_id
+                if attempt < max_retries - 1 and deadline.remaining() > retry_delay:
+                    logger.warning(f"Attempt {attempt + 1}/{max_retries} failed: {e}")
+                    if isinstance(e, NotFoundError) and not checkpoint.run_id:
+                        # A streamed run on a thread that no longer exists
+                        thread_id = await asyncio.to_thread(
+                            self._sync._reload_thread_id, user_id
+                        )
+                    elif thread_id:
+                        # e.g. a streamed run rejected by an unknown run
+                        await self.cancel_blocking_run(thread_id, e)
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    logger.error(f"All {max_retries} attempts failed: {e}")
+                    if thread_id:
+                        await self.cleanup_active_run(thread_id)
+                    return f"Sorry, I encountered an error: {str(e)}"
+
+        return "Failed to complete the conversation after multiple attempts."
+
+    def _budgeted_client(self, operation: str) -> AsyncOpenAI:
+        """The async client with its timeout capped at the turn's remaining budget."""
+        return self.client.with_options(
+            timeout=remaining_timeout(settings.OPENAI_REQUEST_TIMEOUT_SECONDS, operation)
+        )
+
+    async def _resume_run(self, checkpoint: TurnCheckpoint) -> Any:
+        """Pick up the checkpointed run (see ``AssistantManager._resume_run``)."""
+        thread_id = checkpoint.thread_id
+        client = self._budgeted_client("resuming the run")
+        run = await client.beta.threads.runs.retrieve(
+            thread_id=thread_id, run_id=checkpoint.run_id
+        )
+        logger.info(f"Resuming run {run.id} with status {run.status}")
+        checkpoint.resume()
+        if run.status in ["failed", "expired", "cancelled", "incomplete"]:
+            run = await client.beta.threads.runs.create(
+                thread_id=thread_id, assistant_id=self.assistant_id
+            )
+            logger.info(f"Replacement run created: {run.id}")
+            await asyncio.to_thread(checkpoint.record_run, thread_id, run.id)
+        self._sync.store_active_run(thread_id, run.id)
+        return run
+
+    async def _start_run(
+        self, thread_id: Optional[str], user_id: str, message: Dict[str, str]
+    ) -> Any:
+        """Start a run carrying the user's message (see ``AssistantManager._start_run``)."""
+        if not thread_id and thread_pool.enabled:
+            thread_id = await asyncio.to_thread(self._sync._adopt_pooled_thread, user_id)
+        if thread_id:
+            logger.info(
+                f"Creating new run for thread {thread_id} with assistant {self.assistant_id}"
+            )
+            try:
+                run = await self._create_run(thread_id, message)
+            except NotFoundError:
+                # Rotated or collected by another process after we cached it
+                stored_thread_id = await asyncio.to_thread(
+                    self._sync._reload_thread_id, user_id
+                )
+                if stored_thread_id == thread_id:
+                    raise
+                logger.warning(f"Thread {thread_id} of {user_id} is gone, moving on")
+                return await self._start_run(stored_thread_id, user_id, message)
+            except Exception as e:
+                # An unknown run keeps the thread busy: cancel it, retry once
+                if not await self.cancel_blocking_run(thread_id, e):
+                    raise
+                run = await self._create_run(thread_id, message)
+        else:
+            logger.info(f"Creating thread and run for new user: {user_id}")
+            client = self._budgeted_client("creating the run")
+            run = await client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id, thread={"messages": [message]}
+            )
+            thread_id = await asyncio.to_thread(
+                self._sync._save_thread, user_id, run.thread_id
+            )
+            if thread_id != run.thread_id:
+                try:
+                    await self.client.beta.threads.delete(run.thread_id)
+                except Exception as e:
+                    logger.warning(
+                        f"Could not delete unused thread {run.thread_id}: {e}"
+                    )
+                return await self._start_run(thread_id, user_id, message)
+        logger.info(f"Run created successfully: {run.id}")
+        self._sync.store_active_run(thread_id, run.id)
+        return run
+
+    async def _create_run(self, thread_id: str, message: Dict[str, str]) -> Any:
+        client = self._budgeted_client("creating the run")
+        return await client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            additional_messages=[message],
+        )
+
+    async def _stream_run(
+        self,
+        thread_id: Optional[str],
+        user_id: str,
+        message: Dict[str, str],
+        checkpoint: TurnCheckpoint,
+        timeout: int = 60,
+    ) -> str:
+        """Run the assistant over the streaming API (see ``AssistantManager._stream_run``)."""
+        logger.info(
+            f"Streaming new run for thread {thread_id} with assistant {self.assistant_id}"
+        )
+        timeout = remaining_timeout(timeout, "streaming the run")
+        start_time = time.time()
+        response_text = None
+        if not thread_id and thread_pool.enabled:
+            thread_id = await asyncio.to_thread(self._sync._adopt_pooled_thread, user_id)
+        client = self._budgeted_client("streaming the run")
+        if thread_id:
+            stream_manager = client.beta.threads.runs.stream(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                additional_messages=[message],
+            )
+        else:
+            stream_manager = client.beta.threads.create_and_run_stream(
+                assistant_id=self.assistant_id, thread={"messages": [message]}
+            )
+        while stream_manager is not None:
+            pending_run = None
+            async with stream_manager as stream:
+                async for event in stream:
+                    if event.event == "thread.run.created":
+                        logger.info(f"Run created successfully: {event.data.id}")
+                        if not thread_id:
+                            thread_id = event.data.thread_id
+                            await asyncio.to_thread(
+                                self._sync._save_new_stream_thread, user_id, thread_id
+                            )
+                        self._sync.store_active_run(thread_id, event.data.id)
+                        await asyncio.to_thread(
+                            checkpoint.record_run, thread_id, event.data.id
+                        )
+                    elif event.event == "thread.message.completed":
+                        response_text = self._sync._extract_assistant_text(
+                            [event.data]
+                        )
+                    elif event.event == "thread.run.requires_action":
+                        pending_run = event.data
+                        break
+                    elif event.event == "thread.run.completed":
+                        self._sync.delete_active_run(thread_id)
+                        response_text = response_text or "No response from assistant."
+                        await asyncio.to_thread(checkpoint.complete, response_text)
+                        await asyncio.to_thread(
+                            thread_lifecycle.record_turn,
+                            thread_id,
+                            user_id,
+                            event.data.usage,
+                        )
+                        return response_text
+                    elif event.event in [
+                        "thread.run.failed",
+                        "thread.run.expired",
+                        "thread.run.cancelled",
+                        "thread.run.incomplete",
+                    ]:
+                        logger.warning(f"Run ended with status: {event.data.status}")
+                        await self.cleanup_active_run(thread_id)
+                        return f"Error: {event.data.status}"
+                    elif event.event == "error":
+                        raise RuntimeError(f"Run stream error: {event.data}")
+
+                    if time.time() - start_time > timeout:
+                        break
+
+            if pending_run is None or time.time() - start_time > timeout:
+                break
+            tool_outputs = await self._collect_tool_outputs(
+                thread_id,
+                pending_run.required_action.submit_tool_outputs.tool_calls,
+                user_id,
+                checkpoint,
+            )
+            client = self._budgeted_client("streaming the run")
+            stream_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id, run_id=pending_run.id, tool_outputs=tool_outputs
+            )
+            await asyncio.to_thread(checkpoint.record_submitted)
+
+        logger.error("Conversation run timed out")
+        await self.cleanup_active_run(thread_id)
+        return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
+
+    async def _collect_tool_outputs(
+        self,
+        thread_id: str,
+        tool_calls: List[Any],
+        user_id: str,
+        checkpoint: TurnCheckpoint,
+    ) -> List[Dict[str, str]]:
+        """Reuse checkpointed write outputs, run the rest (see ``AssistantManager``)."""
+        tool_outputs = checkpoint.reusable_outputs(tool_calls)
+        pending = [
+            tool_call
+            for idx, tool_call in enumerate(tool_calls)
+            if idx not in tool_outputs
+        ]
+        if pending:
+            outputs = await self._run_tool_calls(thread_id, pending, user_id)
+            await asyncio.to_thread(
+                checkpoint.record_tool_outputs, *write_calls(pending, outputs)
+            )
+            outputs = iter(outputs)
+            for idx in range(len(tool_calls)):
+                if idx not in tool_outputs:
+                    tool_outputs[idx] = next(outputs)
+        return [tool_outputs[idx] for idx in range(len(tool_calls))]
+
+    async def _run_tool_calls(
+        self, thread_id: str, tool_calls: List[Any], user_id: str
+    ) -> List[Dict[str, str]]:
+        """
+        Execute the tool calls of a run: booking flow tools are awaited
+        directly, the others run on the shared tool executor.
+
+        Read-only tools are gathered concurrently; write tools and
+        ``getProfile`` run one after another, and once one of them times out
+        the rest are skipped. Outputs keep the order of ``tool_calls``.
+        """
+        total_tool_calls = len(tool_calls)
+        logger.info(f"Processing {total_tool_calls} tool calls for thread {thread_id}")
+        loop = asyncio.get_running_loop()
+        executor = get_tool_executor()
+        timeout = remaining_timeout(settings.TOOL_CALL_TIMEOUT_SECONDS, "running tools")
+
+        async_handlers = self._get_async_function_mapping()
+
+        async def execute(idx: int, tool_call: Any) -> Tuple[Dict[str, str], bool]:
+            handler = async_handlers.get(tool_call.function.name)
+            if handler is not None:
+                call = self._aexecute_tool_call(
+                    handler, tool_call, user_id, idx, total_tool_calls
+                )
+            else:
+                # Run in a copy of this context, so the tool sees the deadline
+                call = loop.run_in_executor(
+                    executor,
+                    contextvars.copy_context().run,
+                    self._sync._execute_tool_call,
+                    tool_call,
+                    user_id,
+                    idx,
+                    total_tool_calls,
+                )
+            try:
+                return await asyncio.wait_for(call, timeout), False
+            except asyncio.TimeoutError:
+                return tool_timeout_output(tool_call, timeout), True
+
+        async def execute_serialized() -> Dict[int, Dict[str, str]]:
+            outputs = {}
+            timed_out = False
+            for idx, tool_call in enumerate(tool_calls):
+                if not runs_serialized(tool_call):
+                    continue
+                if timed_out:
+                    # A call on the executor may still be running; starting
+                    # the next write now could overlap it
+                    outputs[idx] = tool_skipped_output(tool_call)
+                    continue
+                outputs[idx], timed_out = await execute(idx, tool_call)
+            return outputs
+
+        read_indexes = [
+            idx
+            for idx, tool_call in enumerate(tool_calls)
+            if not runs_serialized(tool_call)
+        ]
+        serialized_outputs, *read_outputs = await asyncio.gather(
+            execute_serialized(),
+            *(execute(idx, tool_calls[idx]) for idx in read_indexes),
+        )
+        tool_outputs = [None] * total_tool_calls
+        for idx, output in serialized_outputs.items():
+            tool_outputs[idx] = output
+        for idx, (output, _) in zip(read_indexes, read_outputs):
+            tool_outputs[idx] = output
+        return tool_outputs
+
+    async def _aexecute_tool_call(
+        self,
+        handler: Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+        tool_call: Any,
+        user_id: str,
+        idx: int,
+        total_tool_calls: int,
+    ) -> Dict[str, str]:
+        """Awaitable ``AssistantManager._execute_tool_call`` for async handlers."""
+        function_name = tool_call.function.name
+        tool_start_time = time.time()
+        try:
+            raw_args = tool_call.function.arguments
+            try:
+                arguments = json.loads(raw_args) if raw_args else {}
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse arguments: {raw_args}")
+                arguments = {}
+            arg_string = ", ".join([f"{k}={v}" for k, v in arguments.items()])
+            logger.info(
+                f"Tool {idx+1}/{total_tool_calls}: Executing {function_name}({arg_string})"
+            )
+            try:
+                result = await handler(arguments, user_id)
+            except TypeError as e:
+                logger.error(f"Parameter mismatch in {function_name}: {e}")
+                result = {"status": "error", "message": f"Parameter error: {str(e)}"}
+            tool_execution_time = time.time() - tool_start_time
+            logger.info(
+                f"Tool {idx+1}/{total_tool_calls}: {function_name} completed with status '{result.get('status', 'unknown')}' in {tool_execution_time:.2f}s"
+            )
+            metrics.observe(f"tools.{function_name}.seconds", tool_execution_time)
+            return {
+                "tool_call_id": tool_call.id,
+                "output": serialize_tool_output(function_name, result),
+            }
+        except Exception as e:
+            tool_execution_time = time.time() - tool_start_time
+            logger.error(
+                f"Tool {idx+1}/{total_tool_calls}: Error in {function_name}: {str(e)} after {tool_execution_time:.2f}s"
+            )
+            return {"tool_call_id": tool_call.id, "output": json.dumps({"error": str(e)})}
+
+    async def handle_tool_calls(
+        self,
+        thread_id: str,
+        run_id: str,
+        tool_calls: List[Dict[Any, Any]],
+        user_id: str,
+        checkpoint: Optional[TurnCheckpoint] = None,
+    ) -> None:
+        """Run the requested tools and submit their outputs."""
+        start_time = time.time()
+        checkpoint = checkpoint or TurnCheckpoint(turn_id=None, mobile_number=user_id)
+        tool_outputs = await self._collect_tool_outputs(
+            thread_id, tool_calls, user_id, checkpoint
+        )
+
+        try:
+            client = self._budgeted_client("submitting tool outputs")
+            await client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs
+            )
+            await asyncio.to_thread(checkpoint.record_submitted)
+            logger.info(
+                f"Tool outputs submitted (total tool handling: {time.time() - start_time:.2f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Error submitting tool outputs: {e}")
+            try:
+                await self.client.beta.threads.runs.cancel(
+                    thread_id=thread_id, run_id=run_id
+                )
+            except Exception as cancel_error:
+                logger.error(
+                    f"Failed to cancel run after submission error: {cancel_error}"
+                )
+
+    async def get_run_response(self, thread_id: str, run_id: str) -> str:
+        """Get the assistant message produced by a run."""
+        try:
+            page = await self.client.beta.threads.messages.list(
+                thread_id=thread_id, run_id=run_id, order="desc", limit=1
+            )
+            return self._sync._extract_assistant_text(page.data)
+        except Exception as e:
+            logger.error(f"Error retrieving assistant response: {e}")
+            return "Error retrieving response."
@@ -0,0 +1,338 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletionMessageToolCall
+
+from .agent import (
+    acquire_conversation_lease,
+    get_assistant_manager,
+    get_openai_client,
+    logger,
+    release_conversation_lease,
+)
+from .async_agent import (
+    async_conversation_locks,
+    get_async_assistant_manager,
+    get_async_openai_client,
+)
+from .core.config import settings
+from .db.session import SessionLocal
+from .repositories.conversation_repository import ConversationRepository
+from .services.turn_checkpoint_service import TurnCheckpoint
+from .utils.deadline_util import (
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_scope,
+    remaining_timeout,
+)
+from .utils.metrics_util import metrics
+
+BACKEND_ASSISTANTS = "assistants"
+BACKEND_CHAT = "chat"
+
+_singleton_lock = threading.Lock()
+_chat_manager: Optional["ChatCompletionsManager"] = None
+_async_chat_manager: Optional["AsyncChatCompletionsManager"] = None
+
+
+def _digits(number: Optional[str]) -> str:
+    return "".join(filter(str.isdigit, number or ""))
+
+
+def backend_for(to_number: Optional[str]) -> str:
+    """
+    Conversation backend of the tenant an inbound message was sent to.
+
+    ``ASSISTANT_BACKEND`` is the default; business numbers listed in
+    ``CHAT_COMPLETIONS_SENDERS`` always use the Chat Completions backend.
+    """
+    chat_senders = {
+        _digits(number) for number in settings.CHAT_COMPLETIONS_SENDERS.split(",")
+    }
+    if to_number and _digits(to_number) in chat_senders:
+        return BACKEND_CHAT
+    return settings.ASSISTANT_BACKEND
+
+
+def get_chat_manager() -> "ChatCompletionsManager":
+    """Return the process-wide ChatCompletionsManager, creating it on first use."""
+    global _chat_manager
+    if _chat_manager is None:
+        with _singleton_lock:
+            if _chat_manager is None:
+                _chat_manager = ChatCompletionsManager(settings.OPENAI_ASSISTANT_ID)
+    return _chat_manager
+
+
+def get_async_chat_manager() -> "AsyncChatCompletionsManager":
+    """Return the process-wide AsyncChatCompletionsManager, creating it on first use."""
+    global _async_chat_manager
+    if _async_chat_manager is None:
+        with _singleton_lock:
+            if _async_chat_manager is None:
+                _async_chat_manager = AsyncChatCompletionsManager(
+                    settings.OPENAI_ASSISTANT_ID
+                )
+    return _async_chat_manager
+
+
+class _AssistantConfig:
+    """Model, instructions and tools of the configured assistant, fetched once."""
+
+    def __init__(self, assistant_id: str):
+        self.assistant_id = assistant_id
+        self._loaded: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def get(self, client: OpenAI) -> Dict[str, Any]:
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    assistant = client.beta.assistants.retrieve(self.assistant_id)
+                    self._loaded = {
+                        "model": settings.CHAT_COMPLETIONS_MODEL or assistant.model,
+                        "instructions": assistant.instructions or "",
+                        "tools": [
+                            {
+                                "type": "function",
+                                "function": tool.function.model_dump(exclude_none=True),
+                            }
+                            for tool in assistant.tools
+                            if tool.type == "function"
+                        ],
+                        "temperature": assistant.temperature,
+                    }
+                    logger.info(
+                        f"Loaded assistant {self.assistant_id} for chat completions: "
+                        f"model {self._loaded['model']}, {len(self._loaded['tools'])} tools"
+                    )
+        return self._loaded
+
+
+class ChatCompletionsManager:
+    """
+    Conversation backend that keeps history in our own ``ConversationMessages``
+    table and answers each step with a single Chat Completions request.
+
+    The model, instructions and tool definitions are taken from the configured
+    assistant, so both backends behave alike and can be switched per tenant
+    (see ``backend_for``). Tool calls are executed by the AssistantManager,
+    including its concurrency, timeouts and checkpointing. Only the last
+    ``CHAT_HISTORY_MAX_MESSAGES`` entries are sent, which keeps the context
+    size under our control.
+    """
+
+    def __init__(self, assistant_id: str, client: OpenAI = None):
+        self.assistant_id = assistant_id
+        self.client = client or get_openai_client()
+        self._assistants = get_assistant_manager()
+        self._config = _AssistantConfig(assistant_id)
+
+    def run_conversation(
+        self, user_id: str, question: str, turn_id: Optional[str] = None
+    ) -> str:
+        """Run a conversation turn (same contract as ``AssistantManager.run_conversation``)."""
+        deadline = current_deadline() or Deadline(settings.TURN_DEADLINE_SECONDS)
+        with self._assistants.conversation_guard(user_id), deadline_scope(deadline):
+            checkpoint = TurnCheckpoint.load(turn_id, user_id)
+            if checkpoint.completed:
+                return checkpoint.response_text
+            try:
+                config = self._config.get(self.client)
+                history = self._load_history(user_id)
+                turn_messages = [self._assistants._user_message(question)]
+                for _ in range(settings.CHAT_MAX_TOOL_ROUNDS):
+                    message = self._complete(config, history + turn_messages)
+                    turn_messages.append(message)
+                    if not message.get("tool_calls"):
+                        return self._finish(user_id, turn_messages, checkpoint)
+                    tool_calls = self._tool_calls(message)
+                    outputs = self._assistants._collect_tool_outputs(
+                        f"chat:{user_id}", tool_calls, user_id, checkpoint
+                    )
+                    turn_messages.extend(self._tool_messages(outputs))
+                logger.error(f"Too many tool rounds for user {user_id}")
+                return "I'm sorry, but I could not complete your request. Please try again."
+            except DeadlineExceeded as e:
+                logger.error(f"Conversation turn out of time: {e}")
+                return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
+
+    def record_exchange(self, user_id: str, question: str, answer: str) -> None:
+        """Append a turn answered without the model to the user's history."""
+        with self._assistants.conversation_guard(user_id):
+            self._append_exchange(user_id, question, answer)
+
+    def _append_exchange(self, user_id: str, question: str, answer: str) -> None:
+        db = SessionLocal()
+        try:
+            ConversationRepository(db).append(
+                user_id,
+                [
+                    self._assistants._user_message(question),
+                    {"role": "assistant", "content": answer},
+                ],
+            )
+        except Exception as e:
+            logger.warning(f"Could not record the exchange for {user_id}: {e}")
+        finally:
+            db.close()
+
+    def _complete(
+        self, config: Dict[str, Any], messages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        client = self.client.with_options(
+            timeout=remaining_timeout(
+                settings.OPENAI_REQUEST_TIMEOUT_SECONDS, "chat completion"
+            )
+        )
+        start = time.perf_counter()
+        completion = client.chat.completions.create(**self._request(config, messages))
+        return self._record_completion(completion, start)
+
+    @staticmethod
+    def _request(
+        config: Dict[str, Any], messages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        request = {
+            "model": config["model"],
+            "messages": [{"role": "system", "content": config["instructions"]}]
+            + messages,
+        }
+        if config["tools"]:
+            request["tools"] = config["tools"]
+        if config["temperature"] is not None:
+            request["temperature"] = config["temperature"]
+        return request
+
+    @staticmethod
+    def _record_completion(completion: Any, start: float) -> Dict[str, Any]:
+        metrics.increment("chat_completions.requests")
+        metrics.observe("chat_completions.seconds", time.perf_counter() - start)
+        if completion.usage is not None:
+            metrics.observe(
+                "chat_completions.prompt_tokens", completion.usage.prompt_tokens
+            )
+        message = completion.choices[0].message
+        entry = {"role": "assistant", "content": message.content}
+        if message.tool_calls:
+            entry["tool_calls"] = [
+                tool_call.model_dump(exclude_none=True)
+                for tool_call in message.tool_calls
+            ]
+        return entry
+
+    @staticmethod
+    def _tool_calls(message: Dict[str, Any]) -> List[Any]:
+        return [
+            ChatCompletionMessageToolCall.model_validate(tool_call)
+            for tool_call in message["tool_calls"]
+        ]
+
+    @staticmethod
+    def _tool_messages(outputs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "role": "tool",
+                "tool_call_id": output["tool_call_id"],
+                "content": output["output"],
+            }
+            for output in outputs
+        ]
+
+    def _load_history(self, user_id: str) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return ConversationRepository(db).recent(
+                user_id, settings.CHAT_HISTORY_MAX_MESSAGES
+            )
+        finally:
+            db.close()
+
+    def _finish(
+        self,
+        user_id: str,
+        turn_messages: List[Dict[str, Any]],
+        checkpoint: TurnCheckpoint,
+    ) -> str:
+        """Store the turn in the history and return the assistant's reply."""
+        response = turn_messages[-1].get("content") or "No response from assistant."
+        db = SessionLocal()
+        try:
+            repository = ConversationRepository(db)
+            repository.append(user_id, turn_messages)
+            repository.prune(user_id, settings.CHAT_HISTORY_MAX_MESSAGES * 2)
+        finally:
+            db.close()
+        checkpoint.complete(response)
+        return response
+
+
+class AsyncChatCompletionsManager(ChatCompletionsManager):
+    """Chat Completions backend for the asyncio engine."""
+
+    def __init__(self, assistant_id: str, client: AsyncOpenAI = None):
+        super().__init__(assistant_id, client=get_openai_client())
+        self.async_client = client or get_async_openai_client()
+        self._async_assistants = get_async_assistant_manager()
+
+    async def record_exchange(self, user_id: str, question: str, answer: str) -> None:
+        async with async_conversation_locks.ahold(user_id):
+            await asyncio.to_thread(self._append_exchange, user_id, question, answer)
+
+    async def run_conversation(
+        self, user_id: str, question: str, turn_id: Optional[str] = None
+    ) -> str:
+        """Run a conversation turn without blocking the event loop."""
+        deadline = current_deadline() or Deadline(settings.TURN_DEADLINE_SECONDS)
+        async with async_conversation_locks.ahold(user_id):
+            owner = await asyncio.to_thread(acquire_conversation_lease, user_id)
+            try:
+                with deadline_scope(deadline):
+                    return await self._run_conversation(user_id, question, turn_id)
+            finally:
+                await asyncio.to_thread(release_conversation_lease, user_id, owner)
+
+    async def _run_conversation(
+        self, user_id: str, question: str, turn_id: Optional[str]
+    ) -> str:
+        checkpoint = await asyncio.to_thread(TurnCheckpoint.load, turn_id, user_id)
+        if checkpoint.completed:
+            return checkpoint.response_text
+        try:
+            config = await asyncio.to_thread(self._config.get, self.client)
+            history = await asyncio.to_thread(self._load_history, user_id)
+            turn_messages = [self._assistants._user_message(question)]
+            for _ in range(settings.CHAT_MAX_TOOL_ROUNDS):
+                message = await self._acomplete(config, history + turn_messages)
+                turn_messages.append(message)
+                if not message.get("tool_calls"):
+                    return await asyncio.to_thread(
+                        self._finish, user_id, turn_messages, checkpoint
+                    )
+                outputs = await self._async_assistants._collect_tool_outputs(
+                    f"chat:{user_id}", self._tool_calls(message), user_id, checkpoint
+                )
+                turn_messages.extend(self._tool_messages(outputs))
+            logger.error(f"Too many tool rounds for user {user_id}")
+            return "I'm sorry, but I could not complete your request. Please try again."
+        except DeadlineExceeded as e:
+            logger.error(f"Conversation turn out of time: {e}")
+            return "I'm sorry, but your request is taking longer than expected. Please try again with a simpler question."
+
+    async def _acomplete(
+        self, config: Dict[str, Any], messages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        client = self.async_client.with_options(
+            timeout=remaining_timeout(
+                settings.OPENAI_REQUEST_TIMEOUT_SECONDS, "chat completion"
+            )
+        )
+        start = time.perf_counter()
+        completion = await client.chat.completions.create(
+            **self._request(config, messages)
+        )
+        return self._record_completion(completion, start)
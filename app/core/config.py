@@ -18,6 +18,74 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     TIME_GLOBE_API_KEY: str
     ACCESS_TOKEN_EXPIRE_TIME: int = 30
+    ADMIN_EMAILS: str = ""  # comma-separated accounts allowed to run admin actions
+    MESSAGE_WORKER_COUNT: int = 4
+    MESSAGE_QUEUE_MAX_SIZE: int = 500
+    MESSAGE_WORKER_MODE: str = "inprocess"  # "inprocess" or "external"
+    INBOX_LEASE_SECONDS: int = 300
+    INBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    INBOX_MAX_ATTEMPTS: int = 3
+    TURN_CHECKPOINT_MAX_AGE_HOURS: float = 24.0  # 0 = keep forever
+    MESSAGE_COALESCE_WINDOW_SECONDS: float = 0.0
+    MESSAGE_COALESCE_MAX_DELAY_SECONDS: float = 8.0
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    OPENAI_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_MAX_RETRIES: int = 2
+    ASSISTANT_ENGINE: str = "sync"  # "sync" or "async"
+    ASYNC_CONVERSATION_CONCURRENCY: int = 200
+    ASSISTANT_RUN_MODE: str = "poll"  # "poll" or "stream"
+    TOOL_EXECUTOR_MAX_WORKERS: int = 16
+    TOOL_CALL_TIMEOUT_SECONDS: float = 30.0
+    CONVERSATION_LOCK_TIMEOUT_SECONDS: float = 120.0
+    CONVERSATION_LEASE_ENABLED: bool = False
+    CONVERSATION_LEASE_SECONDS: int = 300
+    THREAD_CACHE_SIZE: int = 10000
+    THREAD_CACHE_TTL_SECONDS: float = 60.0
+    ACTIVE_RUN_FLUSH_INTERVAL_SECONDS: float = 1.0
+    RUN_POLLER_WORKERS: int = 4
+    RUN_POLL_MIN_INTERVAL_SECONDS: float = 0.3
+    RUN_POLL_MAX_INTERVAL_SECONDS: float = 2.0
+    THREAD_POOL_SIZE: int = 0  # pre-created OpenAI threads, 0 = disabled
+    THREAD_POOL_LOW_WATER: int = 5
+    TURN_DEADLINE_SECONDS: float = 90.0
+    OUTBOUND_HTTP_TIMEOUT_SECONDS: float = 15.0
+    TIME_GLOBE_MAX_CONNECTIONS: int = 20
+    TIME_GLOBE_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    TIME_GLOBE_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    TIME_GLOBE_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    # Per-endpoint overrides of OUTBOUND_HTTP_TIMEOUT_SECONDS
+    TIME_GLOBE_ENDPOINT_TIMEOUTS: str = "/bot/book=30,/bot/cancel=30"
+    CATALOG_CACHE_TTL_SECONDS: float = 3600.0  # 0 = no caching
+    CATALOG_CACHE_MAX_STALE_SECONDS: float = 86400.0
+    CATALOG_CACHE_RETRY_SECONDS: float = 60.0
+    CACHE_INVALIDATION_CHECK_SECONDS: float = 1.0  # shared invalidations
+    AVAILABILITY_CACHE_TTL_SECONDS: float = 60.0  # 0 = no caching
+    AVAILABILITY_CACHE_SIZE: int = 2000
+    TIME_GLOBE_TOKEN_TTL_SECONDS: float = 3600.0  # when the JWT has no exp claim
+    TIME_GLOBE_TOKEN_REFRESH_MARGIN_SECONDS: float = 300.0
+    TIME_GLOBE_TOKEN_SHARED: bool = True  # share the token via ServiceTokens
+    ASSISTANT_BACKEND: str = "assistants"  # "assistants" or "chat"
+    CHAT_COMPLETIONS_SENDERS: str = ""  # business numbers always on "chat"
+    CHAT_COMPLETIONS_MODEL: str = ""  # defaults to the assistant's model
+    CHAT_HISTORY_MAX_MESSAGES: int = 40
+    CHAT_MAX_TOOL_ROUNDS: int = 8
+    THREAD_ROTATE_MAX_MESSAGES: int = 60  # 0 = no limit
+    THREAD_ROTATE_MAX_PROMPT_TOKENS: int = 16000  # 0 = no limit
+    THREAD_ROTATE_IDLE_HOURS: float = 72.0  # 0 = never rotate for inactivity
+    THREAD_SUMMARY_MODEL: str = "gpt-4o-mini"
+    THREAD_GC_INTERVAL_SECONDS: float = 3600.0  # 0 = no garbage collection
+    THREAD_GC_IDLE_DAYS: int = 180
+    THREAD_GC_BATCH_SIZE: int = 100
+    INTENT_ROUTER_ENABLED: bool = True
+    INTENT_ROUTER_DEFAULT_LANGUAGE: str = "de"  # reply language for "hi"/"hey"
+    TOOL_OUTPUT_COMPACTION: bool = True
+    TOOL_OUTPUT_MAX_ITEMS: int = 60  # products/employees sent to the model
+    TOOL_OUTPUT_MAX_DAYS: int = 7
+    TOOL_OUTPUT_MAX_SLOTS_PER_DAY: int = 16
 
     class Config:
         env_file = ".env"
@@ -35,6 +35,18 @@ def get_current_user(
     return get_auth_service(db).get_current_user(token)
 
 
+def get_current_admin(current_user=Depends(get_current_user)):
+    """The current user, if listed in ``ADMIN_EMAILS``; 403 otherwise."""
+    admins = {
+        email.strip().lower()
+        for email in settings.ADMIN_EMAILS.split(",")
+        if email.strip()
+    }
+    if (current_user.email or "").lower() not in admins:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
 def get_subscription_service(db: Session = Depends(get_db)):
     return SubscriptionPlanService(db)
 
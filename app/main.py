@@ -1,11 +1,28 @@
 from fastapi import FastAPI
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import twilio_route, auth_route, subscription_route
+from .routes import (
+    twilio_route,
+    auth_route,
+    subscription_route,
+    metrics_route,
+    catalog_route,
+)
 from .models.base import Base
 from .db.session import engine
 from app.routes import onboarding_route
 from app.models.onboarding_model import Business, WABAStatus
+from .models.conversation_lease import ConversationLeaseModel
+from .models.conversation_message import ConversationMessageModel
+from .models.service_token import ServiceTokenModel
+from .models.cache_generation import CacheGenerationModel
+from .models.thread_usage import ThreadUsageModel
+from .services.message_queue_service import message_queue_service
+from .services.active_run_service import active_run_registry
+from .services.thread_lifecycle_service import thread_lifecycle
+from .services.thread_pool_service import thread_pool
+from .services.time_globe_service import time_globe_tokens
+from .core.config import settings
 
 
 
@@ -33,6 +50,29 @@ app.include_router(
     tags=["Subscriptions"],
 )
 app.include_router(onboarding_route.router)
+app.include_router(router=metrics_route.router, prefix="/api/metrics", tags=["Metrics"])
+app.include_router(router=catalog_route.router, prefix="/api/catalog", tags=["Catalog"])
+
+
+@app.on_event("startup")
+def start_message_workers():
+    active_run_registry.load()
+    # In "external" mode messages are only persisted here and processed by
+    # separately deployed `python -m app.worker` processes
+    if settings.MESSAGE_WORKER_MODE == "inprocess":
+        thread_pool.start()
+        thread_lifecycle.start()
+        time_globe_tokens.start()
+        message_queue_service.start()
+
+
+@app.on_event("shutdown")
+def stop_message_workers():
+    message_queue_service.stop()
+    active_run_registry.stop()
+    thread_pool.stop()
+    thread_lifecycle.stop()
+    time_globe_tokens.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, Integer
+from datetime import datetime
+from .base import Base
+
+
+class CacheGenerationModel(Base):
+    """Invalidation counter of a per-process cache, shared by all worker processes."""
+
+    __tablename__ = "CacheGenerations"
+
+    name = Column(String, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from .base import Base
+
+
+class ConversationLeaseModel(Base):
+    """Cross-process lease that lets only one worker run a user's conversation."""
+
+    __tablename__ = "ConversationLeases"
+
+    mobile_number = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    acquired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from .base import Base
+
+
+class ConversationMessageModel(Base):
+    """
+    One entry of a user's conversation history, kept locally for the Chat
+    Completions backend (the Assistants backend keeps history in its thread).
+    """
+
+    __tablename__ = "ConversationMessages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    mobile_number = Column(String, nullable=False, index=True)
+    role = Column(String, nullable=False)  # user, assistant or tool
+    content = Column(Text, nullable=True)
+    # JSON list of the tool calls an assistant message requested
+    tool_calls = Column(Text, nullable=True)
+    tool_call_id = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
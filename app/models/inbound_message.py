@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from datetime import datetime
+from .base import Base
+
+
+class InboundMessageModel(Base):
+    """Durable inbox of WhatsApp messages waiting for a conversation worker."""
+
+    __tablename__ = "InboundMessages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    message_sid = Column(String, nullable=True, unique=True, index=True)
+    sender_number = Column(String, nullable=False, index=True)
+    to_number = Column(String, nullable=True)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    response_text = Column(Text, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Not claimable before this time; pushed back while the sender keeps typing
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime, Text
+from datetime import datetime
+from .base import Base
+
+
+class ServiceTokenModel(Base):
+    """Access token of an upstream API, shared by all worker processes."""
+
+    __tablename__ = "ServiceTokens"
+
+    service = Column(String, primary_key=True)
+    token = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    # Refresh lease: only its owner logs in until it expires
+    refresh_owner = Column(String, nullable=True)
+    refresh_until = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from datetime import datetime
+from .base import Base
+
+
+class ThreadUsageModel(Base):
+    """Size and activity of an OpenAI thread, used to rotate and garbage-collect threads."""
+
+    __tablename__ = "ThreadUsage"
+
+    thread_id = Column(String, primary_key=True)
+    mobile_number = Column(String, nullable=False, index=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    # Prompt tokens of the thread's latest run, i.e. the size of its context
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_activity_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Set once the thread was replaced; retired threads are deleted by the GC
+    retired_at = Column(DateTime, nullable=True, index=True)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, DateTime, Text
+from datetime import datetime
+from .base import Base
+
+
+class TurnCheckpointModel(Base):
+    """Progress of one conversation turn, so a retry resumes instead of repeating work."""
+
+    __tablename__ = "TurnCheckpoints"
+
+    turn_id = Column(String, primary_key=True)
+    mobile_number = Column(String, nullable=False, index=True)
+    stage = Column(String, nullable=False, default="started")
+    thread_id = Column(String, nullable=True)
+    run_id = Column(String, nullable=True)
+    # JSON object: "run_id:tool_call_id" -> {"call", "output", "reused"} of
+    # the write tools that already ran
+    tool_outputs = Column(Text, nullable=True)
+    response_text = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -0,0 +1,53 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime
+from ..models.cache_generation import CacheGenerationModel
+from ..logger import main_logger
+
+
+class CacheGenerationRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, name: str) -> int:
+        """Current generation of cache ``name`` (0 before its first bump)."""
+        try:
+            row = (
+                self.db.query(CacheGenerationModel.generation)
+                .filter(CacheGenerationModel.name == name)
+                .first()
+            )
+            return row.generation if row else 0
+        except Exception as e:
+            main_logger.error(f"Error retrieving cache generation: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def bump(self, name: str) -> int:
+        """Increment the generation of cache ``name`` and return the new value."""
+        try:
+            for _ in range(2):
+                updated = (
+                    self.db.query(CacheGenerationModel)
+                    .filter(CacheGenerationModel.name == name)
+                    .update(
+                        {
+                            CacheGenerationModel.generation: CacheGenerationModel.generation
+                            + 1,
+                            CacheGenerationModel.updated_at: datetime.utcnow(),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                if not updated:
+                    self.db.add(CacheGenerationModel(name=name, generation=1))
+                try:
+                    self.db.commit()
+                    return self.get(name)
+                except IntegrityError:
+                    # Another process created the row first; increment it
+                    self.db.rollback()
+            raise Exception(f"Could not bump cache generation {name}")
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error bumping cache generation: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
@@ -0,0 +1,71 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from ..models.conversation_lease import ConversationLeaseModel
+from ..logger import main_logger
+
+
+class ConversationLeaseRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def acquire(self, mobile_number: str, owner: str, lease_seconds: int) -> bool:
+        """
+        Take the lease for ``mobile_number`` if it is free or expired.
+
+        Returns False while another owner holds an unexpired lease.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        try:
+            taken = (
+                self.db.query(ConversationLeaseModel)
+                .filter(
+                    ConversationLeaseModel.mobile_number == mobile_number,
+                    or_(
+                        ConversationLeaseModel.expires_at < now,
+                        ConversationLeaseModel.owner == owner,
+                    ),
+                )
+                .update(
+                    {
+                        ConversationLeaseModel.owner: owner,
+                        ConversationLeaseModel.expires_at: expires_at,
+                        ConversationLeaseModel.acquired_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if not taken:
+                self.db.add(
+                    ConversationLeaseModel(
+                        mobile_number=mobile_number,
+                        owner=owner,
+                        expires_at=expires_at,
+                        acquired_at=now,
+                    )
+                )
+            self.db.commit()
+            return True
+        except IntegrityError:
+            # The row exists and is held by someone else
+            self.db.rollback()
+            return False
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error acquiring conversation lease: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def release(self, mobile_number: str, owner: str) -> None:
+        """Drop the lease if ``owner`` still holds it."""
+        try:
+            self.db.query(ConversationLeaseModel).filter(
+                ConversationLeaseModel.mobile_number == mobile_number,
+                ConversationLeaseModel.owner == owner,
+            ).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error releasing conversation lease: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
@@ -0,0 +1,84 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+import json
+from ..models.conversation_message import ConversationMessageModel
+from ..logger import main_logger
+
+
+class ConversationRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recent(self, mobile_number: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        The last ``limit`` history entries of a user as chat messages, oldest
+        first. The window always starts at a user message, so it never opens
+        with tool results whose requesting assistant message was cut off.
+        """
+        try:
+            rows = (
+                self.db.query(ConversationMessageModel)
+                .filter(ConversationMessageModel.mobile_number == mobile_number)
+                .order_by(ConversationMessageModel.id.desc())
+                .limit(limit)
+                .all()
+            )
+        except Exception as e:
+            main_logger.error(f"Error retrieving conversation history: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+        rows.reverse()
+        while rows and rows[0].role != "user":
+            rows.pop(0)
+        messages = []
+        for row in rows:
+            message = {"role": row.role, "content": row.content}
+            if row.tool_calls:
+                message["tool_calls"] = json.loads(row.tool_calls)
+            if row.tool_call_id:
+                message["tool_call_id"] = row.tool_call_id
+            messages.append(message)
+        return messages
+
+    def append(self, mobile_number: str, messages: List[Dict[str, Any]]) -> None:
+        """Store the messages of one completed turn in a single transaction."""
+        try:
+            for message in messages:
+                tool_calls = message.get("tool_calls")
+                self.db.add(
+                    ConversationMessageModel(
+                        mobile_number=mobile_number,
+                        role=message["role"],
+                        content=message.get("content"),
+                        tool_calls=json.dumps(tool_calls) if tool_calls else None,
+                        tool_call_id=message.get("tool_call_id"),
+                    )
+                )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error storing conversation history: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def prune(self, mobile_number: str, keep: int) -> None:
+        """Drop all but the newest ``keep`` history entries of a user."""
+        try:
+            cutoff = (
+                self.db.query(ConversationMessageModel.id)
+                .filter(ConversationMessageModel.mobile_number == mobile_number)
+                .order_by(ConversationMessageModel.id.desc())
+                .offset(keep)
+                .limit(1)
+                .scalar()
+            )
+            if cutoff is None:
+                return
+            self.db.query(ConversationMessageModel).filter(
+                ConversationMessageModel.mobile_number == mobile_number,
+                ConversationMessageModel.id <= cutoff,
+            ).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error pruning conversation history: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
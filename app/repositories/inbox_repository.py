@@ -0,0 +1,324 @@
+from sqlalchemy import or_, and_, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from ..models.inbound_message import InboundMessageModel
+from ..logger import main_logger
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class InboxRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(
+        self,
+        sender_number: str,
+        body: str,
+        to_number: str = None,
+        message_sid: str = None,
+        coalesce_window: float = 0,
+        coalesce_max_delay: float = 0,
+    ) -> Tuple[InboundMessageModel, bool]:
+        """
+        Persist an inbound message so that it survives worker crashes.
+
+        With a ``coalesce_window`` the message, and every message from the same
+        sender that is still pending, becomes claimable only once the sender
+        has been quiet for that long (but never later than
+        ``coalesce_max_delay`` after the first message of the burst).
+
+        Returns ``(message, created)``. When a message with the same Twilio
+        MessageSid already exists, the stored row is returned with
+        ``created=False`` instead of inserting a duplicate.
+        """
+        main_logger.debug(f"Persisting inbound message from {sender_number}")
+        now = datetime.utcnow()
+        try:
+            available_at = now
+            if coalesce_window > 0:
+                available_at = now + timedelta(seconds=coalesce_window)
+                burst = (
+                    self.db.query(InboundMessageModel)
+                    .filter(
+                        InboundMessageModel.sender_number == sender_number,
+                        InboundMessageModel.status == STATUS_PENDING,
+                    )
+                    .all()
+                )
+                if burst:
+                    oldest = min(m.created_at for m in burst)
+                    available_at = min(
+                        available_at, oldest + timedelta(seconds=coalesce_max_delay)
+                    )
+                for pending in burst:
+                    pending.available_at = available_at
+
+            message = InboundMessageModel(
+                message_sid=message_sid,
+                sender_number=sender_number,
+                to_number=to_number,
+                body=body,
+                status=STATUS_PENDING,
+                created_at=now,
+                available_at=available_at,
+            )
+            self.db.add(message)
+            self.db.commit()
+            self.db.refresh(message)
+            return message, True
+        except IntegrityError:
+            self.db.rollback()
+            existing = self.get_by_message_sid(message_sid)
+            if existing is None:
+                raise
+            main_logger.info(f"Duplicate inbound message ignored: {message_sid}")
+            return existing, False
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error persisting inbound message: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def get_by_message_sid(self, message_sid: str) -> Optional[InboundMessageModel]:
+        """Retrieve an inbound message by its Twilio MessageSid."""
+        if not message_sid:
+            return None
+        return (
+            self.db.query(InboundMessageModel)
+            .filter(InboundMessageModel.message_sid == message_sid)
+            .first()
+        )
+
+    def count_pending(self) -> int:
+        """Number of messages that are waiting to be claimed."""
+        return (
+            self.db.query(InboundMessageModel)
+            .filter(InboundMessageModel.status == STATUS_PENDING)
+            .count()
+        )
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            and_(
+                InboundMessageModel.status == STATUS_PENDING,
+                InboundMessageModel.available_at <= now,
+            ),
+            and_(
+                InboundMessageModel.status == STATUS_PROCESSING,
+                InboundMessageModel.lease_expires_at < now,
+            ),
+        )
+
+    def claim_next(
+        self, worker_id: str, lease_seconds: int, max_attempts: int
+    ) -> List[InboundMessageModel]:
+        """
+        Claim the oldest claimable message, together with every other pending
+        message from the same sender, for ``worker_id``.
+
+        A message is claimable when it is pending and its coalescing window
+        has passed, or when the lease of the worker processing it has expired,
+        and no other worker is currently processing a turn for the sender.
+        Claims are compare-and-set updates, so concurrent workers in other
+        processes never claim the same row. Returns the claimed batch in
+        arrival order, or an empty list.
+        """
+        now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        try:
+            candidates = (
+                self.db.query(InboundMessageModel)
+                .filter(self._claimable(now))
+                .order_by(InboundMessageModel.created_at, InboundMessageModel.id)
+                .limit(10)
+                .all()
+            )
+            contended_senders = set()
+            for candidate in candidates:
+                if candidate.sender_number in contended_senders:
+                    continue
+                if candidate.attempts >= max_attempts:
+                    self._give_up([candidate], "Lease expired too many times")
+                    continue
+
+                # The sender must not have a turn in flight elsewhere, otherwise
+                # two workers would split one burst between them
+                busy = aliased(InboundMessageModel)
+                sender_busy = exists().where(
+                    busy.sender_number == candidate.sender_number,
+                    busy.status == STATUS_PROCESSING,
+                    busy.lease_expires_at >= now,
+                )
+                claimed = (
+                    self.db.query(InboundMessageModel)
+                    .filter(
+                        InboundMessageModel.id == candidate.id,
+                        InboundMessageModel.status == candidate.status,
+                        InboundMessageModel.attempts == candidate.attempts,
+                        ~sender_busy,
+                    )
+                    .update(
+                        {
+                            InboundMessageModel.status: STATUS_PROCESSING,
+                            InboundMessageModel.lease_owner: worker_id,
+                            InboundMessageModel.lease_expires_at: lease_expires_at,
+                            InboundMessageModel.attempts: candidate.attempts + 1,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                self.db.commit()
+                if not claimed:
+                    # Another worker owns this sender's burst
+                    contended_senders.add(candidate.sender_number)
+                    continue
+
+                # Fold the rest of the sender's burst into the same turn
+                self.db.query(InboundMessageModel).filter(
+                    InboundMessageModel.sender_number == candidate.sender_number,
+                    InboundMessageModel.id != candidate.id,
+                    or_(
+                        InboundMessageModel.status == STATUS_PENDING,
+                        and_(
+                            InboundMessageModel.status == STATUS_PROCESSING,
+                            InboundMessageModel.lease_expires_at < now,
+                        ),
+                    ),
+                ).update(
+                    {
+                        InboundMessageModel.status: STATUS_PROCESSING,
+                        InboundMessageModel.lease_owner: worker_id,
+                        InboundMessageModel.lease_expires_at: lease_expires_at,
+                        InboundMessageModel.attempts: InboundMessageModel.attempts
+                        + 1,
+                    },
+                    synchronize_session=False,
+                )
+                self.db.commit()
+
+                batch = (
+                    self.db.query(InboundMessageModel)
+                    .filter(
+                        InboundMessageModel.sender_number == candidate.sender_number,
+                        InboundMessageModel.status == STATUS_PROCESSING,
+                        InboundMessageModel.lease_owner == worker_id,
+                    )
+                    .order_by(InboundMessageModel.created_at, InboundMessageModel.id)
+                    .all()
+                )
+                main_logger.info(
+                    f"Worker {worker_id} claimed inbound messages {[m.id for m in batch]}"
+                )
+                return batch
+            return []
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error claiming inbound message: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def renew_lease(
+        self, message_ids: List[int], worker_id: str, lease_seconds: int
+    ) -> bool:
+        """Extend the lease held by ``worker_id``. Returns False if it was lost."""
+        try:
+            renewed = (
+                self.db.query(InboundMessageModel)
+                .filter(
+                    InboundMessageModel.id.in_(message_ids),
+                    InboundMessageModel.status == STATUS_PROCESSING,
+                    InboundMessageModel.lease_owner == worker_id,
+                )
+                .update(
+                    {
+                        InboundMessageModel.lease_expires_at: datetime.utcnow()
+                        + timedelta(seconds=lease_seconds)
+                    },
+                    synchronize_session=False,
+                )
+            )
+            self.db.commit()
+            return bool(renewed)
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(
+                f"Error renewing lease for messages {message_ids}: {str(e)}"
+            )
+            return False
+
+    def complete(
+        self, message_ids: List[int], worker_id: str, response_text: str
+    ) -> None:
+        """Mark claimed messages as processed and record the reply sent."""
+        try:
+            self.db.query(InboundMessageModel).filter(
+                InboundMessageModel.id.in_(message_ids),
+                InboundMessageModel.lease_owner == worker_id,
+            ).update(
+                {
+                    InboundMessageModel.status: STATUS_DONE,
+                    InboundMessageModel.response_text: response_text,
+                    InboundMessageModel.lease_owner: None,
+                    InboundMessageModel.lease_expires_at: None,
+                },
+                synchronize_session=False,
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error completing messages {message_ids}: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def release(
+        self, message_ids: List[int], worker_id: str, error: str, max_attempts: int
+    ) -> bool:
+        """
+        Return failed messages to the inbox, or fail them for good. Returns
+        True when any of them was given up on.
+        """
+        try:
+            messages = (
+                self.db.query(InboundMessageModel)
+                .filter(
+                    InboundMessageModel.id.in_(message_ids),
+                    InboundMessageModel.lease_owner == worker_id,
+                )
+                .all()
+            )
+            if not messages:
+                main_logger.warning(
+                    f"Worker {worker_id} no longer owns inbound messages {message_ids}"
+                )
+                return False
+            exhausted = [m for m in messages if m.attempts >= max_attempts]
+            if exhausted:
+                self._give_up(exhausted, error)
+            for message in messages:
+                if message.attempts >= max_attempts:
+                    continue
+                message.status = STATUS_PENDING
+                message.last_error = error
+                message.lease_owner = None
+                message.lease_expires_at = None
+            self.db.commit()
+            return bool(exhausted)
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error releasing messages {message_ids}: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def _give_up(self, messages: List[InboundMessageModel], error: str) -> None:
+        for message in messages:
+            main_logger.error(
+                f"Inbound message {message.id} failed after {message.attempts} attempts: {error}"
+            )
+            message.status = STATUS_FAILED
+            message.last_error = error
+            message.lease_owner = None
+            message.lease_expires_at = None
+        self.db.commit()
@@ -0,0 +1,116 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timedelta
+from ..models.service_token import ServiceTokenModel
+from ..logger import main_logger
+
+
+class ServiceTokenRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, service: str) -> Optional[ServiceTokenModel]:
+        """Retrieve the stored token of ``service``."""
+        try:
+            return (
+                self.db.query(ServiceTokenModel)
+                .filter(ServiceTokenModel.service == service)
+                .first()
+            )
+        except Exception as e:
+            main_logger.error(f"Error retrieving service token: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def claim_refresh(self, service: str, owner: str, lease_seconds: int) -> bool:
+        """
+        Take the refresh lease of ``service`` if nobody else holds an
+        unexpired one. Returns False while another process is refreshing.
+        """
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=lease_seconds)
+        try:
+            taken = (
+                self.db.query(ServiceTokenModel)
+                .filter(
+                    ServiceTokenModel.service == service,
+                    or_(
+                        ServiceTokenModel.refresh_until.is_(None),
+                        ServiceTokenModel.refresh_until < now,
+                        ServiceTokenModel.refresh_owner == owner,
+                    ),
+                )
+                .update(
+                    {
+                        ServiceTokenModel.refresh_owner: owner,
+                        ServiceTokenModel.refresh_until: until,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if not taken:
+                if self.get(service) is not None:
+                    self.db.rollback()
+                    return False
+                self.db.add(
+                    ServiceTokenModel(
+                        service=service,
+                        refresh_owner=owner,
+                        refresh_until=until,
+                        updated_at=now,
+                    )
+                )
+            self.db.commit()
+            return True
+        except IntegrityError:
+            # Another process created the row first
+            self.db.rollback()
+            return False
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error claiming token refresh: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def store(
+        self, service: str, owner: str, token: str, expires_at: datetime
+    ) -> None:
+        """Save a refreshed token and release the refresh lease."""
+        try:
+            self.db.query(ServiceTokenModel).filter(
+                ServiceTokenModel.service == service,
+                ServiceTokenModel.refresh_owner == owner,
+            ).update(
+                {
+                    ServiceTokenModel.token: token,
+                    ServiceTokenModel.expires_at: expires_at,
+                    ServiceTokenModel.refresh_owner: None,
+                    ServiceTokenModel.refresh_until: None,
+                    ServiceTokenModel.updated_at: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error storing service token: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def release(self, service: str, owner: str) -> None:
+        """Give up the refresh lease without changing the token."""
+        try:
+            self.db.query(ServiceTokenModel).filter(
+                ServiceTokenModel.service == service,
+                ServiceTokenModel.refresh_owner == owner,
+            ).update(
+                {
+                    ServiceTokenModel.refresh_owner: None,
+                    ServiceTokenModel.refresh_until: None,
+                },
+                synchronize_session=False,
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error releasing token refresh: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
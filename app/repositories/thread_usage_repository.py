@@ -0,0 +1,170 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from ..models.thread import ThreadModel
+from ..models.thread_usage import ThreadUsageModel
+from ..logger import main_logger
+
+
+class ThreadUsageRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, thread_id: str) -> Optional[ThreadUsageModel]:
+        """Retrieve the usage of a thread."""
+        try:
+            return (
+                self.db.query(ThreadUsageModel)
+                .filter(ThreadUsageModel.thread_id == thread_id)
+                .first()
+            )
+        except Exception as e:
+            main_logger.error(f"Error retrieving thread usage: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def record_turn(
+        self,
+        thread_id: str,
+        mobile_number: str,
+        messages: int,
+        prompt_tokens: Optional[int],
+    ) -> None:
+        """Count a completed turn on a thread, creating its usage row if needed."""
+        try:
+            usage = self.get(thread_id)
+            if usage is None:
+                usage = ThreadUsageModel(
+                    thread_id=thread_id,
+                    mobile_number=mobile_number,
+                    message_count=0,
+                    prompt_tokens=0,
+                )
+                self.db.add(usage)
+            usage.message_count += messages
+            if prompt_tokens is not None:
+                usage.prompt_tokens = prompt_tokens
+            usage.last_activity_at = datetime.utcnow()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error recording thread usage: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def rotate(
+        self,
+        mobile_number: str,
+        old_thread_id: str,
+        new_thread_id: str,
+        messages: int,
+    ) -> bool:
+        """
+        Point ``mobile_number`` at a new thread and retire the old one, in one
+        transaction. Returns False, changing nothing, when the number no
+        longer maps to ``old_thread_id``.
+        """
+        try:
+            replaced = (
+                self.db.query(ThreadModel)
+                .filter(
+                    ThreadModel.mobile_number == mobile_number,
+                    ThreadModel.thread_id == old_thread_id,
+                )
+                .update({"thread_id": new_thread_id}, synchronize_session=False)
+            )
+            if replaced != 1:
+                self.db.rollback()
+                return False
+            self.db.add(
+                ThreadUsageModel(
+                    thread_id=new_thread_id,
+                    mobile_number=mobile_number,
+                    message_count=messages,
+                    prompt_tokens=0,
+                )
+            )
+            self.db.query(ThreadUsageModel).filter(
+                ThreadUsageModel.thread_id == old_thread_id
+            ).update({"retired_at": datetime.utcnow()}, synchronize_session=False)
+            self.db.commit()
+            return True
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error rotating thread: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def list_retired(self, limit: int) -> List[ThreadUsageModel]:
+        try:
+            return (
+                self.db.query(ThreadUsageModel)
+                .filter(ThreadUsageModel.retired_at.isnot(None))
+                .order_by(ThreadUsageModel.retired_at)
+                .limit(limit)
+                .all()
+            )
+        except Exception as e:
+            main_logger.error(f"Error listing retired threads: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def list_idle(self, before: datetime, limit: int) -> List[ThreadUsageModel]:
+        """Threads in use whose last turn was before ``before``."""
+        try:
+            return (
+                self.db.query(ThreadUsageModel)
+                .filter(
+                    ThreadUsageModel.retired_at.is_(None),
+                    ThreadUsageModel.last_activity_at < before,
+                )
+                .order_by(ThreadUsageModel.last_activity_at)
+                .limit(limit)
+                .all()
+            )
+        except Exception as e:
+            main_logger.error(f"Error listing idle threads: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def track_untracked(self, limit: int) -> int:
+        """
+        Create usage rows for ``Threads`` entries that predate usage tracking,
+        so they age out like every other thread. Returns how many were added.
+        """
+        try:
+            untracked = (
+                self.db.query(ThreadModel)
+                .outerjoin(
+                    ThreadUsageModel,
+                    ThreadUsageModel.thread_id == ThreadModel.thread_id,
+                )
+                .filter(ThreadUsageModel.thread_id.is_(None))
+                .limit(limit)
+                .all()
+            )
+            for thread in untracked:
+                self.db.add(
+                    ThreadUsageModel(
+                        thread_id=thread.thread_id,
+                        mobile_number=thread.mobile_number,
+                        message_count=0,
+                        prompt_tokens=0,
+                    )
+                )
+            self.db.commit()
+            return len(untracked)
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error tracking existing threads: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def delete(self, thread_ids: List[str]) -> None:
+        """Forget collected threads, including their ``Threads`` mapping."""
+        try:
+            self.db.query(ThreadModel).filter(
+                ThreadModel.thread_id.in_(thread_ids)
+            ).delete(synchronize_session=False)
+            self.db.query(ThreadUsageModel).filter(
+                ThreadUsageModel.thread_id.in_(thread_ids)
+            ).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error deleting threads: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
@@ -0,0 +1,67 @@
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+from ..models.turn_checkpoint import TurnCheckpointModel
+from ..logger import main_logger
+
+
+class TurnCheckpointRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, turn_id: str) -> Optional[TurnCheckpointModel]:
+        """Retrieve the checkpoint of a turn."""
+        try:
+            return (
+                self.db.query(TurnCheckpointModel)
+                .filter(TurnCheckpointModel.turn_id == turn_id)
+                .first()
+            )
+        except Exception as e:
+            main_logger.error(f"Error retrieving turn checkpoint: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def save(self, turn_id: str, mobile_number: str, **fields) -> None:
+        """Create or update the checkpoint of a turn."""
+        try:
+            checkpoint = self.get(turn_id)
+            if checkpoint is None:
+                checkpoint = TurnCheckpointModel(
+                    turn_id=turn_id, mobile_number=mobile_number
+                )
+                self.db.add(checkpoint)
+            for name, value in fields.items():
+                setattr(checkpoint, name, value)
+            checkpoint.updated_at = datetime.utcnow()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error saving turn checkpoint: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def delete(self, turn_id: str) -> None:
+        """Drop the checkpoint of a finished turn."""
+        try:
+            self.db.query(TurnCheckpointModel).filter(
+                TurnCheckpointModel.turn_id == turn_id
+            ).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error deleting turn checkpoint: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def delete_older_than(self, cutoff: datetime) -> int:
+        """Drop checkpoints of turns not updated since ``cutoff``; returns how many."""
+        try:
+            deleted = (
+                self.db.query(TurnCheckpointModel)
+                .filter(TurnCheckpointModel.updated_at < cutoff)
+                .delete(synchronize_session=False)
+            )
+            self.db.commit()
+            return deleted
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error deleting old turn checkpoints: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
@@ -1,5 +1,6 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, Optional
 from ..models.sender_model import SenderModel
 from ..models.user import UserModel
 from ..schemas import twilio_sender, auth
@@ -107,6 +108,32 @@ class TwilioRepository:
             main_logger.error(f"Error creating thread: {str(e)}")
             raise Exception(f"Database error: {str(e)}")
 
+    def create_thread_if_absent(self, mobile_number: str, thread_id: str) -> str:
+        """
+        Insert the thread for ``mobile_number`` unless one already exists.
+
+        Returns the thread ID stored for the number, which is the existing one
+        when a concurrent worker inserted first.
+        """
+        try:
+            self.db.add(ThreadModel(mobile_number=mobile_number, thread_id=thread_id))
+            self.db.commit()
+            main_logger.info(f"Created thread for mobile number: {mobile_number}")
+            return thread_id
+        except IntegrityError:
+            self.db.rollback()
+            existing = self.get_thread_by_number(mobile_number)
+            if existing is None:
+                raise
+            main_logger.info(
+                f"Thread for {mobile_number} was created concurrently, using {existing.thread_id}"
+            )
+            return existing.thread_id
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error creating thread: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
     def get_thread_by_number(
         self, mobile_number: str
     ) -> Optional[thread.ThreadResponse]:
@@ -175,3 +202,41 @@ class TwilioRepository:
             self.db.rollback()
             main_logger.error(f"Error deleting active run: {str(e)}")
             raise Exception(f"Database error: {str(e)}")
+
+    def list_active_runs(self) -> Dict[str, str]:
+        """Return every stored active run as ``{thread_id: run_id}``."""
+        try:
+            return {
+                active_run.thread_id: active_run.run_id
+                for active_run in self.db.query(ActiveRunModel).all()
+            }
+        except Exception as e:
+            main_logger.error(f"Error listing active runs: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
+
+    def apply_active_run_changes(self, changes: Dict[str, Optional[str]]) -> None:
+        """
+        Store or delete several active runs in one transaction. A ``None``
+        run ID deletes the thread's entry.
+        """
+        try:
+            existing = {
+                active_run.thread_id: active_run
+                for active_run in self.db.query(ActiveRunModel)
+                .filter(ActiveRunModel.thread_id.in_(list(changes)))
+                .all()
+            }
+            for thread_id, run_id in changes.items():
+                active_run = existing.get(thread_id)
+                if run_id is None:
+                    if active_run is not None:
+                        self.db.delete(active_run)
+                elif active_run is not None:
+                    active_run.run_id = run_id
+                else:
+                    self.db.add(ActiveRunModel(thread_id=thread_id, run_id=run_id))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            main_logger.error(f"Error applying active run changes: {str(e)}")
+            raise Exception(f"Database error: {str(e)}")
@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from ..schemas.auth import User
+from ..core.dependencies import get_current_admin
+from ..logger import main_logger
+from ..services.catalog_cache_service import catalog_cache
+
+router = APIRouter()
+
+
+@router.post("/cache/invalidate")
+def invalidate_catalog_cache(
+    siteCd: Optional[str] = None,
+    customerCd: Optional[str] = None,
+    current_user: User = Depends(get_current_admin),
+):
+    """
+    Drop cached salons and services so the next request fetches them from
+    TimeGlobe. Without parameters the whole catalog cache is cleared.
+    Other processes drop their cached catalogs on their next read.
+    Restricted to the accounts in ``ADMIN_EMAILS``.
+    """
+    invalidated = catalog_cache.invalidate(customer_cd=customerCd, site_cd=siteCd)
+    main_logger.info(
+        f"User {current_user.id} invalidated {invalidated} catalog cache entries "
+        f"(customerCd={customerCd}, siteCd={siteCd})"
+    )
+    return {"invalidated": invalidated}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from ..schemas.auth import User
+from ..core.dependencies import get_current_user
+from ..utils.metrics_util import metrics
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_metrics(current_user: User = Depends(get_current_user)):
+    """Return in-process counters, gauges and timing summaries."""
+    return metrics.snapshot()
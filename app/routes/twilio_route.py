@@ -1,69 +1,76 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status
 
-from app.agent import AssistantManager
 from ..services.twilio_service import TwilioService
+from ..services.message_queue_service import (
+    message_queue_service,
+    ENQUEUE_REJECTED,
+)
+from ..services.idempotency_service import idempotency_service
 from ..schemas.twilio_sender import (
     SenderRequest,
     VerificationRequest,
     SenderId,
     UpdateSenderRequest,
 )
-from ..core.config import settings
 from ..schemas.auth import User
-from ..utils.tools_wrapper_util import get_response_from_gpt
-from ..utils.tools_wrapper_util import format_response
 import logging
 from twilio.twiml.messaging_response import MessagingResponse
-from ..db.session import get_db
 from ..core.dependencies import (
     get_twilio_service,
     validate_twilio_request,
     get_current_user,
 )
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
 
 @router.post("/incoming-whatsapp")
-async def whatsapp_wbhook(
-    request: Request,
-    tiwilio_service: TwilioService = Depends(get_twilio_service),
-    db: Session = Depends(get_db),
-):
+async def whatsapp_wbhook(request: Request):
     """
     Webhook to receive WhatsApp messages via Twilio.
-    Responds with the processed message from get_response_from_gpt.
+    Validates and enqueues the message, then acknowledges immediately; the
+    reply is generated by a background worker and sent via TwilioService.
     """
     form_data = await request.form()
     await validate_twilio_request(request)
 
     incoming_msg = form_data.get("Body", "").lower()  # The incoming message body
     sender_number = form_data.get("From", "")  # Sender's WhatsApp number
-    number = "".join(filter(str.isdigit, sender_number))
+    message_sid = form_data.get("MessageSid")
     logging.info(f"Incoming message from {sender_number}: {incoming_msg}")
-    try:
-        # Get response from the assistant function
-        _assistant_manager = AssistantManager(
-            settings.OPENAI_API_KEY, settings.OPENAI_ASSISTANT_ID, db
+
+    # Twilio retries slow webhooks with the same MessageSid: replay the
+    # recorded outcome instead of running the conversation again
+    outcome = await run_in_threadpool(idempotency_service.lookup, message_sid)
+    if outcome is not None:
+        idempotency_service.record_duplicate(message_sid, outcome)
+        return _twiml_ack(outcome["status"])
+
+    result = await run_in_threadpool(
+        message_queue_service.enqueue,
+        sender_number,
+        incoming_msg,
+        form_data.get("To"),
+        message_sid,
+    )
+    if result == ENQUEUE_REJECTED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Message queue is full, please retry later",
         )
-        response = get_response_from_gpt(incoming_msg, number, _assistant_manager)
-        response = format_response(response)
-
-        logging.info(f"Response generated for {sender_number}: {response}")
-    except Exception as e:
-        logging.error(f"Error generating response for {sender_number}: {e}")
-        response = "I'm sorry, something went wrong while processing your message."
-    # # Send the response back to the incoming message
-    print(f"Response ==>> {sender_number} with: {response}")
-
-    # resp = MessagingResponse()
-    # resp.message(response)
-    resp = tiwilio_service.send_whatsapp(sender_number, response)
-    # logging.info(f"Responded to {sender_number} with: {response}")
-    print("Resp", str(resp))
-    return str(resp)  # Respond to Twilio's webhook with the message
+
+    return _twiml_ack(result)
+
+
+def _twiml_ack(message_status: str) -> Response:
+    # Empty TwiML: the actual reply is sent asynchronously by the worker
+    return Response(
+        content=str(MessagingResponse()),
+        media_type="application/xml",
+        headers={"X-Message-Status": message_status},
+    )
 
 
 @router.post(
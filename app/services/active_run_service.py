@@ -0,0 +1,111 @@
+import threading
+from typing import Dict, Optional
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.twilio_repository import TwilioRepository
+from ..utils.metrics_util import metrics
+
+
+class ActiveRunRegistry:
+    """
+    In-process registry of the OpenAI runs currently in flight, per thread.
+
+    The registry is authoritative for this process: turns read and update it
+    without touching the database. Changes are written behind to the
+    ``ActiveRuns`` table by a background flusher so that runs left behind by
+    a crashed process can be found and cancelled after a restart
+    (see ``load``).
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._runs: Dict[str, str] = {}
+        # thread_id -> run_id to store, or None to delete
+        self._pending: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def load(self) -> None:
+        """Recover the runs persisted by previous processes."""
+        db = SessionLocal()
+        try:
+            stored = TwilioRepository(db).list_active_runs()
+        except Exception as e:
+            main_logger.error(f"Could not load active runs: {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for thread_id, run_id in stored.items():
+                self._runs.setdefault(thread_id, run_id)
+        if stored:
+            main_logger.info(f"Recovered {len(stored)} active runs")
+
+    def get(self, thread_id: str) -> Optional[str]:
+        with self._lock:
+            return self._runs.get(thread_id)
+
+    def store(self, thread_id: str, run_id: str) -> None:
+        with self._lock:
+            self._runs[thread_id] = run_id
+            self._pending[thread_id] = run_id
+        self._ensure_flusher()
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            if self._runs.pop(thread_id, None) is None and thread_id not in self._pending:
+                return
+            self._pending[thread_id] = None
+        self._ensure_flusher()
+
+    def flush(self) -> None:
+        """Write pending changes to ``ActiveRuns`` in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                changes, self._pending = self._pending, {}
+            db = SessionLocal()
+            try:
+                TwilioRepository(db).apply_active_run_changes(changes)
+                metrics.increment("active_runs.flushed", len(changes))
+            except Exception as e:
+                main_logger.error(f"Failed to flush active runs: {e}")
+                with self._lock:
+                    # Keep newer changes made while we were flushing
+                    for thread_id, run_id in changes.items():
+                        self._pending.setdefault(thread_id, run_id)
+            finally:
+                db.close()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._flush_lock:
+            if self._flusher is None:
+                self._stopping.clear()
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="active-run-flusher", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the flusher and write out what is still pending."""
+        self._stopping.set()
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+active_run_registry = ActiveRunRegistry(
+    flush_interval=settings.ACTIVE_RUN_FLUSH_INTERVAL_SECONDS
+)
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, FrozenSet, Hashable, Optional
+
+from ..core.config import settings
+from ..logger import main_logger
+from ..utils.cache_util import TTLCache
+from .cache_generation_service import SharedGeneration
+
+EMPLOYEES = "employees"
+SUGGESTIONS = "suggestions"
+
+_MISSING = object()
+
+
+def _id(value: Any) -> Optional[str]:
+    # The assistant passes IDs as numbers or strings
+    return None if value in (None, "") else str(value)
+
+
+def _slot_dates(response: Any) -> Optional[FrozenSet[str]]:
+    """Days with offered slots, or None when the response has an unknown shape."""
+    suggestions = response.get("suggestions") if isinstance(response, dict) else None
+    if not isinstance(suggestions, list):
+        return None
+    dates = set()
+    for suggestion in suggestions:
+        if not isinstance(suggestion, dict):
+            return None
+        positions = suggestion.get("positions") or [{}]
+        first = positions[0] if isinstance(positions[0], dict) else {}
+        begin_ts = suggestion.get("beginTs") or first.get("beginTs")
+        if not isinstance(begin_ts, str):
+            return None
+        dates.add(begin_ts[:10])
+    return frozenset(dates)
+
+
+class AvailabilityCache:
+    """
+    Short-lived cache for employee lists and appointment suggestions.
+
+    A booking dialogue asks for the same week of the same employee several
+    times, so results are kept for ``AVAILABILITY_CACHE_TTL_SECONDS``.
+    Successful bookings and cancellations drop the entries they affect:
+
+    - a booking drops the site's employee lists and the suggestions of the
+      booked employee (or of "any employee") that offered slots on the
+      booked day; other days cannot have changed;
+    - a cancellation only knows the site, so it drops all of the site's
+      entries, since the freed slot may be on a day nothing was offered.
+
+    The next turn of a user may be handled by another worker process, so
+    with a ``generation`` every invalidation is also shared through
+    ``CacheGenerations`` and other processes drop all their entries before
+    their next read.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, generation: Optional[SharedGeneration] = None
+    ):
+        self.ttl = ttl
+        self.generation = generation
+        # Values are (response, slot dates); keys start with (kind, siteCd)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, name="availability_cache")
+        # Bumped by every invalidation, so a response fetched before a
+        # booking is not stored after it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def employees_key(siteCd: str, week: Any, items: Any) -> tuple:
+        return (EMPLOYEES, _id(siteCd), _id(week), _id(items))
+
+    @staticmethod
+    def suggestions_key(
+        siteCd: str, week: Any, employee_id: Any, item_no: Any
+    ) -> tuple:
+        return (SUGGESTIONS, _id(siteCd), _id(week), _id(employee_id), _id(item_no))
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached response for ``key``, or the response of ``loader``."""
+        if self.ttl <= 0:
+            return loader()
+        if self.generation is not None and self.generation.changed():
+            self._drop_all()
+        entry = self._cache.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry[0]
+        generation = self._generation
+        response = loader()
+        self._store(key, response, generation)
+        return response
+
+    async def aget(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl <= 0:
+            return await loader()
+        if self.generation is not None and await asyncio.to_thread(
+            self.generation.changed
+        ):
+            self._drop_all()
+        entry = self._cache.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry[0]
+        generation = self._generation
+        response = await loader()
+        self._store(key, response, generation)
+        return response
+
+    def _store(self, key: Hashable, response: Any, generation: int) -> None:
+        # Errors are not cached; the next call asks TimeGlobe again
+        if not isinstance(response, dict) or response.get("code") not in (None, 0):
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(key, (response, _slot_dates(response)))
+
+    def invalidate_booking(self, siteCd: str, employee_id: Any, begin_ts: Any) -> int:
+        site, employee = _id(siteCd), _id(employee_id)
+        day = begin_ts[:10] if isinstance(begin_ts, str) else None
+
+        def affected(key, value) -> bool:
+            if key[1] != site:
+                return False
+            if key[0] == EMPLOYEES:
+                return True
+            dates = value[1]
+            return (
+                key[3] in (employee, None)
+                and (dates is None or day is None or day in dates)
+            )
+
+        return self._invalidate(affected, f"booking at {siteCd}", shared=True)
+
+    def invalidate_site(self, siteCd: str) -> int:
+        site = _id(siteCd)
+        return self._invalidate(
+            lambda key, value: key[1] == site,
+            f"cancellation at {siteCd}",
+            shared=True,
+        )
+
+    def _drop_all(self) -> None:
+        self._invalidate(lambda key, value: True, "invalidated by another process")
+
+    def _invalidate(self, predicate: Callable, reason: str, shared: bool = False) -> int:
+        with self._lock:
+            self._generation += 1
+            dropped = self._cache.delete_where(predicate)
+        if dropped:
+            main_logger.debug(
+                f"Dropped {dropped} cached availability entries ({reason})"
+            )
+        if shared and self.generation is not None:
+            self.generation.bump()
+        return dropped
+
+
+availability_cache = AvailabilityCache(
+    maxsize=settings.AVAILABILITY_CACHE_SIZE,
+    ttl=settings.AVAILABILITY_CACHE_TTL_SECONDS,
+    # Checked on every read: a booked slot must not be offered by the worker
+    # that handles the user's next turn
+    generation=SharedGeneration("availability_cache", check_interval=0),
+)
@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Optional
+
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.cache_generation_repository import CacheGenerationRepository
+from ..utils.metrics_util import metrics
+
+
+class SharedGeneration:
+    """
+    Invalidation counter of a per-process cache, kept in the
+    ``CacheGenerations`` table so that an invalidation in one process reaches
+    the caches of all the others (uvicorn workers, ``app.worker`` processes).
+
+    ``bump`` is called after dropping entries locally. ``changed`` is called
+    on read and reports whether another process bumped the counter since this
+    one last looked, in which case the caller drops its entries. The table is
+    read at most every ``check_interval`` seconds; database errors are logged
+    and the cache keeps working locally.
+    """
+
+    def __init__(self, name: str, check_interval: float):
+        self.name = name
+        self.check_interval = check_interval
+        self._seen: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def changed(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        db = SessionLocal()
+        try:
+            current = CacheGenerationRepository(db).get(self.name)
+        except Exception as e:
+            main_logger.warning(f"Could not check {self.name} generation: {e}")
+            return False
+        finally:
+            db.close()
+        with self._lock:
+            changed = self._seen is not None and current != self._seen
+            self._seen = current
+        if changed:
+            metrics.increment(f"{self.name}.remote_invalidations")
+        return changed
+
+    def bump(self) -> None:
+        db = SessionLocal()
+        try:
+            current = CacheGenerationRepository(db).bump(self.name)
+        except Exception as e:
+            main_logger.error(f"Could not share {self.name} invalidation: {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            # Only our own bump: nothing else to drop. Otherwise the next
+            # check sees the difference and clears the cache.
+            if self._seen is not None and current == self._seen + 1:
+                self._seen = current
@@ -0,0 +1,248 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..logger import main_logger
+from ..utils.metrics_util import metrics
+from .cache_generation_service import SharedGeneration
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "refreshing", "retry_at")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.refreshing = False
+        self.retry_at = 0.0
+
+
+class CatalogCache:
+    """
+    Stale-while-revalidate cache for the salon and service catalogs.
+
+    An entry younger than ``ttl`` is served as is. An older one is still
+    served, while a single background refresh fetches the current version;
+    a failed refresh is retried after ``retry_interval``. Entries past
+    ``max_stale`` are fetched synchronously, and if TimeGlobe fails then the
+    last known version is served rather than an error. Hits, misses, stale
+    hits and refresh outcomes are reported as ``catalog_cache.*`` metrics,
+    together with the age of stale data served. ``aget`` does the same for
+    an async loader on the asyncio engine.
+
+    The cache is per process. With a ``generation``, ``invalidate`` also
+    bumps the shared counter, and the other processes drop all their entries
+    the next time they read (see ``SharedGeneration``).
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_stale: float,
+        retry_interval: float,
+        name: str,
+        generation: Optional[SharedGeneration] = None,
+    ):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry_interval = retry_interval
+        self.name = name
+        self.generation = generation
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="catalog-refresh"
+        )
+        # Background refreshes started by ``aget``, referenced until done
+        self._async_refreshes: Set[asyncio.Future] = set()
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """Return the cached value of ``key``, loading it with ``loader`` when needed."""
+        if self.ttl <= 0:
+            return loader()
+        if self.generation is not None and self.generation.changed():
+            self._drop(lambda key: True)
+        entry, servable, refresh = self._lookup(key)
+        if servable:
+            if refresh:
+                self._refresher.submit(self._refresh, key, entry, loader, cacheable)
+            return entry.value
+        try:
+            value = loader()
+        except Exception as e:
+            return self._stale_on_error(key, entry, e)
+        self._store(key, value, cacheable)
+        return value
+
+    async def aget(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Awaitable ``get`` for an async ``loader``; background refreshes run as
+        tasks on the calling event loop.
+        """
+        if self.ttl <= 0:
+            return await loader()
+        if self.generation is not None and await asyncio.to_thread(
+            self.generation.changed
+        ):
+            self._drop(lambda key: True)
+        entry, servable, refresh = self._lookup(key)
+        if servable:
+            if refresh:
+                task = asyncio.ensure_future(
+                    self._arefresh(key, entry, loader, cacheable)
+                )
+                self._async_refreshes.add(task)
+                task.add_done_callback(self._async_refreshes.discard)
+            return entry.value
+        try:
+            value = await loader()
+        except Exception as e:
+            return self._stale_on_error(key, entry, e)
+        self._store(key, value, cacheable)
+        return value
+
+    def _lookup(self, key: Hashable) -> Tuple[Optional[_Entry], bool, bool]:
+        """
+        The entry of ``key``, whether it can be served without loading, and
+        whether the caller should start its background refresh.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            age = now - entry.fetched_at if entry else None
+            if entry and age < self.ttl:
+                metrics.increment(f"{self.name}.hits")
+                return entry, True, False
+            if entry and age < self.max_stale:
+                metrics.increment(f"{self.name}.stale_hits")
+                metrics.observe(f"{self.name}.staleness_seconds", age - self.ttl)
+                refresh = not entry.refreshing and now >= entry.retry_at
+                if refresh:
+                    entry.refreshing = True
+                return entry, True, refresh
+        metrics.increment(f"{self.name}.misses")
+        return entry, False, False
+
+    def _stale_on_error(
+        self, key: Hashable, entry: Optional[_Entry], error: Exception
+    ) -> Any:
+        if entry is None:
+            raise error
+        metrics.increment(f"{self.name}.stale_on_error")
+        main_logger.warning(f"Serving stale catalog for {key} after error: {error}")
+        return entry.value
+
+    def _refresh(
+        self,
+        key: Hashable,
+        entry: _Entry,
+        loader: Callable[[], Any],
+        cacheable: Callable[[Any], bool],
+    ) -> None:
+        try:
+            value = loader()
+        except Exception as e:
+            self._refresh_failed(key, entry, e)
+            return
+        self._refreshed(key, entry, value, cacheable)
+
+    async def _arefresh(
+        self,
+        key: Hashable,
+        entry: _Entry,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool],
+    ) -> None:
+        try:
+            value = await loader()
+        except Exception as e:
+            self._refresh_failed(key, entry, e)
+            return
+        self._refreshed(key, entry, value, cacheable)
+
+    def _refreshed(
+        self,
+        key: Hashable,
+        entry: _Entry,
+        value: Any,
+        cacheable: Callable[[Any], bool],
+    ) -> None:
+        if not cacheable(value):
+            self._refresh_failed(
+                key, entry, ValueError(f"unusable response {value!r:.200}")
+            )
+            return
+        metrics.increment(f"{self.name}.refreshes")
+        self._store(key, value, cacheable, replaces=entry)
+
+    def _refresh_failed(self, key: Hashable, entry: _Entry, error: Exception) -> None:
+        metrics.increment(f"{self.name}.refresh_failures")
+        main_logger.warning(f"Background refresh of catalog {key} failed: {error}")
+        with self._lock:
+            entry.refreshing = False
+            entry.retry_at = time.monotonic() + self.retry_interval
+
+    def _store(
+        self,
+        key: Hashable,
+        value: Any,
+        cacheable: Callable[[Any], bool],
+        replaces: Optional[_Entry] = None,
+    ) -> None:
+        if not cacheable(value):
+            return
+        with self._lock:
+            if replaces is not None and self._entries.get(key) is not replaces:
+                # Invalidated while the refresh was running
+                return
+            self._entries[key] = _Entry(value)
+            metrics.set_gauge(f"{self.name}.size", len(self._entries))
+
+    def invalidate(
+        self, customer_cd: Optional[str] = None, site_cd: Optional[str] = None
+    ) -> int:
+        """
+        Drop entries whose ``(customer_cd, kind, site_cd)`` key matches the
+        given codes (all entries when none are given) and tell the other
+        processes; returns how many were dropped here.
+        """
+        dropped = self._drop(
+            lambda key: (customer_cd is None or key[0] == customer_cd)
+            and (site_cd is None or key[2] == site_cd)
+        )
+        if self.generation is not None:
+            self.generation.bump()
+        return dropped
+
+    def _drop(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                del self._entries[key]
+            metrics.set_gauge(f"{self.name}.size", len(self._entries))
+        metrics.increment(f"{self.name}.invalidations", len(doomed))
+        return len(doomed)
+
+
+catalog_cache = CatalogCache(
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+    max_stale=settings.CATALOG_CACHE_MAX_STALE_SECONDS,
+    retry_interval=settings.CATALOG_CACHE_RETRY_SECONDS,
+    name="catalog_cache",
+    generation=SharedGeneration(
+        "catalog_cache", settings.CACHE_INVALIDATION_CHECK_SECONDS
+    ),
+)
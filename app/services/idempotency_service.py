@@ -0,0 +1,72 @@
+from typing import Optional
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.inbox_repository import InboxRepository
+from ..utils.cache_util import TTLCache
+from ..utils.metrics_util import metrics
+
+
+class MessageIdempotencyService:
+    """
+    De-duplicates Twilio webhook deliveries by MessageSid.
+
+    Recently seen MessageSids are kept in a bounded, TTL-evicted in-memory
+    index; the ``InboundMessages`` table (unique on ``message_sid``) is the
+    persistent index that covers restarts and other web processes.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self._index = TTLCache(maxsize=maxsize, ttl=ttl_seconds, name="idempotency")
+
+    def lookup(self, message_sid: str) -> Optional[dict]:
+        """Return the recorded outcome for a MessageSid, or None if it is new."""
+        if not message_sid:
+            return None
+        outcome = self._index.get(message_sid)
+        if outcome is not None:
+            return outcome
+
+        db = SessionLocal()
+        try:
+            message = InboxRepository(db).get_by_message_sid(message_sid)
+            if message is None:
+                return None
+            outcome = {
+                "message_id": message.id,
+                "status": message.status,
+                "response_text": message.response_text,
+            }
+        finally:
+            db.close()
+        self._index.set(message_sid, outcome)
+        return outcome
+
+    def remember(
+        self, message_sid: str, message_id: int, status: str, response_text: str = None
+    ) -> None:
+        """Record the latest outcome for a MessageSid."""
+        if not message_sid:
+            return
+        self._index.set(
+            message_sid,
+            {
+                "message_id": message_id,
+                "status": status,
+                "response_text": response_text,
+            },
+        )
+
+    def record_duplicate(self, message_sid: str, outcome: dict) -> None:
+        metrics.increment("idempotency.duplicates")
+        main_logger.info(
+            f"Duplicate webhook for {message_sid} (message {outcome['message_id']}, "
+            f"status {outcome['status']}); skipping processing"
+        )
+
+
+idempotency_service = MessageIdempotencyService(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+)
@@ -0,0 +1,446 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..models.inbound_message import InboundMessageModel
+from ..repositories.inbox_repository import (
+    InboxRepository,
+    STATUS_DONE,
+    STATUS_PENDING,
+)
+from ..services.idempotency_service import idempotency_service
+from ..services.turn_checkpoint_service import TurnCheckpoint
+from ..utils.deadline_util import deadline_scope
+from ..utils.metrics_util import metrics
+
+ENQUEUE_ACCEPTED = "accepted"
+ENQUEUE_DUPLICATE = "duplicate"
+ENQUEUE_REJECTED = "rejected"
+
+# How often the lease keeper deletes stale turn checkpoints
+CHECKPOINT_GC_INTERVAL_SECONDS = 3600
+
+GENERIC_ERROR_REPLY = "I'm sorry, something went wrong while processing your message."
+
+
+def send_reply(sender_number: str, response: str) -> None:
+    """Send a reply over WhatsApp using a short-lived session."""
+    from ..services.twilio_service import TwilioService
+
+    db = SessionLocal()
+    try:
+        TwilioService(db).send_whatsapp(sender_number, response)
+    finally:
+        db.close()
+
+
+def process_inbound_message(
+    sender_number: str, incoming_msg: str, turn_id: str = None, to_number: str = None
+) -> str:
+    """
+    Run one conversation turn, send the reply over WhatsApp and return it.
+
+    Generating the reply is bounded by ``TURN_DEADLINE_SECONDS``; sending it
+    is not, so a turn that ran out of time still delivers its fallback reply.
+    The tenant's backend is chosen from ``to_number`` (see ``backend_for``).
+    """
+    # Imported lazily: the agent pulls in the OpenAI client and tool wrappers
+    from ..agent import get_assistant_manager
+    from ..chat_agent import BACKEND_CHAT, backend_for, get_chat_manager
+    from ..utils.tools_wrapper_util import get_response_from_gpt, format_response
+
+    number = "".join(filter(str.isdigit, sender_number))
+    try:
+        if backend_for(to_number) == BACKEND_CHAT:
+            assistant_manager = get_chat_manager()
+        else:
+            assistant_manager = get_assistant_manager()
+        with deadline_scope(settings.TURN_DEADLINE_SECONDS):
+            response = get_response_from_gpt(
+                incoming_msg, number, assistant_manager, turn_id=turn_id
+            )
+        response = format_response(response)
+        main_logger.info(f"Response generated for {sender_number}: {response}")
+    except Exception as e:
+        main_logger.error(f"Error generating response for {sender_number}: {e}")
+        response = GENERIC_ERROR_REPLY
+
+    send_reply(sender_number, response)
+    return response
+
+
+async def aprocess_inbound_message(
+    sender_number: str, incoming_msg: str, turn_id: str = None, to_number: str = None
+) -> str:
+    """Async variant of process_inbound_message driven by the asyncio engine."""
+    from ..async_agent import get_async_assistant_manager
+    from ..chat_agent import BACKEND_CHAT, backend_for, get_async_chat_manager
+    from ..utils.tools_wrapper_util import aget_response_from_gpt, format_response
+
+    number = "".join(filter(str.isdigit, sender_number))
+    try:
+        if backend_for(to_number) == BACKEND_CHAT:
+            assistant_manager = get_async_chat_manager()
+        else:
+            assistant_manager = get_async_assistant_manager()
+        with deadline_scope(settings.TURN_DEADLINE_SECONDS):
+            response = await aget_response_from_gpt(
+                incoming_msg, number, assistant_manager, turn_id=turn_id
+            )
+        response = format_response(response)
+        main_logger.info(f"Response generated for {sender_number}: {response}")
+    except Exception as e:
+        main_logger.error(f"Error generating response for {sender_number}: {e}")
+        response = GENERIC_ERROR_REPLY
+
+    await asyncio.to_thread(send_reply, sender_number, response)
+    return response
+
+
+@dataclass
+class _Turn:
+    """A claimed batch of inbound messages processed as one user turn."""
+
+    worker_id: str
+    messages: List[InboundMessageModel]
+    started_at: float
+
+    @property
+    def message_ids(self) -> List[int]:
+        return [message.id for message in self.messages]
+
+    @property
+    def sender_number(self) -> str:
+        return self.messages[0].sender_number
+
+    @property
+    def to_number(self) -> str:
+        return self.messages[0].to_number
+
+    @property
+    def turn_id(self) -> str:
+        # Stable across redeliveries, so a retried turn resumes its checkpoint
+        return "inbound:" + "-".join(str(message_id) for message_id in self.message_ids)
+
+    @property
+    def body(self) -> str:
+        # A burst of short messages becomes a single user turn
+        return "\n".join(message.body for message in self.messages)
+
+
+class MessageQueueService:
+    """
+    Durable message queue backed by the ``InboundMessages`` table.
+
+    The webhook persists every message before acknowledging it. Workers (in
+    the web process, or in ``python -m app.worker``) claim messages under a
+    lease, so a message held by a crashed worker is picked up again once its
+    lease expires.
+
+    With ``ASSISTANT_ENGINE=sync`` each worker thread runs one conversation at
+    a time. With ``ASSISTANT_ENGINE=async`` a single event loop thread claims
+    messages and runs up to ``ASYNC_CONVERSATION_CONCURRENCY`` conversations
+    concurrently on the AsyncOpenAI engine.
+    """
+
+    def __init__(
+        self,
+        worker_count: int,
+        max_size: int,
+        lease_seconds: int = None,
+        poll_interval: float = None,
+        max_attempts: int = None,
+        coalesce_window: float = None,
+        coalesce_max_delay: float = None,
+        engine: str = None,
+        async_concurrency: int = None,
+    ):
+        self.worker_count = worker_count
+        self.max_size = max_size
+        self.lease_seconds = lease_seconds or settings.INBOX_LEASE_SECONDS
+        self.poll_interval = poll_interval or settings.INBOX_POLL_INTERVAL_SECONDS
+        self.max_attempts = max_attempts or settings.INBOX_MAX_ATTEMPTS
+        self.coalesce_window = (
+            settings.MESSAGE_COALESCE_WINDOW_SECONDS
+            if coalesce_window is None
+            else coalesce_window
+        )
+        self.coalesce_max_delay = (
+            settings.MESSAGE_COALESCE_MAX_DELAY_SECONDS
+            if coalesce_max_delay is None
+            else coalesce_max_delay
+        )
+        self.engine = engine or settings.ASSISTANT_ENGINE
+        self.async_concurrency = (
+            async_concurrency or settings.ASYNC_CONVERSATION_CONCURRENCY
+        )
+        self._identity = f"{socket.gethostname()}:{os.getpid()}"
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        # Turns in flight, keyed by their first message id, kept alive by
+        # the single lease keeper thread
+        self._active_turns: Dict[int, _Turn] = {}
+        self._active_turns_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._workers:
+                return
+            self._stopping.clear()
+            self._spawn(self._lease_keeper_loop, "lease-keeper")
+            if self.engine == "async":
+                self._spawn(self._run_async_dispatcher, "message-dispatcher")
+                main_logger.info(
+                    f"Started async message dispatcher with concurrency {self.async_concurrency}"
+                )
+            else:
+                for idx in range(self.worker_count):
+                    self._spawn(
+                        self._worker_loop,
+                        f"message-worker-{idx}",
+                        f"{self._identity}:{idx}",
+                    )
+                main_logger.info(f"Started {self.worker_count} message workers")
+
+    def _spawn(self, target, name: str, *args) -> None:
+        worker = threading.Thread(target=target, args=args, name=name, daemon=True)
+        worker.start()
+        self._workers.append(worker)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop claiming new messages and wait for in-flight ones to finish."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        self._stopping.set()
+        self._wakeup.set()
+        for worker in workers:
+            worker.join(timeout=timeout)
+        main_logger.info("Message workers stopped")
+
+    def enqueue(
+        self,
+        sender_number: str,
+        body: str,
+        to_number: str = None,
+        message_sid: str = None,
+    ) -> str:
+        """
+        Persist a message for processing.
+
+        Returns ``ENQUEUE_ACCEPTED``, ``ENQUEUE_DUPLICATE`` when the MessageSid
+        was already stored (a Twilio retry) or ``ENQUEUE_REJECTED`` when the
+        inbox is full.
+        """
+        db = SessionLocal()
+        try:
+            inbox_repo = InboxRepository(db)
+            depth = inbox_repo.count_pending()
+            metrics.set_gauge("message_queue.depth", depth)
+            if depth >= self.max_size:
+                metrics.increment("message_queue.rejected")
+                main_logger.warning(
+                    f"Message inbox full ({depth}), rejecting message from {sender_number}"
+                )
+                return ENQUEUE_REJECTED
+            message, created = inbox_repo.enqueue(
+                sender_number,
+                body,
+                to_number,
+                message_sid,
+                coalesce_window=self.coalesce_window,
+                coalesce_max_delay=self.coalesce_max_delay,
+            )
+            idempotency_service.remember(
+                message_sid, message.id, message.status, message.response_text
+            )
+        finally:
+            db.close()
+        if not created:
+            metrics.increment("idempotency.duplicates")
+            return ENQUEUE_DUPLICATE
+        metrics.increment("message_queue.enqueued")
+        self._wakeup.set()
+        return ENQUEUE_ACCEPTED
+
+    def _worker_loop(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            turn = self._claim_turn(worker_id)
+            if turn is None:
+                # Nothing claimable: sleep until a webhook wakes us or the
+                # poll interval elapses (messages may arrive from other nodes,
+                # and coalesced bursts become claimable on their own)
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                response = process_inbound_message(
+                    turn.sender_number,
+                    turn.body,
+                    turn_id=turn.turn_id,
+                    to_number=turn.to_number,
+                )
+            except Exception as e:
+                self._fail_turn(turn, e)
+                continue
+            self._complete_turn(turn, response)
+
+    def _run_async_dispatcher(self) -> None:
+        asyncio.run(self._async_dispatcher())
+
+    async def _async_dispatcher(self) -> None:
+        """Claim turns and run them as tasks, bounded by a semaphore."""
+        worker_id = f"{self._identity}:async"
+        slots = asyncio.Semaphore(self.async_concurrency)
+        tasks = set()
+        while not self._stopping.is_set():
+            await slots.acquire()
+            turn = await asyncio.to_thread(self._claim_turn, worker_id)
+            if turn is None:
+                slots.release()
+                await asyncio.to_thread(self._wakeup.wait, self.poll_interval)
+                self._wakeup.clear()
+                continue
+            task = asyncio.create_task(self._run_async_turn(turn))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_async_turn(self, turn: _Turn) -> None:
+        try:
+            response = await aprocess_inbound_message(
+                turn.sender_number,
+                turn.body,
+                turn_id=turn.turn_id,
+                to_number=turn.to_number,
+            )
+        except Exception as e:
+            await asyncio.to_thread(self._fail_turn, turn, e)
+            return
+        await asyncio.to_thread(self._complete_turn, turn, response)
+
+    def _claim_turn(self, worker_id: str):
+        db = SessionLocal()
+        try:
+            batch = InboxRepository(db).claim_next(
+                worker_id, self.lease_seconds, self.max_attempts
+            )
+            for message in batch:
+                db.expunge(message)
+        except Exception as e:
+            main_logger.error(f"Worker {worker_id} failed to claim a message: {e}")
+            return None
+        finally:
+            db.close()
+        if not batch:
+            return None
+
+        turn = _Turn(worker_id=worker_id, messages=batch, started_at=time.time())
+        now = datetime.utcnow()
+        for message in batch:
+            metrics.observe(
+                "message_queue.wait_seconds",
+                (now - message.created_at).total_seconds(),
+            )
+        if len(batch) > 1:
+            metrics.increment("message_queue.coalesced", len(batch) - 1)
+        with self._active_turns_lock:
+            self._active_turns[batch[0].id] = turn
+            metrics.set_gauge("message_queue.in_flight", len(self._active_turns))
+        return turn
+
+    def _finish_turn(self, turn: _Turn) -> None:
+        with self._active_turns_lock:
+            self._active_turns.pop(turn.messages[0].id, None)
+            metrics.set_gauge("message_queue.in_flight", len(self._active_turns))
+        metrics.observe(
+            "message_queue.processing_seconds", time.time() - turn.started_at
+        )
+
+    def _complete_turn(self, turn: _Turn, response: str) -> None:
+        db = SessionLocal()
+        try:
+            InboxRepository(db).complete(turn.message_ids, turn.worker_id, response)
+            TurnCheckpoint.discard(turn.turn_id)
+            for message in turn.messages:
+                idempotency_service.remember(
+                    message.message_sid, message.id, STATUS_DONE, response
+                )
+            metrics.increment("message_queue.processed")
+        except Exception as e:
+            main_logger.error(f"Failed to complete messages {turn.message_ids}: {e}")
+        finally:
+            db.close()
+            self._finish_turn(turn)
+
+    def _fail_turn(self, turn: _Turn, error: Exception) -> None:
+        metrics.increment("message_queue.failed")
+        main_logger.error(
+            f"Worker failed to process messages {turn.message_ids} from {turn.sender_number}: {error}"
+        )
+        db = SessionLocal()
+        try:
+            gave_up = InboxRepository(db).release(
+                turn.message_ids, turn.worker_id, str(error), self.max_attempts
+            )
+            if gave_up:
+                # This turn will not be retried; its stored outputs are moot
+                TurnCheckpoint.discard(turn.turn_id)
+            for message in turn.messages:
+                idempotency_service.remember(
+                    message.message_sid, message.id, STATUS_PENDING
+                )
+        except Exception as e:
+            main_logger.error(f"Failed to release messages {turn.message_ids}: {e}")
+        finally:
+            db.close()
+            self._finish_turn(turn)
+
+    def _lease_keeper_loop(self) -> None:
+        """
+        Renew the leases of every turn in flight while it is running, and
+        periodically delete stale turn checkpoints.
+        """
+        checkpoints_collected_at = 0.0
+        while not self._stopping.wait(self.lease_seconds / 3):
+            if (
+                settings.TURN_CHECKPOINT_MAX_AGE_HOURS > 0
+                and time.time() - checkpoints_collected_at
+                >= CHECKPOINT_GC_INTERVAL_SECONDS
+            ):
+                checkpoints_collected_at = time.time()
+                TurnCheckpoint.collect_garbage(settings.TURN_CHECKPOINT_MAX_AGE_HOURS)
+            with self._active_turns_lock:
+                turns = list(self._active_turns.values())
+            if not turns:
+                continue
+            db = SessionLocal()
+            try:
+                inbox_repo = InboxRepository(db)
+                for turn in turns:
+                    if not inbox_repo.renew_lease(
+                        turn.message_ids, turn.worker_id, self.lease_seconds
+                    ):
+                        main_logger.warning(
+                            f"Worker {turn.worker_id} lost the lease on messages {turn.message_ids}"
+                        )
+            finally:
+                db.close()
+
+
+message_queue_service = MessageQueueService(
+    worker_count=settings.MESSAGE_WORKER_COUNT,
+    max_size=settings.MESSAGE_QUEUE_MAX_SIZE,
+)
@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from ..core.config import settings
+from ..logger import main_logger
+from ..utils.metrics_util import metrics
+
+# Run states a waiting conversation has to act on
+WAKE_STATUSES = {
+    "completed",
+    "requires_action",
+    "failed",
+    "expired",
+    "cancelled",
+    "incomplete",
+}
+
+
+class _PendingRun:
+    __slots__ = (
+        "client",
+        "thread_id",
+        "run_id",
+        "deadline",
+        "interval",
+        "status",
+        "errors",
+        "on_done",
+        "done",
+    )
+
+    def __init__(
+        self, client, thread_id: str, run_id: str, deadline: float, on_done: Callable
+    ):
+        self.client = client
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.deadline = deadline
+        self.interval = settings.RUN_POLL_MIN_INTERVAL_SECONDS
+        self.status = None
+        self.errors = 0
+        self.on_done = on_done
+        self.done = False
+
+
+class RunPoller:
+    """
+    Polls every in-flight OpenAI run from one scheduler thread.
+
+    Pending runs sit in a heap ordered by their next poll time. The scheduler
+    hands due runs to a small executor for the ``runs.retrieve`` call, backs
+    the interval off while a run's status stays the same and resets it when
+    the status changes. Once a run reaches a state the conversation has to
+    act on, its waiter is woken: a blocked worker thread (``wait``) or an
+    asyncio future (``wait_async``). Thousands of pending runs therefore cost
+    the scheduler plus ``RUN_POLLER_WORKERS`` threads.
+    """
+
+    def __init__(self, workers: int, max_errors: int = 3):
+        self._workers = workers
+        self._max_errors = max_errors
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduler: Optional[threading.Thread] = None
+
+    def wait(self, client, thread_id: str, run_id: str, timeout: float) -> Any:
+        """
+        Poll the run with ``client`` (a synchronous OpenAI client) and block
+        until it needs attention. Returns the run, or None once ``timeout``
+        elapses.
+        """
+        woken = threading.Event()
+        outcome = {}
+
+        def on_done(run, error):
+            outcome["run"], outcome["error"] = run, error
+            woken.set()
+
+        self._schedule(
+            _PendingRun(client, thread_id, run_id, time.time() + timeout, on_done), 0
+        )
+        woken.wait(timeout + settings.RUN_POLL_MAX_INTERVAL_SECONDS + 5)
+        if outcome.get("error") is not None:
+            raise outcome["error"]
+        return outcome.get("run")
+
+    async def wait_async(
+        self, client, thread_id: str, run_id: str, timeout: float
+    ) -> Any:
+        """Awaitable variant of ``wait`` for the asyncio engine."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(run, error):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(run)
+
+        def on_done(run, error):
+            loop.call_soon_threadsafe(resolve, run, error)
+
+        self._schedule(
+            _PendingRun(client, thread_id, run_id, time.time() + timeout, on_done), 0
+        )
+        return await future
+
+    def _schedule(self, pending: _PendingRun, delay: float) -> None:
+        self._ensure_started()
+        with self._condition:
+            heapq.heappush(
+                self._heap, (time.time() + delay, next(self._sequence), pending)
+            )
+            metrics.set_gauge("run_poller.pending", len(self._heap))
+            self._condition.notify()
+
+    def _ensure_started(self) -> None:
+        if self._scheduler is not None:
+            return
+        with self._condition:
+            if self._scheduler is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="run-poll"
+                )
+                self._scheduler = threading.Thread(
+                    target=self._loop, name="run-poller", daemon=True
+                )
+                self._scheduler.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.time():
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                _, _, pending = heapq.heappop(self._heap)
+                metrics.set_gauge("run_poller.pending", len(self._heap))
+            if time.time() >= pending.deadline:
+                self._finish(pending, None, None)
+                continue
+            self._executor.submit(self._poll, pending)
+
+    def _poll(self, pending: _PendingRun) -> None:
+        try:
+            run = pending.client.beta.threads.runs.retrieve(
+                thread_id=pending.thread_id, run_id=pending.run_id
+            )
+            metrics.increment("run_poller.polls")
+        except Exception as e:
+            pending.errors += 1
+            main_logger.warning(
+                f"Polling run {pending.run_id} failed ({pending.errors}/{self._max_errors}): {e}"
+            )
+            if pending.errors >= self._max_errors:
+                self._finish(pending, None, e)
+            else:
+                self._reschedule(pending)
+            return
+
+        pending.errors = 0
+        if run.status in WAKE_STATUSES:
+            self._finish(pending, run, None)
+            return
+        if run.status != pending.status:
+            pending.status = run.status
+            pending.interval = settings.RUN_POLL_MIN_INTERVAL_SECONDS
+        self._reschedule(pending)
+
+    def _reschedule(self, pending: _PendingRun) -> None:
+        delay = min(pending.interval, max(0, pending.deadline - time.time()))
+        pending.interval = min(
+            settings.RUN_POLL_MAX_INTERVAL_SECONDS, pending.interval * 1.5
+        )
+        self._schedule(pending, delay)
+
+    @staticmethod
+    def _finish(pending: _PendingRun, run: Any, error: Optional[Exception]) -> None:
+        if pending.done:
+            return
+        pending.done = True
+        pending.on_done(run, error)
+
+
+run_poller = RunPoller(workers=settings.RUN_POLLER_WORKERS)
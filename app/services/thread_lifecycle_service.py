@@ -0,0 +1,237 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.thread_usage_repository import ThreadUsageRepository
+from ..utils.metrics_util import metrics
+
+SUMMARY_PROMPT = (
+    "Summarize this WhatsApp conversation between a salon customer and the "
+    "booking assistant in at most 120 words. Keep the customer's name and "
+    "preferences, booked, cancelled or pending appointments (salon, service, "
+    "employee, date and time, order IDs) and any open question."
+)
+# Messages of the old thread the summary is written from
+SUMMARY_SOURCE_MESSAGES = 30
+# Messages a turn adds to a thread: the user's and the assistant's
+MESSAGES_PER_TURN = 2
+
+
+class ThreadLifecycle:
+    """
+    Keeps the OpenAI threads behind conversations small.
+
+    Before a turn, a thread that grew past ``THREAD_ROTATE_MAX_MESSAGES`` or
+    ``THREAD_ROTATE_MAX_PROMPT_TOKENS``, or sat idle for
+    ``THREAD_ROTATE_IDLE_HOURS``, is replaced by a fresh thread that starts
+    with a short summary of the old one. Replaced threads, and threads idle
+    for ``THREAD_GC_IDLE_DAYS``, are deleted in batches by a background
+    garbage collector together with their ``Threads``, ``ThreadUsage`` and
+    ``ActiveRuns`` entries.
+    """
+
+    def __init__(self, client_factory: Callable, gc_interval: float):
+        self._client_factory = client_factory
+        self.gc_interval = gc_interval
+        self._stopping = threading.Event()
+        self._collector: Optional[threading.Thread] = None
+
+    def rotation_reason(self, usage: Any) -> Optional[str]:
+        if usage is None or usage.message_count == 0:
+            return None
+        if 0 < settings.THREAD_ROTATE_MAX_MESSAGES <= usage.message_count:
+            return f"{usage.message_count} messages"
+        if 0 < settings.THREAD_ROTATE_MAX_PROMPT_TOKENS <= usage.prompt_tokens:
+            return f"{usage.prompt_tokens} prompt tokens"
+        idle = datetime.utcnow() - usage.last_activity_at
+        if 0 < settings.THREAD_ROTATE_IDLE_HOURS * 3600 <= idle.total_seconds():
+            return f"idle for {idle}"
+        return None
+
+    def maybe_rotate(self, client, user_id: str, thread_id: str) -> str:
+        """
+        Return the thread the user's next turn should run on: ``thread_id``,
+        or its replacement when the thread is due for rotation. Rotation is
+        best effort; on any error the turn stays on the current thread.
+        """
+        db = SessionLocal()
+        try:
+            reason = self.rotation_reason(ThreadUsageRepository(db).get(thread_id))
+        except Exception as e:
+            main_logger.error(f"Could not read usage of thread {thread_id}: {e}")
+            reason = None
+        finally:
+            db.close()
+        if reason is None:
+            return thread_id
+        try:
+            return self._rotate(client, user_id, thread_id, reason)
+        except Exception as e:
+            metrics.increment("threads.rotation_failed")
+            main_logger.error(f"Could not rotate thread {thread_id} of {user_id}: {e}")
+            return thread_id
+
+    def _rotate(self, client, user_id: str, thread_id: str, reason: str) -> str:
+        from ..agent import thread_cache
+
+        summary = self._summarize(client, thread_id)
+        messages = []
+        if summary:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": f"Summary of our earlier conversation: {summary}",
+                }
+            )
+        new_thread = client.beta.threads.create(messages=messages)
+        db = SessionLocal()
+        try:
+            replaced = ThreadUsageRepository(db).rotate(
+                user_id, thread_id, new_thread.id, len(messages)
+            )
+        except Exception:
+            client.beta.threads.delete(new_thread.id)
+            raise
+        finally:
+            db.close()
+        if not replaced:
+            # The number no longer maps to this thread; leave it alone
+            client.beta.threads.delete(new_thread.id)
+            thread_cache.pop(user_id)
+            return thread_id
+        thread_cache.set(user_id, new_thread.id)
+        metrics.increment("threads.rotated")
+        main_logger.info(
+            f"Rotated thread {thread_id} of {user_id} to {new_thread.id} ({reason})"
+        )
+        return new_thread.id
+
+    def _summarize(self, client, thread_id: str) -> str:
+        page = client.beta.threads.messages.list(
+            thread_id=thread_id, order="desc", limit=SUMMARY_SOURCE_MESSAGES
+        )
+        lines = []
+        for message in reversed(page.data):
+            text = "".join(
+                block.text.value for block in message.content if block.type == "text"
+            )
+            if text:
+                speaker = "Customer" if message.role == "user" else "Assistant"
+                lines.append(f"{speaker}: {text}")
+        if not lines:
+            return ""
+        completion = client.chat.completions.create(
+            model=settings.THREAD_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": "\n".join(lines)},
+            ],
+        )
+        return (completion.choices[0].message.content or "").strip()
+
+    def record_turn(self, thread_id: str, user_id: str, usage: Any) -> None:
+        """Count a completed turn with the run's token ``usage``; never fails the turn."""
+        db = SessionLocal()
+        try:
+            ThreadUsageRepository(db).record_turn(
+                thread_id,
+                user_id,
+                MESSAGES_PER_TURN,
+                getattr(usage, "prompt_tokens", None),
+            )
+        except Exception as e:
+            main_logger.error(f"Could not record usage of thread {thread_id}: {e}")
+        finally:
+            db.close()
+
+    def collect_garbage(self, batch_size: int = None) -> int:
+        """Delete one batch of retired and long idle threads; returns how many."""
+        from ..agent import conversation_locks, thread_cache
+        from .active_run_service import active_run_registry
+
+        batch_size = batch_size or settings.THREAD_GC_BATCH_SIZE
+        idle_before = datetime.utcnow() - timedelta(days=settings.THREAD_GC_IDLE_DAYS)
+        db = SessionLocal()
+        try:
+            usage_repo = ThreadUsageRepository(db)
+            usage_repo.track_untracked(batch_size)
+            candidates = usage_repo.list_retired(batch_size)
+            if len(candidates) < batch_size:
+                candidates += usage_repo.list_idle(
+                    idle_before, batch_size - len(candidates)
+                )
+            collected: List[str] = []
+            for usage in candidates:
+                try:
+                    # Skip users whose turn is running right now
+                    with conversation_locks.hold(usage.mobile_number, timeout=0):
+                        if not self._delete_remote(usage.thread_id):
+                            continue
+                        active_run_registry.delete(usage.thread_id)
+                        if usage.retired_at is None:
+                            thread_cache.pop(usage.mobile_number)
+                        collected.append(usage.thread_id)
+                except TimeoutError:
+                    continue
+            if collected:
+                usage_repo.delete(collected)
+        except Exception as e:
+            main_logger.error(f"Thread garbage collection failed: {e}")
+            return 0
+        finally:
+            db.close()
+        if collected:
+            metrics.increment("threads.collected", len(collected))
+            main_logger.info(f"Garbage-collected {len(collected)} OpenAI threads")
+        return len(collected)
+
+    def _delete_remote(self, thread_id: str) -> bool:
+        from openai import NotFoundError
+
+        try:
+            self._client_factory().beta.threads.delete(thread_id)
+        except NotFoundError:
+            pass
+        except Exception as e:
+            main_logger.warning(f"Could not delete OpenAI thread {thread_id}: {e}")
+            return False
+        return True
+
+    def start(self) -> None:
+        """Start the periodic garbage collector (idempotent)."""
+        if self.gc_interval <= 0 or self._collector is not None:
+            return
+        self._stopping.clear()
+        self._collector = threading.Thread(
+            target=self._collect_loop, name="thread-gc", daemon=True
+        )
+        self._collector.start()
+
+    def _collect_loop(self) -> None:
+        while not self._stopping.wait(self.gc_interval):
+            # Work through the backlog one batch at a time
+            while (
+                not self._stopping.is_set()
+                and self.collect_garbage() >= settings.THREAD_GC_BATCH_SIZE
+            ):
+                pass
+
+    def stop(self) -> None:
+        self._stopping.set()
+        collector, self._collector = self._collector, None
+        if collector is not None:
+            collector.join(timeout=5)
+
+
+def _openai_client():
+    from ..agent import get_openai_client
+
+    return get_openai_client()
+
+
+thread_lifecycle = ThreadLifecycle(
+    _openai_client, gc_interval=settings.THREAD_GC_INTERVAL_SECONDS
+)
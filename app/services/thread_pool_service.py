@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from ..core.config import settings
+from ..logger import main_logger
+from ..utils.metrics_util import metrics
+
+
+class ThreadPool:
+    """
+    Pool of empty, pre-created OpenAI threads handed out to first-time users.
+
+    ``take`` never blocks on OpenAI: it returns a pooled thread ID or None.
+    Whenever the pool drops below ``low_water`` a background thread refills
+    it up to ``size``. A ``size`` of 0 disables the pool.
+    """
+
+    def __init__(self, client_factory: Callable, size: int, low_water: int):
+        self._client_factory = client_factory
+        self.size = size
+        self.low_water = min(low_water, size)
+        self._threads = deque()
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._stopping = threading.Event()
+        self._refiller: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self) -> None:
+        """Start the refill thread and fill the pool (idempotent)."""
+        if not self.enabled or self._refiller is not None:
+            return
+        self._stopping.clear()
+        self._refiller = threading.Thread(
+            target=self._refill_loop, name="thread-pool-refill", daemon=True
+        )
+        self._refiller.start()
+        self._refill_needed.set()
+
+    def take(self) -> Optional[str]:
+        """Hand out a pre-created thread ID, or None if the pool is empty."""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        with self._lock:
+            thread_id = self._threads.popleft() if self._threads else None
+            remaining = len(self._threads)
+        metrics.set_gauge("thread_pool.size", remaining)
+        if remaining < self.low_water:
+            self.start()
+            self._refill_needed.set()
+        if thread_id is None:
+            metrics.increment("thread_pool.empty")
+            return None
+        metrics.increment("thread_pool.handed_out")
+        metrics.observe("thread_pool.handout_seconds", time.perf_counter() - start)
+        return thread_id
+
+    def _refill_loop(self) -> None:
+        while not self._stopping.is_set():
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            if self._stopping.is_set():
+                break
+            self._refill()
+
+    def _refill(self) -> None:
+        started = time.time()
+        created = 0
+        while not self._stopping.is_set():
+            with self._lock:
+                if len(self._threads) >= self.size:
+                    break
+            try:
+                thread = self._client_factory().beta.threads.create()
+            except Exception as e:
+                main_logger.error(f"Failed to pre-create OpenAI thread: {e}")
+                break
+            with self._lock:
+                self._threads.append(thread.id)
+                size = len(self._threads)
+            created += 1
+            metrics.increment("thread_pool.created")
+            metrics.set_gauge("thread_pool.size", size)
+        if created:
+            elapsed = time.time() - started
+            metrics.observe("thread_pool.refill_per_second", created / max(elapsed, 1e-6))
+            main_logger.info(
+                f"Pre-created {created} OpenAI threads in {elapsed:.2f}s"
+            )
+
+    def stop(self) -> None:
+        """Stop refilling and delete the threads that were never handed out."""
+        self._stopping.set()
+        self._refill_needed.set()
+        refiller, self._refiller = self._refiller, None
+        if refiller is not None:
+            refiller.join(timeout=5)
+        with self._lock:
+            unused, self._threads = list(self._threads), deque()
+        for thread_id in unused:
+            try:
+                self._client_factory().beta.threads.delete(thread_id)
+            except Exception as e:
+                main_logger.warning(f"Could not delete pooled thread {thread_id}: {e}")
+        metrics.set_gauge("thread_pool.size", 0)
+
+
+def _openai_client():
+    from ..agent import get_openai_client
+
+    return get_openai_client()
+
+
+thread_pool = ThreadPool(
+    _openai_client,
+    size=settings.THREAD_POOL_SIZE,
+    low_water=settings.THREAD_POOL_LOW_WATER,
+)
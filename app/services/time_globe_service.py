@@ -1,12 +1,41 @@
 from ..core.config import settings
-import requests, time, json
+import asyncio
+import threading
+from contextlib import contextmanager
+import hashlib
+import time, json
+from typing import Dict, Optional
+
+import httpx
 from fastapi import HTTPException, status
 from ..repositories.time_globe_repository import TimeGlobeRepository
-from ..db.session import get_db
+from .availability_cache_service import availability_cache
+from .catalog_cache_service import catalog_cache
+from .token_manager_service import TokenManager
+from ..db.session import SessionLocal
 from ..logger import main_logger
+from ..utils.deadline_util import remaining_timeout
+from ..utils.http_util import ConnectionReuseTracker, pool_limits
+from ..utils.metrics_util import metrics
+from ..utils.singleflight_util import AsyncSingleFlight, SingleFlight
 from datetime import datetime
 import re
 
+time_globe_connection_tracker = ConnectionReuseTracker("timeglobe.http")
+_client_lock = threading.Lock()
+_time_globe_client: Optional[httpx.Client] = None
+_async_time_globe_client: Optional[httpx.AsyncClient] = None
+
+# Endpoints that change state; identical concurrent calls are never shared
+WRITE_ENDPOINTS = {
+    "/auth/login",
+    "/bot/book",
+    "/bot/cancel",
+    "/bot/storeProfileData",
+}
+time_globe_flights = SingleFlight("timeglobe.singleflight")
+async_time_globe_flights = AsyncSingleFlight("timeglobe.singleflight")
+
 
 # Add a local format_datetime function to avoid circular imports
 def format_datetime(user_date_time: str) -> str:
@@ -159,91 +188,296 @@ def format_datetime(user_date_time: str) -> str:
     raise ValueError(f"Invalid date-time format: {user_date_time}")
 
 
+def _client_options(tracker_hook) -> dict:
+    return {
+        "limits": pool_limits(
+            settings.TIME_GLOBE_MAX_CONNECTIONS,
+            settings.TIME_GLOBE_MAX_KEEPALIVE_CONNECTIONS,
+            settings.TIME_GLOBE_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": settings.OUTBOUND_HTTP_TIMEOUT_SECONDS,
+        "event_hooks": {"response": [tracker_hook]},
+    }
+
+
+def get_time_globe_client() -> httpx.Client:
+    """Return the shared keep-alive httpx client for the TimeGlobe API."""
+    global _time_globe_client
+    if _time_globe_client is None:
+        with _client_lock:
+            if _time_globe_client is None:
+                _time_globe_client = httpx.Client(
+                    **_client_options(time_globe_connection_tracker.on_response)
+                )
+    return _time_globe_client
+
+
+def get_async_time_globe_client() -> httpx.AsyncClient:
+    """
+    Return the shared async httpx client for the TimeGlobe API.
+
+    Like ``get_async_openai_client``, its pool is bound to the event loop
+    that first uses it.
+    """
+    global _async_time_globe_client
+    if _async_time_globe_client is None:
+        with _client_lock:
+            if _async_time_globe_client is None:
+                _async_time_globe_client = httpx.AsyncClient(
+                    **_client_options(time_globe_connection_tracker.aon_response)
+                )
+    return _async_time_globe_client
+
+
+def parse_endpoint_timeouts(value: str) -> Dict[str, float]:
+    """Parse ``"/bot/book=30,/bot/cancel=30"`` into ``{endpoint: seconds}``."""
+    timeouts = {}
+    for entry in value.split(","):
+        endpoint, _, seconds = entry.strip().partition("=")
+        if endpoint and seconds:
+            timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
+
+
+def _is_success(response) -> bool:
+    return isinstance(response, dict) and response.get("code") in (None, 0)
+
+
+def _fetch_time_globe_token() -> str:
+    """Log in to TimeGlobe and return a new JWT token."""
+    main_logger.debug("Attempting to log in to Time Globe API")
+    response = get_time_globe_client().post(
+        settings.TIME_GLOBE_BASE_URL + "/auth/login",
+        json={
+            "customerCd": "demo",
+            "loginNm": settings.TIME_GLOBE_LOGIN_USERNAME,
+            "password": settings.TIME_GLOBE_LOGIN_PASSWORD,
+        },
+        timeout=remaining_timeout(
+            settings.OUTBOUND_HTTP_TIMEOUT_SECONDS, "logging in to Time Globe"
+        ),
+    )
+    if response.status_code != 200:
+        main_logger.error("Failed to log in to Time Globe API")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Failed to login"
+        )
+    main_logger.info("Successfully logged in to Time Globe API")
+    return response.json().get("jwt")
+
+
+time_globe_tokens = TokenManager(
+    "timeglobe",
+    _fetch_time_globe_token,
+    ttl=settings.TIME_GLOBE_TOKEN_TTL_SECONDS,
+    refresh_margin=settings.TIME_GLOBE_TOKEN_REFRESH_MARGIN_SECONDS,
+    shared=settings.TIME_GLOBE_TOKEN_SHARED,
+)
+
+
 class TimeGlobeService:
-    def __init__(self):
+    """
+    Client for the TimeGlobe booking API.
+
+    Requests go over one shared keep-alive connection pool per process
+    (``TIME_GLOBE_MAX_CONNECTIONS``); connection reuse is reported as the
+    ``timeglobe.http.*`` counters. Each endpoint has its own timeout
+    (``TIME_GLOBE_ENDPOINT_TIMEOUTS``, default ``OUTBOUND_HTTP_TIMEOUT_SECONDS``),
+    capped by the remaining budget of the current turn. The ``a``-prefixed
+    methods are the awaitable variants for the async engine.
+    """
+
+    def __init__(
+        self,
+        client: Optional[httpx.Client] = None,
+        async_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.base_url = settings.TIME_GLOBE_BASE_URL
         self.username = settings.TIME_GLOBE_LOGIN_USERNAME
         self.password = settings.TIME_GLOBE_LOGIN_PASSWORD
-        self.time_globe_repo = TimeGlobeRepository(next(get_db()))
-        self.token = None
-        self.expire_time = 3600  # 1 hour
+        self._client = client
+        self._async_client = async_client
+        self.endpoint_timeouts = parse_endpoint_timeouts(
+            settings.TIME_GLOBE_ENDPOINT_TIMEOUTS
+        )
         # self.siteCd = "bonn"  # None
         # self.item_no = None
         # self.employee_id = None
         # self.item_name = None
         # self.mobile_number = None
 
+    @contextmanager
+    def _time_globe_repo(self):
+        """Yield a TimeGlobeRepository bound to a short-lived session."""
+        db = SessionLocal()
+        try:
+            yield TimeGlobeRepository(db)
+        finally:
+            db.close()
+
+    @property
+    def client(self) -> httpx.Client:
+        return self._client or get_time_globe_client()
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        return self._async_client or get_async_time_globe_client()
+
+    def _timeout(self, endpoint: str) -> httpx.Timeout:
+        seconds = remaining_timeout(
+            self.endpoint_timeouts.get(endpoint, settings.OUTBOUND_HTTP_TIMEOUT_SECONDS),
+            endpoint,
+        )
+        return httpx.Timeout(
+            seconds, connect=min(seconds, settings.TIME_GLOBE_CONNECT_TIMEOUT_SECONDS)
+        )
+
+    @property
+    def token(self) -> Optional[str]:
+        return time_globe_tokens.token
+
     def login(self) -> None:
-        """Authenticate and retrieve a new JWT token."""
-        main_logger.debug("Attempting to log in to Time Globe API")
-        payload = {
-            "customerCd": "demo",
-            "loginNm": self.username,
-            "password": self.password,
-        }
-        response = requests.post(url=self.base_url + "/auth/login", json=payload)
-        if response.status_code == 200:
-            self.token = response.json().get("jwt")
-            self.expire_time = time.time() + 3600  # 1 hour
-            main_logger.info("Successfully logged in to Time Globe API")
-        else:
-            main_logger.error("Failed to log in to Time Globe API")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Failed to login"
-            )
+        """
+        Replace the JWT token. Concurrent and cross-process logins are
+        coalesced by ``time_globe_tokens``.
+        """
+        time_globe_tokens.refresh(stale_token=self.token)
 
     def get_token(self) -> str:
         """Return a valid token, refreshing if expired."""
-        main_logger.debug("Checking token validity")
-        if not self.token or time.time() > self.expire_time:
-            main_logger.info("Token expired or missing, refreshing token")
-            self.login()
-        return self.token
+        return time_globe_tokens.get_token()
 
-    def request(
-        self,
-        method: str,
-        endpoint: str,
-        mobile_number: str = None,
-        data=None,
-        is_header=False,
-    ):
-        """Generic method to make authenticated requests."""
-        main_logger.debug(f"Making {method} request to {endpoint}")
+    @staticmethod
+    def _headers(mobile_number: str) -> dict:
         headers = {
             "Content-Type": "application/json",
             "x-book-auth-key": settings.TIME_GLOBE_API_KEY,
-            "x-book-login-nm": mobile_number,
         }
-        url = f"{self.base_url}{endpoint}"
+        # requests used to drop unset headers; httpx rejects None values
+        if mobile_number is not None:
+            headers["x-book-login-nm"] = mobile_number
+        return headers
+
+    def _request_args(
+        self, method: str, endpoint: str, mobile_number: str, data, is_header: bool
+    ) -> dict:
         main_logger.debug(f"Request payload: {data}")
-
+        args = {
+            "method": method,
+            "url": f"{self.base_url}{endpoint}",
+            "headers": self._headers(mobile_number) if is_header else None,
+        }
         if data:
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                headers=headers if is_header else None,
-            )
-        else:
-            response = requests.request(
-                method=method, url=url, headers=headers if is_header else None
-            )
+            args["json"] = data
+        return args
 
+    @staticmethod
+    def _log_response(endpoint: str, response: httpx.Response, start: float) -> None:
+        metrics.observe(f"timeglobe.{endpoint}.seconds", time.perf_counter() - start)
         main_logger.debug(f"Response status code: {response.status_code}")
         main_logger.debug(f"Response body: {response.text}")
+        if response.status_code == 401:
+            # Requests authenticate with TIME_GLOBE_API_KEY, not the login
+            # token, so logging in again would not help
+            metrics.increment("timeglobe.unauthorized")
+            main_logger.error(f"Time Globe rejected the API key for {endpoint}")
+        elif response.status_code >= 500:
+            # A server error says nothing about the token; logging in again
+            # would only add load while TimeGlobe is struggling
+            metrics.increment("timeglobe.server_errors")
+            main_logger.warning(
+                f"Time Globe returned {response.status_code} for {endpoint}"
+            )
+
+    @staticmethod
+    def _flight_key(
+        method: str, endpoint: str, mobile_number: str, data, is_header: bool
+    ) -> Optional[tuple]:
+        """
+        Key under which identical concurrent reads share one upstream call,
+        or None for writes. The caller's identity is part of the key
+        whenever it is sent.
+        """
+        if endpoint in WRITE_ENDPOINTS:
+            return None
+        payload = json.dumps(data, sort_keys=True, default=str).encode()
+        return (
+            method.upper(),
+            endpoint,
+            hashlib.sha256(payload).hexdigest(),
+            mobile_number if is_header else None,
+        )
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        mobile_number: str = None,
+        data=None,
+        is_header=False,
+    ):
+        """
+        Generic method to make authenticated requests.
+
+        Each call is bounded by the remaining budget of the current turn (see
+        ``deadline_util``) and fails fast once the turn is out of time.
+        Identical reads in flight at the same time share one upstream call.
+        """
+        key = self._flight_key(method, endpoint, mobile_number, data, is_header)
+        if key is None:
+            return self._request(method, endpoint, mobile_number, data, is_header)
+        return time_globe_flights.do(
+            key,
+            lambda: self._request(method, endpoint, mobile_number, data, is_header),
+            timeout=self._timeout(endpoint).read,
+        )
+
+    def _request(
+        self, method: str, endpoint: str, mobile_number: str, data, is_header: bool
+    ):
+        main_logger.debug(f"Making {method} request to {endpoint}")
+        args = self._request_args(method, endpoint, mobile_number, data, is_header)
+        start = time.perf_counter()
+        response = self.client.request(**args, timeout=self._timeout(endpoint))
+        self._log_response(endpoint, response, start)
+        return response.json()
 
-        if response.status_code in [401, 500]:  # token expired or invalid
-            main_logger.warning("Token expired or invalid, attempting to refresh token")
-            self.login()
-            response = requests.request(
-                method=method, url=url, json=data, headers=headers
+    async def arequest(
+        self,
+        method: str,
+        endpoint: str,
+        mobile_number: str = None,
+        data=None,
+        is_header=False,
+    ):
+        """Awaitable ``request``."""
+        key = self._flight_key(method, endpoint, mobile_number, data, is_header)
+        if key is None:
+            return await self._arequest(
+                method, endpoint, mobile_number, data, is_header
             )
+        return await async_time_globe_flights.do(
+            key,
+            lambda: self._arequest(method, endpoint, mobile_number, data, is_header),
+        )
 
+    async def _arequest(
+        self, method: str, endpoint: str, mobile_number: str, data, is_header: bool
+    ):
+        main_logger.debug(f"Making {method} request to {endpoint}")
+        args = self._request_args(method, endpoint, mobile_number, data, is_header)
+        start = time.perf_counter()
+        response = await self.async_client.request(
+            **args, timeout=self._timeout(endpoint)
+        )
+        self._log_response(endpoint, response, start)
         return response.json()
 
     def get_sites(self):
-        """Get the available salons."""
+        """Get the available salons (cached, see ``CatalogCache``)."""
+        return catalog_cache.get(("demo", "sites", None), self._fetch_sites)
+
+    def _fetch_sites(self):
         main_logger.debug("Fetching available salons")
         payload = {"customerCd": "demo"}
         response = self.request("POST", "/browse/getSites", data=payload)
@@ -256,7 +490,21 @@ class TimeGlobeService:
         return sites
 
     def get_products(self, siteCd: str):
-        """Retrieve a list of available services for a selected salon."""
+        """Retrieve a list of available services for a selected salon (cached)."""
+        return catalog_cache.get(
+            ("demo", "products", siteCd),
+            lambda: self._fetch_products(siteCd),
+            cacheable=_is_success,
+        )
+
+    async def aget_products(self, siteCd: str):
+        return await catalog_cache.aget(
+            ("demo", "products", siteCd),
+            lambda: self._afetch_products(siteCd),
+            cacheable=_is_success,
+        )
+
+    def _fetch_products(self, siteCd: str):
         main_logger.debug(f"Fetching products for site: {siteCd}")
         # self.siteCd = siteCd
         payload = {"customerCd": "demo", "siteCd": siteCd}
@@ -264,8 +512,26 @@ class TimeGlobeService:
         main_logger.info(f"Successfully fetched products for site: {siteCd}")
         return response
 
+    async def _afetch_products(self, siteCd: str):
+        payload = {"customerCd": "demo", "siteCd": siteCd}
+        response = await self.arequest("POST", "/browse/getProducts", data=payload)
+        main_logger.info(f"Successfully fetched products for site: {siteCd}")
+        return response
+
     def get_employee(self, items: str, siteCd: str,week: int):
-        """Retrieve a list of available employees for a studio."""
+        """Retrieve a list of available employees for a studio (briefly cached)."""
+        return availability_cache.get(
+            availability_cache.employees_key(siteCd, week, items),
+            lambda: self._fetch_employees(items, siteCd, week),
+        )
+
+    async def aget_employee(self, items: str, siteCd: str, week: int):
+        return await availability_cache.aget(
+            availability_cache.employees_key(siteCd, week, items),
+            lambda: self._afetch_employees(items, siteCd, week),
+        )
+
+    def _fetch_employees(self, items: str, siteCd: str, week: int):
         main_logger.debug(f"Fetching employees for item: {items}")
         payload = {
             "customerCd": "demo",
@@ -279,8 +545,35 @@ class TimeGlobeService:
         main_logger.info(f"Successfully fetched employees for item: {items}")
         return response
 
+    async def _afetch_employees(self, items: str, siteCd: str, week: int):
+        payload = {
+            "customerCd": "demo",
+            "siteCd": siteCd,
+            "week": week,
+            "items": items,
+        }
+        response = await self.arequest("POST", "/browse/getEmployees", data=payload)
+        main_logger.info(f"Successfully fetched employees for item: {items}")
+        return response
+
     def AppointmentSuggestion(self, week: int, employee_id: int, item_no: int, siteCd: str):
-        """Retrieve available appointment slots for selected services."""
+        """Retrieve available appointment slots for selected services (briefly cached)."""
+        return availability_cache.get(
+            availability_cache.suggestions_key(siteCd, week, employee_id, item_no),
+            lambda: self._fetch_suggestions(week, employee_id, item_no, siteCd),
+        )
+
+    async def aAppointmentSuggestion(
+        self, week: int, employee_id: int, item_no: int, siteCd: str
+    ):
+        return await availability_cache.aget(
+            availability_cache.suggestions_key(siteCd, week, employee_id, item_no),
+            lambda: self._afetch_suggestions(week, employee_id, item_no, siteCd),
+        )
+
+    def _fetch_suggestions(
+        self, week: int, employee_id: int, item_no: int, siteCd: str
+    ):
         main_logger.debug(f"Fetching suggestions for employee: {employee_id}")
         # self.employee_id = employee_id
         payload = {
@@ -295,6 +588,21 @@ class TimeGlobeService:
         )
         return response
 
+    async def _afetch_suggestions(
+        self, week: int, employee_id: int, item_no: int, siteCd: str
+    ):
+        payload = {
+            "customerCd": "demo",
+            "siteCd": siteCd,
+            "week": week,
+            "positions": [{"itemNo": item_no, "employeeId": employee_id}],
+        }
+        response = await self.arequest("POST", "/browse/getSuggestions", data=payload)
+        main_logger.info(
+            f"Successfully fetched suggestions for employee: {employee_id}"
+        )
+        return response
+
     def get_profile(self, mobile_number: str):
         """Retrieve the profile data for a given phone number."""
         main_logger.debug(f"Fetching profile for mobile number: {mobile_number}")
@@ -308,7 +616,8 @@ class TimeGlobeService:
 
         if response and response.get("code") != -3:
             main_logger.info(f"Profile found for mobile number: {mobile_number}")
-            self.time_globe_repo.create_customer(response, mobile_number)
+            with self._time_globe_repo() as time_globe_repo:
+                time_globe_repo.create_customer(response, mobile_number)
         else:
             main_logger.warning(f"No profile found for mobile number: {mobile_number}")
 
@@ -347,20 +656,9 @@ class TimeGlobeService:
             # formatted_datetime = format_datetime(user_date_time)
             main_logger.debug(f"datetime: {beginTs}")
 
-            payload = {
-                "siteCd": siteCd,
-                "reminderSms": True,
-                "reminderEmail": True,
-                "positions": [
-                    {
-                        "beginTs": beginTs,  # "2025-02-25T12:00:00.000Z"
-                        "durationMillis": durationMillis,
-                        "employeeId": employeeId,
-                        "itemNo": itemNo,
-                    }
-                ],
-            }
-            
+            payload = self._booking_payload(
+                beginTs, durationMillis, employeeId, itemNo, siteCd
+            )
             response = self.request(
                 "POST",
                 "/bot/book",
@@ -368,22 +666,76 @@ class TimeGlobeService:
                 is_header=True,
                 mobile_number=mobileNumber,
             )
-            if response.get("code") == 0:
-                main_logger.info("Appointment booked successfully")
-                payload.update(
-                    {
-                        "mobileNumber": mobileNumber,
-                        "orderId": response.get("orderId"),
-                    }
-                )
-                self.time_globe_repo.save_book_appointment(payload)
-            else:
-                main_logger.error(f"Failed to book appointment: {response}")
+            self._record_booking(response, payload, mobileNumber)
             return response
         except Exception as e:
             main_logger.error(f"Error in book_appointment: {str(e)}")
             raise
 
+    async def abook_appointment(
+        self,
+        beginTs: str,
+        durationMillis: int,
+        mobileNumber: str,
+        employeeId: int,
+        itemNo: int,
+        siteCd: str,
+    ):
+        try:
+            payload = self._booking_payload(
+                beginTs, durationMillis, employeeId, itemNo, siteCd
+            )
+            response = await self.arequest(
+                "POST",
+                "/bot/book",
+                data=payload,
+                is_header=True,
+                mobile_number=mobileNumber,
+            )
+            await asyncio.to_thread(
+                self._record_booking, response, payload, mobileNumber
+            )
+            return response
+        except Exception as e:
+            main_logger.error(f"Error in book_appointment: {str(e)}")
+            raise
+
+    @staticmethod
+    def _booking_payload(
+        beginTs: str, durationMillis: int, employeeId: int, itemNo: int, siteCd: str
+    ) -> dict:
+        return {
+            "siteCd": siteCd,
+            "reminderSms": True,
+            "reminderEmail": True,
+            "positions": [
+                {
+                    "beginTs": beginTs,  # "2025-02-25T12:00:00.000Z"
+                    "durationMillis": durationMillis,
+                    "employeeId": employeeId,
+                    "itemNo": itemNo,
+                }
+            ],
+        }
+
+    def _record_booking(self, response: dict, payload: dict, mobileNumber: str) -> None:
+        if response.get("code") == 0:
+            main_logger.info("Appointment booked successfully")
+            position = payload["positions"][0]
+            availability_cache.invalidate_booking(
+                payload["siteCd"], position["employeeId"], position["beginTs"]
+            )
+            payload.update(
+                {
+                    "mobileNumber": mobileNumber,
+                    "orderId": response.get("orderId"),
+                }
+            )
+            with self._time_globe_repo() as time_globe_repo:
+                time_globe_repo.save_book_appointment(payload)
+        else:
+            main_logger.error(f"Failed to book appointment: {response}")
+
     def cancel_appointment(self, orderId: int, mobileNumber: str, siteCd):
         """Cancel an existing appointment."""
         main_logger.debug(f"Canceling appointment with order ID: {orderId}")
@@ -398,12 +750,32 @@ class TimeGlobeService:
             is_header=True,
             mobile_number=mobileNumber,
         )
+        self._record_cancellation(response, orderId, siteCd)
+        return response
+
+    async def acancel_appointment(self, orderId: int, mobileNumber: str, siteCd):
+        payload = {
+            "siteCd": siteCd,
+            "orderId": orderId,
+        }
+        response = await self.arequest(
+            "POST",
+            "/bot/cancel",
+            data=payload,
+            is_header=True,
+            mobile_number=mobileNumber,
+        )
+        await asyncio.to_thread(self._record_cancellation, response, orderId, siteCd)
+        return response
+
+    def _record_cancellation(self, response: dict, orderId: int, siteCd) -> None:
         if response.get("code") == 0:
             main_logger.info(f"Appointment canceled successfully: {orderId}")
-            self.time_globe_repo.delete_booking(orderId)
+            availability_cache.invalidate_site(siteCd)
+            with self._time_globe_repo() as time_globe_repo:
+                time_globe_repo.delete_booking(orderId)
         else:
             main_logger.error(f"Failed to cancel appointment: {orderId}")
-        return response
 
     def store_profile(
         self,
@@ -467,7 +839,8 @@ class TimeGlobeService:
                         "firstNm": first_name,
                         "lastNm": last_name,
                     }
-                    self.time_globe_repo.create_customer(customer_data, mobile_number)
+                    with self._time_globe_repo() as time_globe_repo:
+                        time_globe_repo.create_customer(customer_data, mobile_number)
                     return {"code": 0, "message": "Profile created successfully"}
                 else:
                     main_logger.error(f"API returned error code: {code}")
@@ -0,0 +1,206 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+import jwt
+
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.service_token_repository import ServiceTokenRepository
+from ..utils.metrics_util import metrics
+
+# How long a process may hold the refresh lease before others step in
+REFRESH_LEASE_SECONDS = 30
+SHARED_POLL_INTERVAL_SECONDS = 0.25
+RETRY_AFTER_FAILURE_SECONDS = 30.0
+
+
+def token_expiry(token: str, default_ttl: float) -> datetime:
+    """Expiry from the JWT ``exp`` claim, or ``default_ttl`` from now."""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        if exp:
+            return datetime.utcfromtimestamp(exp)
+    except jwt.InvalidTokenError:
+        pass
+    return datetime.utcnow() + timedelta(seconds=default_ttl)
+
+
+class TokenManager:
+    """
+    Keeps the access token of an upstream API valid.
+
+    - ``get_token`` returns the cached token and only logs in when there is
+      none or it has expired.
+    - A background refresher (``start``) renews the token
+      ``refresh_margin`` seconds before it expires, so requests do not wait
+      for a login. It only begins once a token has been asked for, so a
+      process that never needs the token never logs in.
+    - Within a process, one refresh runs at a time and concurrent callers
+      share its result. A caller whose token was rejected passes it as
+      ``stale_token``; if it has been replaced in the meantime, the
+      replacement is returned without another login.
+    - With ``shared`` set, the token is stored in the ``ServiceTokens`` table.
+      Processes adopt a token another process obtained, and a refresh lease
+      lets one process log in while the others wait for its result.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        fetch: Callable[[], str],
+        ttl: float,
+        refresh_margin: float,
+        shared: bool,
+    ):
+        self.service = service
+        self._fetch = fetch
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.shared = shared
+        self._token: Optional[str] = None
+        self._expires_at: Optional[datetime] = None
+        self._obtained_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._auto_refresh = False
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token
+
+    def _valid(self) -> bool:
+        return self._token is not None and datetime.utcnow() < self._expires_at
+
+    def get_token(self) -> str:
+        """Return a valid token, logging in only when there is none."""
+        if self._valid():
+            return self._token
+        token = self.refresh()
+        if self._auto_refresh:
+            self._start_refresher()
+        return token
+
+    def refresh(self, stale_token: Optional[str] = None) -> str:
+        """Return a new token in place of ``stale_token`` or a missing one."""
+        with self._lock:
+            if self._valid() and (stale_token is None or self._token != stale_token):
+                # Refreshed by another caller while we waited for the lock
+                return self._token
+            if self.shared:
+                try:
+                    shared = self._refresh_shared(stale_token)
+                except Exception as e:
+                    main_logger.warning(
+                        f"Shared {self.service} token unavailable, "
+                        f"logging in locally: {e}"
+                    )
+                    shared = None
+                if shared is not None:
+                    self._use(*shared)
+                    return self._token
+            self._use(*self._login())
+            return self._token
+
+    def _use(self, token: str, expires_at: datetime) -> None:
+        self._token, self._expires_at = token, expires_at
+        self._obtained_at = datetime.utcnow()
+        metrics.set_gauge(
+            f"{self.service}.token.expires_in_seconds",
+            (expires_at - datetime.utcnow()).total_seconds(),
+        )
+
+    def _login(self) -> Tuple[str, datetime]:
+        try:
+            token = self._fetch()
+        except Exception:
+            metrics.increment(f"{self.service}.token.refresh_failures")
+            raise
+        metrics.increment(f"{self.service}.token.logins")
+        return token, token_expiry(token, self.ttl)
+
+    def _refresh_shared(
+        self, stale_token: Optional[str]
+    ) -> Optional[Tuple[str, datetime]]:
+        """
+        Adopt a token another process stored, or log in under the refresh
+        lease and store the result. Returns None when the lease holder did
+        not deliver in time.
+        """
+        deadline = time.monotonic() + REFRESH_LEASE_SECONDS
+        while True:
+            db = SessionLocal()
+            try:
+                repository = ServiceTokenRepository(db)
+                stored = repository.get(self.service)
+                if (
+                    stored is not None
+                    and stored.token
+                    and stored.token != stale_token
+                    and stored.expires_at > datetime.utcnow()
+                ):
+                    metrics.increment(f"{self.service}.token.adopted")
+                    return stored.token, stored.expires_at
+                if repository.claim_refresh(
+                    self.service, self._owner, REFRESH_LEASE_SECONDS
+                ):
+                    try:
+                        token, expires_at = self._login()
+                    except Exception:
+                        repository.release(self.service, self._owner)
+                        raise
+                    repository.store(self.service, self._owner, token, expires_at)
+                    return token, expires_at
+            finally:
+                db.close()
+            if time.monotonic() >= deadline:
+                return None
+            metrics.increment(f"{self.service}.token.waited")
+            time.sleep(SHARED_POLL_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        """Keep the token renewed in the background from the first ``get_token`` on."""
+        self._stopping.clear()
+        self._auto_refresh = True
+        if self._token is not None:
+            self._start_refresher()
+
+    def _start_refresher(self) -> None:
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name=f"{self.service}-token", daemon=True
+            )
+            self._refresher.start()
+
+    def _seconds_until_refresh(self) -> float:
+        if self._token is None:
+            return 0.0
+        # Short-lived tokens are renewed half-way instead
+        lifetime = (self._expires_at - self._obtained_at).total_seconds()
+        margin = min(self.refresh_margin, lifetime / 2)
+        refresh_at = self._expires_at - timedelta(seconds=margin)
+        return max((refresh_at - datetime.utcnow()).total_seconds(), 0.0)
+
+    def _refresh_loop(self) -> None:
+        while not self._stopping.wait(self._seconds_until_refresh()):
+            try:
+                self.refresh(stale_token=self._token)
+            except Exception as e:
+                main_logger.error(
+                    f"Background refresh of {self.service} token failed: {e}"
+                )
+                self._stopping.wait(RETRY_AFTER_FAILURE_SECONDS)
+
+    def stop(self) -> None:
+        self._auto_refresh = False
+        self._stopping.set()
+        refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.join(timeout=5)
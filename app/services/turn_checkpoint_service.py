@@ -0,0 +1,204 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from ..db.session import SessionLocal
+from ..logger import main_logger
+from ..repositories.turn_checkpoint_repository import TurnCheckpointRepository
+from ..utils.metrics_util import metrics
+
+STAGE_STARTED = "started"
+STAGE_RUN_CREATED = "run_created"
+STAGE_TOOL_OUTPUTS_SUBMITTED = "tool_outputs_submitted"
+STAGE_COMPLETED = "completed"
+
+
+def tool_call_key(tool_call: Any) -> str:
+    """Identify a tool call by function and arguments."""
+    raw_args = tool_call.function.arguments or "{}"
+    try:
+        raw_args = json.dumps(json.loads(raw_args), sort_keys=True)
+    except (TypeError, ValueError):
+        pass
+    return f"{tool_call.function.name}:{raw_args}"
+
+
+def _output_key(run_id: Optional[str], tool_call: Any) -> str:
+    return f"{run_id or ''}:{tool_call.id}"
+
+
+@dataclass
+class TurnCheckpoint:
+    """
+    Progress of one conversation turn: whether the user message was posted
+    (it travels with the run, so a stored ``run_id`` means it was), which
+    write tools already ran and whether the turn completed.
+
+    Write tool outputs are stored by ``(run_id, tool_call_id)``. They are
+    only reused once the turn is resumed (``resume``): the resumed run gets
+    the output of the same tool call, a replacement run (or a redelivered
+    Chat Completions turn) the output of an earlier call with the same
+    function and arguments, each at most once. Read tools always run again,
+    so a repeated read never returns a result from before a write.
+
+    Checkpoints with a ``turn_id`` are persisted in ``TurnCheckpoints`` so
+    that a message redelivered after a worker crash resumes the same run;
+    without one they only live for the retries of the current call.
+    Persistence is best effort and never fails the turn.
+    """
+
+    turn_id: Optional[str]
+    mobile_number: str
+    stage: str = STAGE_STARTED
+    thread_id: Optional[str] = None
+    run_id: Optional[str] = None
+    # "run_id:tool_call_id" -> {"call": tool_call_key, "output": ..., "reused": bool}
+    tool_outputs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    response_text: Optional[str] = None
+    # Outputs recorded before the turn was resumed; only these are reused
+    _carried: Set[str] = field(default_factory=set, repr=False)
+
+    @classmethod
+    def load(cls, turn_id: Optional[str], mobile_number: str) -> "TurnCheckpoint":
+        if not turn_id:
+            return cls(turn_id=None, mobile_number=mobile_number)
+        db = SessionLocal()
+        try:
+            stored = TurnCheckpointRepository(db).get(turn_id)
+        except Exception as e:
+            main_logger.error(f"Could not load checkpoint for turn {turn_id}: {e}")
+            stored = None
+        finally:
+            db.close()
+        if stored is None:
+            return cls(turn_id=turn_id, mobile_number=mobile_number)
+        metrics.increment("turn_checkpoints.resumed")
+        main_logger.info(f"Resuming turn {turn_id} from stage {stored.stage}")
+        tool_outputs = json.loads(stored.tool_outputs or "{}")
+        checkpoint = cls(
+            turn_id=turn_id,
+            mobile_number=mobile_number,
+            stage=stored.stage,
+            thread_id=stored.thread_id,
+            run_id=stored.run_id,
+            tool_outputs={
+                key: entry
+                for key, entry in tool_outputs.items()
+                if isinstance(entry, dict)
+            },
+            response_text=stored.response_text,
+        )
+        checkpoint.resume()
+        return checkpoint
+
+    @property
+    def completed(self) -> bool:
+        return self.stage == STAGE_COMPLETED
+
+    def record_run(self, thread_id: str, run_id: str) -> None:
+        self.thread_id, self.run_id = thread_id, run_id
+        self.stage = STAGE_RUN_CREATED
+        self._persist(stage=self.stage, thread_id=thread_id, run_id=run_id)
+
+    def resume(self) -> None:
+        """Make the write outputs recorded so far available for reuse."""
+        self._carried = set(self.tool_outputs)
+
+    def reusable_outputs(self, tool_calls: List[Any]) -> Dict[int, Dict[str, str]]:
+        """
+        Outputs of write tools that already ran before the turn was resumed,
+        by index in ``tool_calls``.
+        """
+        if not self._carried:
+            return {}
+        reused = {}
+        for idx, tool_call in enumerate(tool_calls):
+            key = _output_key(self.run_id, tool_call)
+            entry = self.tool_outputs.get(key) if key in self._carried else None
+            if entry is None:
+                # A replacement run asks again under a new tool call ID
+                entry = self._unused_output(tool_call_key(tool_call))
+                if entry is None:
+                    continue
+                entry["reused"] = True
+                self.tool_outputs[key] = entry = dict(entry)
+                self._carried.add(key)
+            entry["reused"] = True
+            reused[idx] = {"tool_call_id": tool_call.id, "output": entry["output"]}
+        if reused:
+            metrics.increment("turn_checkpoints.tool_outputs_reused", len(reused))
+            self._persist(tool_outputs=json.dumps(self.tool_outputs))
+        return reused
+
+    def _unused_output(self, call: str) -> Optional[Dict[str, Any]]:
+        for key in self._carried:
+            entry = self.tool_outputs[key]
+            if entry["call"] == call and not entry.get("reused"):
+                return entry
+        return None
+
+    def record_tool_outputs(
+        self, tool_calls: List[Any], outputs: List[Dict[str, str]]
+    ) -> None:
+        """Remember the outputs of write tools before they are submitted."""
+        for tool_call, output in zip(tool_calls, outputs):
+            self.tool_outputs[_output_key(self.run_id, tool_call)] = {
+                "call": tool_call_key(tool_call),
+                "output": output["output"],
+            }
+        if tool_calls:
+            self._persist(tool_outputs=json.dumps(self.tool_outputs))
+
+    def record_submitted(self) -> None:
+        self.stage = STAGE_TOOL_OUTPUTS_SUBMITTED
+        self._persist(stage=self.stage)
+
+    def complete(self, response_text: str) -> None:
+        self.stage = STAGE_COMPLETED
+        self.response_text = response_text
+        self._persist(stage=self.stage, response_text=response_text)
+
+    def _persist(self, **fields) -> None:
+        if not self.turn_id:
+            return
+        db = SessionLocal()
+        try:
+            TurnCheckpointRepository(db).save(self.turn_id, self.mobile_number, **fields)
+        except Exception as e:
+            main_logger.error(f"Could not save checkpoint for turn {self.turn_id}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def discard(turn_id: Optional[str]) -> None:
+        """Remove the checkpoint once the turn is delivered or given up on."""
+        if not turn_id:
+            return
+        db = SessionLocal()
+        try:
+            TurnCheckpointRepository(db).delete(turn_id)
+        except Exception as e:
+            main_logger.error(f"Could not delete checkpoint for turn {turn_id}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def collect_garbage(max_age_hours: float) -> int:
+        """
+        Delete checkpoints of turns idle for ``max_age_hours``, e.g. of
+        messages given up on at claim time; returns how many.
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        db = SessionLocal()
+        try:
+            deleted = TurnCheckpointRepository(db).delete_older_than(cutoff)
+        except Exception as e:
+            main_logger.error(f"Turn checkpoint garbage collection failed: {e}")
+            return 0
+        finally:
+            db.close()
+        if deleted:
+            metrics.increment("turn_checkpoints.collected", deleted)
+            main_logger.info(f"Garbage-collected {deleted} turn checkpoints")
+        return deleted
@@ -1,5 +1,6 @@
 from ..core.config import settings
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from ..repositories.twilio_repository import TwilioRepository
 from ..repositories.user_repository import UserRepository
 from ..schemas.twilio_sender import (
@@ -13,6 +14,7 @@ import requests
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from ..logger import main_logger
+from ..utils.deadline_util import remaining_timeout
 
 
 class TwilioService:
@@ -20,7 +22,13 @@ class TwilioService:
         self.twilio_repository = TwilioRepository(db)
         self.user_repository = UserRepository(db)
         self.message_service_id = settings.TWILIO_MESSAGING_SERVICE_SID
-        self.client = Client(settings.account_sid, settings.auth_token)
+        self.client = Client(
+            settings.account_sid,
+            settings.auth_token,
+            http_client=TwilioHttpClient(
+                timeout=settings.OUTBOUND_HTTP_TIMEOUT_SECONDS
+            ),
+        )
 
     @property
     def _header(self):
@@ -50,6 +58,9 @@ class TwilioService:
                 json=payload,
                 headers=self._header,
                 auth=self._auth,
+                timeout=remaining_timeout(
+                    settings.OUTBOUND_HTTP_TIMEOUT_SECONDS, endpoint
+                ),
             )
 
             if response.status_code in [200, 201, 202]:
@@ -68,6 +79,9 @@ class TwilioService:
     def send_whatsapp(self, to: str, message: str):
         main_logger.info(f"Sending WhatsApp message to {to}: {message}")
         try:
+            self.client.http_client.timeout = remaining_timeout(
+                settings.OUTBOUND_HTTP_TIMEOUT_SECONDS, "sending a WhatsApp message"
+            )
             response = self.client.messages.create(
                 messaging_service_sid=self.message_service_id,
                 to=to,
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .metrics_util import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache with optional per-entry expiry.
+
+    When ``name`` is given, hits, misses and evictions are reported to the
+    metrics registry under that prefix.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, event: str, value: int = 1) -> None:
+        if self.name:
+            metrics.increment(f"{self.name}.{event}", value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._count("misses")
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._count("misses")
+                self._count("expired")
+                return default
+            self._data.move_to_end(key)
+            self._count("hits")
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            if evicted:
+                self._count("evictions", evicted)
+            if self.name:
+                metrics.set_gauge(f"{self.name}.size", len(self._data))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            doomed = [k for k, (v, _) in self._data.items() if predicate(k, v)]
+            for key in doomed:
+                del self._data[key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
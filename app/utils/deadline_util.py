@@ -0,0 +1,79 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from .metrics_util import metrics
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of starting an outbound call the turn has no time left for."""
+
+
+class Deadline:
+    """
+    Time budget of one conversation turn.
+
+    The turn's deadline is carried in a context variable (see
+    ``deadline_scope``), so the agent, tool wrappers and service clients can
+    size their timeouts from the remaining budget without it being threaded
+    through every signature.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, operation: str = "request") -> None:
+        """Fail fast when the budget is spent."""
+        if self.expired:
+            metrics.increment("deadline.exceeded")
+            raise DeadlineExceeded(
+                f"Turn deadline of {self.seconds:g}s exceeded before {operation}"
+            )
+
+    def timeout(self, cap: Optional[float] = None, operation: str = "request") -> float:
+        """Remaining budget, at most ``cap``; raises if nothing is left."""
+        self.check(operation)
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "turn_deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Union[Deadline, float]) -> Iterator[Deadline]:
+    """Make ``deadline`` (or a new one of that many seconds) the current one."""
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_timeout(default: float, operation: str = "request") -> float:
+    """
+    Timeout for an outbound call: ``default`` outside a turn, otherwise the
+    turn's remaining budget capped at ``default``. Raises ``DeadlineExceeded``
+    when the turn is already over budget.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    return deadline.timeout(default, operation)
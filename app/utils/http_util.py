@@ -0,0 +1,53 @@
+import threading
+import weakref
+
+import httpx
+
+from .metrics_util import metrics
+
+
+class ConnectionReuseTracker:
+    """
+    httpx response hook that counts how many requests reused a pooled
+    connection versus opening a new one.
+
+    httpx exposes the underlying socket stream of every response as the
+    ``network_stream`` extension; a stream that has been seen before means
+    the request went over a kept-alive connection.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def on_response(self, response: httpx.Response) -> None:
+        metrics.increment(f"{self.name}.requests")
+        stream = response.extensions.get("network_stream")
+        if stream is None:
+            return
+        try:
+            with self._lock:
+                is_new = stream not in self._seen
+                if is_new:
+                    self._seen.add(stream)
+        except TypeError:  # stream type without weakref support
+            return
+        metrics.increment(
+            f"{self.name}.connections_opened"
+            if is_new
+            else f"{self.name}.connections_reused"
+        )
+
+    async def aon_response(self, response: httpx.Response) -> None:
+        self.on_response(response)
+
+
+def pool_limits(
+    max_connections: int, max_keepalive_connections: int, keepalive_expiry: float
+) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
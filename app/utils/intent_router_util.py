@@ -0,0 +1,257 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional
+
+from ..core.config import settings
+from .metrics_util import metrics
+
+logger = logging.getLogger(__name__)
+
+INTENT_GREETING = "greeting"
+INTENT_LIST_APPOINTMENTS = "list_appointments"
+INTENT_CANCEL_APPOINTMENT = "cancel_appointment"
+INTENT_LIST_SALONS = "list_salons"
+
+# Language-neutral patterns reply in INTENT_ROUTER_DEFAULT_LANGUAGE
+ANY_LANGUAGE = None
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    language: str
+
+
+# Politeness that does not change what is being asked for
+_FILLER_RE = re.compile(
+    r"\b(please|pls|plz|thanks|thank you|can you|could you|would you|"
+    r"i want to|i would like to|i'd like to|id like to|i need to|"
+    r"bitte|danke|mal|gerne|kannst du|können sie|koennen sie|könnten sie|"
+    r"koennten sie|ich möchte|ich moechte|ich will|ich würde gerne|ich muss)\b"
+)
+_NOISE_RE = re.compile(r"[^\w\s']+")
+_SPACE_RE = re.compile(r"\s+")
+
+_APPOINTMENTS_EN = r"(appointments?|bookings?)"
+_SALONS_EN = r"(salons?|locations?|branches|shops?|stores?)"
+_SALONS_DE = r"(salons?|filialen|filiale|standorte?|läden|laeden|friseure?)"
+
+# (intent, language, pattern); a message must match a pattern as a whole
+_PATTERNS = [
+    (INTENT_GREETING, ANY_LANGUAGE, r"(hi|hey|hallo hi|hi hallo)( there)?"),
+    (INTENT_GREETING, "en", r"(hello|hiya|good (morning|afternoon|evening))( there)?"),
+    (
+        INTENT_GREETING,
+        "de",
+        r"(hallo|hallöchen|moin( moin)?|servus|grüß gott|gruess gott|grüezi|"
+        r"guten (morgen|tag|abend))( zusammen)?",
+    ),
+    (
+        INTENT_LIST_APPOINTMENTS,
+        "en",
+        rf"((show|list|view|see|check|get)( me)?( all)?( my)?"
+        rf"( upcoming| open| booked| next)? {_APPOINTMENTS_EN}"
+        rf"|(my|upcoming) {_APPOINTMENTS_EN}"
+        rf"|what are my {_APPOINTMENTS_EN}"
+        rf"|when is my (next )?appointment"
+        rf"|do i have (any )?{_APPOINTMENTS_EN})",
+    ),
+    (
+        INTENT_LIST_APPOINTMENTS,
+        "de",
+        r"((zeig|zeige|zeigen sie)( mir)?( alle)?( meine)?"
+        r"( anstehenden| offenen| gebuchten| nächsten)? termine( an)?"
+        r"|meine( anstehenden| offenen| gebuchten)? termine( anzeigen)?"
+        r"|welche termine habe ich( noch)?"
+        r"|wann ist mein (nächster |naechster )?termin"
+        r"|habe ich (noch )?(einen termin|termine))",
+    ),
+    (
+        INTENT_CANCEL_APPOINTMENT,
+        "en",
+        rf"((cancel|delete|remove)( my| an)? (appointment|booking)"
+        rf"|cancel( my)? {_APPOINTMENTS_EN})",
+    ),
+    (
+        INTENT_CANCEL_APPOINTMENT,
+        "de",
+        r"((meinen |den |einen )?termin (stornieren|absagen|löschen|loeschen|canceln)"
+        r"|(stornieren|absagen|storniere|sage) (meinen |den )?termin( ab)?)",
+    ),
+    (
+        INTENT_LIST_SALONS,
+        "en",
+        rf"((which|what) {_SALONS_EN}( do you have| are there| are available| exist)?"
+        rf"|(list|show)( me)?( all)?( your)? {_SALONS_EN}"
+        rf"|where are (your )?{_SALONS_EN})",
+    ),
+    (
+        INTENT_LIST_SALONS,
+        "de",
+        rf"(welche {_SALONS_DE}( gibt es| habt ihr| haben sie)?"
+        rf"|(zeig|zeige|liste)( mir)?( alle)?( eure| ihre)? {_SALONS_DE}"
+        rf"|wo (sind|gibt es) (eure |ihre )?{_SALONS_DE})",
+    ),
+]
+_COMPILED = [
+    (intent, language, re.compile(pattern)) for intent, language, pattern in _PATTERNS
+]
+
+_REPLIES = {
+    "en": {
+        "greeting": "Hello! I can book, show or cancel your salon appointments. How can I help you?",
+        "salons": "These are our salons:\n{items}\n\nWhich one would you like to visit?",
+        "appointments": "These are your upcoming appointments:\n{items}",
+        "no_appointments": "You have no upcoming appointments. Would you like to book one?",
+        "cancel_which": "Which appointment would you like to cancel?\n{items}",
+        "no_cancel": "You have no upcoming appointments to cancel.",
+    },
+    "de": {
+        "greeting": "Hallo! Ich kann Termine für Sie buchen, anzeigen oder stornieren. Wie kann ich helfen?",
+        "salons": "Das sind unsere Salons:\n{items}\n\nWelchen möchten Sie besuchen?",
+        "appointments": "Das sind Ihre anstehenden Termine:\n{items}",
+        "no_appointments": "Sie haben keine anstehenden Termine. Möchten Sie einen buchen?",
+        "cancel_which": "Welchen Termin möchten Sie stornieren?\n{items}",
+        "no_cancel": "Sie haben keine anstehenden Termine, die storniert werden könnten.",
+    },
+}
+
+
+def normalize(message: str) -> str:
+    text = _NOISE_RE.sub(" ", message.lower())
+    text = _FILLER_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def classify(message: str) -> Optional[Intent]:
+    """
+    Intent of a message that consists of nothing but a known request, or
+    None. Anything more (a date, a second question, a name) goes to the LLM.
+    """
+    text = normalize(message)
+    if not text or len(text.split()) > 8:
+        return None
+    for intent, language, pattern in _COMPILED:
+        if pattern.fullmatch(text):
+            return Intent(intent, language or settings.INTENT_ROUTER_DEFAULT_LANGUAGE)
+    return None
+
+
+def _format_ts(value: Any) -> Optional[str]:
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").strftime(
+            "%d.%m.%Y, %H:%M"
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def _order_lines(orders_response: Any) -> Optional[List[str]]:
+    """
+    One line per open order, or None when the response does not have the
+    shape we know how to render (the LLM handles it then).
+    """
+    if isinstance(orders_response, dict):
+        if orders_response.get("code") not in (None, 0):
+            return None
+        orders_response = orders_response.get("orders", orders_response.get("ordersList"))
+    if not isinstance(orders_response, list):
+        return None
+    lines = []
+    for order in orders_response:
+        if not isinstance(order, dict) or not order.get("orderId"):
+            return None
+        positions = order.get("positions") or [{}]
+        begin = _format_ts(order.get("beginTs") or positions[0].get("beginTs"))
+        service = order.get("itemNm") or positions[0].get("itemNm")
+        if begin is None:
+            return None
+        details = ", ".join(
+            part for part in (begin, service, order.get("siteCd")) if part
+        )
+        lines.append(f"- {details} (#{order['orderId']})")
+    return lines
+
+
+def _answer(intent: Intent, user_id: str) -> Optional[str]:
+    # Imported lazily: tools_wrapper_util imports this module
+    from .tools_wrapper_util import get_orders, get_sites
+
+    replies = _REPLIES.get(intent.language, _REPLIES["en"])
+    if intent.name == INTENT_GREETING:
+        return replies["greeting"]
+
+    if intent.name == INTENT_LIST_SALONS:
+        result = get_sites()
+        sites = result.get("sites") if result.get("status") == "success" else None
+        if not sites:
+            return None
+        items = "\n".join(f"- {site['salon name']}" for site in sites)
+        return replies["salons"].format(items=items)
+
+    result = get_orders(f"+{user_id}")
+    if result.get("status") != "success":
+        return None
+    lines = _order_lines(result.get("orders"))
+    if lines is None:
+        return None
+    if intent.name == INTENT_LIST_APPOINTMENTS:
+        if not lines:
+            return replies["no_appointments"]
+        return replies["appointments"].format(items="\n".join(lines))
+    if not lines:
+        return replies["no_cancel"]
+    # Cancelling needs a choice; the follow-up goes to the LLM, which sees
+    # this exchange in the conversation history
+    return replies["cancel_which"].format(items="\n".join(lines))
+
+
+class IntentRouter:
+    """
+    Deterministic fast path in front of the LLM.
+
+    Messages that are nothing but a greeting, "show my appointments",
+    "cancel my appointment" or "which salons do you have" (English or German)
+    are answered from the tool wrappers with templated replies. Everything
+    else, and every case the router cannot render confidently, falls through
+    to the assistant. The share of bypassed messages is published as the
+    ``intent_router.bypass_rate`` gauge.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._bypassed = 0
+
+    def route(self, message: str, user_id: str) -> Optional[str]:
+        """A templated reply for ``message``, or None to ask the LLM."""
+        if not settings.INTENT_ROUTER_ENABLED:
+            return None
+        intent = classify(message)
+        reply = None
+        if intent is not None:
+            try:
+                reply = _answer(intent, user_id)
+            except Exception as e:
+                logger.error(f"Intent router failed for {intent.name}: {e}")
+        self._count(intent, reply is not None)
+        if reply is not None:
+            logger.info(f"Answered {intent.name} for {user_id} without the LLM")
+        return reply
+
+    def _count(self, intent: Optional[Intent], bypassed: bool) -> None:
+        with self._lock:
+            self._seen += 1
+            self._bypassed += bypassed
+            rate = self._bypassed / self._seen
+        metrics.set_gauge("intent_router.bypass_rate", rate)
+        if bypassed:
+            metrics.increment(f"intent_router.bypassed.{intent.name}")
+        else:
+            metrics.increment("intent_router.fallthrough")
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,68 @@
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Hashable
+
+from .metrics_util import metrics
+
+
+class _KeyedLock:
+    """Weak-referenceable holder for the lock of one key."""
+
+    __slots__ = ("lock", "__weakref__")
+
+    def __init__(self, lock):
+        self.lock = lock
+
+
+class KeyedLockRegistry:
+    """
+    One lock per key, created on demand.
+
+    Entries live in a ``WeakValueDictionary``: a key's lock exists only while
+    some caller holds or waits on it, so the registry never grows with the
+    number of users seen. Callers with different keys never contend.
+
+    ``factory`` decides the lock type: ``threading.RLock`` for worker threads
+    (re-entrant, so nested helpers may take the same key again) or
+    ``asyncio.Lock`` for coroutines on a single event loop.
+    """
+
+    def __init__(self, name: str, factory: Callable = threading.RLock):
+        self.name = name
+        self._factory = factory
+        self._locks = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+
+    def _entry(self, key: Hashable) -> _KeyedLock:
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = _KeyedLock(self._factory())
+                self._locks[key] = entry
+            return entry
+
+    @contextmanager
+    def hold(self, key: Hashable, timeout: float = -1):
+        """Hold the lock for ``key``; raises ``TimeoutError`` after ``timeout``."""
+        entry = self._entry(key)
+        if not entry.lock.acquire(blocking=False):
+            metrics.increment(f"{self.name}.contended")
+            if not entry.lock.acquire(timeout=timeout):
+                raise TimeoutError(f"Timed out waiting for {self.name} lock on {key}")
+        try:
+            yield
+        finally:
+            entry.lock.release()
+
+    @asynccontextmanager
+    async def ahold(self, key: Hashable):
+        """Hold the ``asyncio.Lock`` for ``key``."""
+        entry = self._entry(key)
+        if entry.lock.locked():
+            metrics.increment(f"{self.name}.contended")
+        async with entry.lock:
+            yield
+
+    def __len__(self) -> int:
+        return len(self._locks)
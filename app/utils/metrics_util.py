@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Dict
+
+
+class _Summary:
+    """Running count/sum/min/max for an observed value."""
+
+    __slots__ = ("count", "total", "min", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": (self.total / self.count) if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe in-process registry for counters, gauges and summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, _Summary] = {}
+        self._started_at = time.time()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary()
+            summary.add(value)
+
+    def snapshot(self) -> dict:
+        """Return a point-in-time copy of every metric."""
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self._started_at,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {k: v.as_dict() for k, v in self._summaries.items()},
+            }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,82 @@
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .metrics_util import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    The first caller of a key runs ``fn``; callers arriving while it runs
+    wait for it and get a copy of its result (or its exception). Executed
+    and collapsed calls are counted under ``<name>.executed`` and
+    ``<name>.collapsed``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None
+    ) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.increment(f"{self.name}.collapsed")
+            if not call.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for a shared call")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        metrics.increment(f"{self.name}.executed")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    ``SingleFlight`` for coroutines. Like the async HTTP clients, it must be
+    used from a single long-lived event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            metrics.increment(f"{self.name}.collapsed")
+            # A cancelled waiter must not cancel the shared call
+            return copy.deepcopy(await asyncio.shield(task))
+
+        metrics.increment(f"{self.name}.executed")
+        task = self._calls[key] = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,208 @@
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from ..core.config import settings
+from .metrics_util import metrics
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in serialized JSON, good enough to compare outputs
+BYTES_PER_TOKEN = 4
+
+# Catalog and employee entries keep all their fields, since any of them may
+# carry what the assistant quotes; only free text longer than this is cut
+MAX_TEXT_CHARS = 200
+# Fields of a slot the assistant books with (see ``bookAppointment``)
+SLOT_FIELDS = ("durationMillis", "employeeId", "itemNo")
+
+_TS_RE = re.compile(r"(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2}):00\.000Z")
+
+
+def _shorten(item: Any) -> Any:
+    """``item`` with string values longer than ``MAX_TEXT_CHARS`` cut short."""
+    if not isinstance(item, dict):
+        return item
+    return {
+        key: value[:MAX_TEXT_CHARS] + "..."
+        if isinstance(value, str) and len(value) > MAX_TEXT_CHARS
+        else value
+        for key, value in item.items()
+    }
+
+
+def _entries(response: Any, key: str) -> Optional[List[Any]]:
+    if isinstance(response, list):
+        return response
+    if isinstance(response, dict) and isinstance(response.get(key), list):
+        return response[key]
+    return None
+
+
+def _with_code(response: Any, compact: Dict[str, Any]) -> Dict[str, Any]:
+    # A non-zero TimeGlobe code explains an empty or partial list
+    if isinstance(response, dict) and response.get("code") not in (None, 0):
+        compact["code"] = response["code"]
+    return compact
+
+
+def _project_list(key: str) -> Callable[[Any], Any]:
+    def project(response: Any) -> Any:
+        entries = _entries(response, key)
+        if entries is None:
+            return response
+        limit = settings.TOOL_OUTPUT_MAX_ITEMS
+        compact = {key: [_shorten(entry) for entry in entries[:limit]]}
+        if len(entries) > limit:
+            compact["omitted"] = len(entries) - limit
+        return _with_code(response, compact)
+
+    return project
+
+
+def _spread(items: List[Any], limit: int) -> List[Any]:
+    """At most ``limit`` of ``items``, spread evenly across the list."""
+    if len(items) <= limit:
+        return items
+    if limit == 1:
+        return items[:1]
+    step = (len(items) - 1) / (limit - 1)
+    return [items[round(i * step)] for i in range(limit)]
+
+
+def _slot(suggestion: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(suggestion, dict):
+        return None
+    positions = suggestion.get("positions") or [{}]
+    first = positions[0] if isinstance(positions[0], dict) else {}
+    begin_ts = suggestion.get("beginTs") or first.get("beginTs")
+    if not isinstance(begin_ts, str):
+        return None
+    slot = {"beginTs": begin_ts}
+    for field in SLOT_FIELDS:
+        value = suggestion.get(field, first.get(field))
+        if value is not None:
+            slot[field] = value
+    if len(positions) > 1:
+        slot["positions"] = [_shorten(position) for position in positions]
+    return slot
+
+
+def project_suggestions(response: Any) -> Any:
+    """
+    Appointment suggestions grouped by day.
+
+    Fields shared by every slot (duration, employee, service) are stated once.
+    When all start times have the usual ``YYYY-MM-DDTHH:MM:00.000Z`` form,
+    days list ``HH:MM`` times and ``beginTsFormat`` tells the assistant how to
+    rebuild ``beginTs``; otherwise the full timestamps are kept. Days and
+    slots per day are capped, keeping slots spread across the day.
+    """
+    entries = _entries(response, "suggestions")
+    if entries is None:
+        return response
+    slots = [_slot(entry) for entry in entries]
+    if any(slot is None for slot in slots):
+        return response
+
+    compact: Dict[str, Any] = {}
+    for field in SLOT_FIELDS:
+        values = {json.dumps(slot.get(field)) for slot in slots}
+        if slots and len(values) == 1 and slots[0].get(field) is not None:
+            compact[field] = slots[0][field]
+            for slot in slots:
+                del slot[field]
+    short = all(
+        len(slot) == 1 and _TS_RE.fullmatch(slot["beginTs"]) for slot in slots
+    )
+    if short:
+        compact["beginTsFormat"] = "{date}T{time}:00.000Z"
+
+    days: "OrderedDict[str, List[Any]]" = OrderedDict()
+    for slot in sorted(slots, key=lambda slot: slot["beginTs"]):
+        day = slot["beginTs"][:10]
+        days.setdefault(day, []).append(
+            _TS_RE.fullmatch(slot["beginTs"]).group(2) if short else slot
+        )
+
+    slots_key = "times" if short else "slots"
+    shown = list(days.items())[: settings.TOOL_OUTPUT_MAX_DAYS]
+    compact["days"] = [
+        {
+            "date": day,
+            slots_key: _spread(day_slots, settings.TOOL_OUTPUT_MAX_SLOTS_PER_DAY),
+        }
+        for day, day_slots in shown
+    ]
+    omitted = len(slots) - sum(len(day[slots_key]) for day in compact["days"])
+    if omitted:
+        compact["omitted"] = omitted
+    return _with_code(response, compact)
+
+
+# Tool name (lower case) -> result key -> projection of the TimeGlobe response
+_PROJECTIONS: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "getproducts": {"products": _project_list("products")},
+    "getemployees": {"employees": _project_list("employees")},
+    "appointmentsuggestion": {"suggestions": project_suggestions},
+}
+
+
+def _drop_nulls(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _drop_nulls(item) for key, item in value.items() if item is not None
+        }
+    if isinstance(value, list):
+        return [_drop_nulls(item) for item in value]
+    return value
+
+
+def compact(function_name: str, result: Any) -> Any:
+    """``result`` of a tool call with its TimeGlobe payload projected."""
+    projections = _PROJECTIONS.get(function_name.lower())
+    if not projections or not isinstance(result, dict):
+        return _drop_nulls(result)
+    compacted = dict(result)
+    for key, project in projections.items():
+        if key in compacted:
+            compacted[key] = project(compacted[key])
+    return _drop_nulls(compacted)
+
+
+def serialize_tool_output(function_name: str, result: Any) -> str:
+    """
+    Serialize a tool result for submission to the model.
+
+    Known tools have their TimeGlobe payload capped and reshaped (see
+    ``_PROJECTIONS``), null fields are dropped and the JSON is written without
+    whitespace. Byte and estimated token savings against the verbatim
+    ``json.dumps`` output, both measured as UTF-8 bytes, are recorded per
+    tool. A projection that fails falls back to the full result.
+    """
+    if not settings.TOOL_OUTPUT_COMPACTION:
+        return json.dumps(result)
+    try:
+        output = orjson.dumps(
+            compact(function_name, result), option=orjson.OPT_NON_STR_KEYS
+        )
+    except Exception as e:
+        logger.warning(f"Could not compact output of {function_name}: {e}")
+        return json.dumps(result)
+    # Compare UTF-8 bytes on both sides: json.dumps escapes non-ASCII text
+    original = json.dumps(result, ensure_ascii=False).encode()
+    _record_savings(function_name, len(original), len(output))
+    return output.decode()
+
+
+def _record_savings(function_name: str, original: int, compacted: int) -> None:
+    saved = original - compacted
+    metrics.observe(f"tool_output.{function_name}.bytes", compacted)
+    metrics.observe(f"tool_output.{function_name}.bytes_saved", saved)
+    metrics.observe(f"tool_output.{function_name}.tokens_saved", saved / BYTES_PER_TOKEN)
+    if original:
+        metrics.observe(f"tool_output.{function_name}.ratio", compacted / original)
@@ -1,8 +1,10 @@
+import asyncio
 import re
 import logging
 import time
 from datetime import datetime
 from ..core.config import settings
+from .intent_router_util import intent_router
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -16,8 +18,9 @@ def _get_assistant_manager():
     """Lazy initialization of the AssistantManager to avoid circular imports"""
     global _assistant_manager
     if _assistant_manager is None:
-        from ..agent import AssistantManager
+        from ..agent import get_assistant_manager
 
+        _assistant_manager = get_assistant_manager()
     return _assistant_manager
 
 
@@ -61,6 +64,21 @@ def get_products(siteCd: str):
         return {"status": "error", "message": str(e)}
 
 
+async def aget_products(siteCd: str):
+    """Awaitable get_products for the async engine"""
+    logger.info(f"Tool called: aget_products(siteCd={siteCd})")
+    start_time = time.time()
+    try:
+        products = await _get_time_globe_service().aget_products(siteCd)
+        execution_time = time.time() - start_time
+        logger.info(f"aget_products() completed successfully in {execution_time:.2f}s")
+        return {"status": "success", "products": products}
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(f"Error in aget_products(): {str(e)} - took {execution_time:.2f}s")
+        return {"status": "error", "message": str(e)}
+
+
 def get_employee(items, siteCd,week):
     """Get a list of available employees for a specific service.
      Parameters:
@@ -79,6 +97,21 @@ def get_employee(items, siteCd,week):
         return {"status": "error", "message": str(e)}
 
 
+async def aget_employee(items, siteCd, week):
+    """Awaitable get_employee for the async engine"""
+    logger.info(f"Tool called: aget_employee(items={items}, siteCd={siteCd},week={week})")
+    start_time = time.time()
+    try:
+        employees = await _get_time_globe_service().aget_employee(items, siteCd, week)
+        execution_time = time.time() - start_time
+        logger.info(f"aget_employee() completed successfully in {execution_time:.2f}s")
+        return {"status": "success", "employees": employees}
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(f"Error in aget_employee(): {str(e)} - took {execution_time:.2f}s")
+        return {"status": "error", "message": str(e)}
+
+
 def AppointmentSuggestion(week,employeeid, itemno, siteCd: str):
     """Get available appointment slots for a selected employee,service and salon"""
     logger.info(
@@ -102,6 +135,29 @@ def AppointmentSuggestion(week,employeeid, itemno, siteCd: str):
         return {"status": "error", "message": str(e)}
 
 
+async def aAppointmentSuggestion(week, employeeid, itemno, siteCd: str):
+    """Awaitable AppointmentSuggestion for the async engine"""
+    logger.info(
+        f"Tool called: aAppointmentSuggestion(week={week}, employeeid={employeeid}, itemno={itemno}, siteCd={siteCd})"
+    )
+    start_time = time.time()
+    try:
+        suggestions = await _get_time_globe_service().aAppointmentSuggestion(
+            week, employeeid, itemno, siteCd
+        )
+        execution_time = time.time() - start_time
+        logger.info(
+            f"aAppointmentSuggestion() completed successfully in {execution_time:.2f}s"
+        )
+        return {"status": "success", "suggestions": suggestions}
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(
+            f"Error in aAppointmentSuggestion(): {str(e)} - took {execution_time:.2f}s"
+        )
+        return {"status": "error", "message": str(e)}
+
+
 def book_appointment(
     beginTs,
     durationMillis,
@@ -133,33 +189,7 @@ def book_appointment(
                     itemNo,
                     siteCd
         )
-        execution_time = time.time() - start_time
-        if result.get("code") == 90:
-            logger.info(
-                f"book_appointment() - user already has 2 appointments - took {execution_time:.2f}s"
-            )
-            return {
-                "status": "success",
-                "booking_result": "you already have 2 appointments in future \
-            in order to make another appointment please cancel one of them.",
-            }
-        elif result.get("code") == 0:
-            order_id = result.get("orderId")
-            logger.info(
-                f"book_appointment() - appointment booked successfully (orderID: {order_id}) - took {execution_time:.2f}s"
-            )
-            return {
-                "status": "success",
-                "booking_result": f"appointment booked successfully orderID is {order_id}",
-            }
-        else:
-            logger.warning(
-                f"book_appointment() - unexpected code: {result.get('code')} - took {execution_time:.2f}s"
-            )
-            return {
-                "status": "error",
-                "message": f"Unexpected response code: {result.get('code')}",
-            }
+        return _booking_result(result, time.time() - start_time)
     except Exception as e:
         execution_time = time.time() - start_time
         logger.error(
@@ -168,6 +198,60 @@ def book_appointment(
         return {"status": "error", "message": str(e)}
 
 
+async def abook_appointment(
+    beginTs, durationMillis, mobileNumber, employeeId, itemNo, siteCd
+):
+    """Awaitable book_appointment for the async engine"""
+    logger.info(
+        f"Tool called: abook_appointment(duration={durationMillis}, user_date_time={beginTs})"
+    )
+    start_time = time.time()
+    try:
+        if not isinstance(beginTs, str):
+            logger.warning(f"Invalid date/time types: date={type(beginTs)}")
+            return {"status": "error", "message": "Date and time must be strings"}
+        result = await _get_time_globe_service().abook_appointment(
+            beginTs, durationMillis, mobileNumber, employeeId, itemNo, siteCd
+        )
+        return _booking_result(result, time.time() - start_time)
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(
+            f"Error in abook_appointment(): {str(e)} - took {execution_time:.2f}s"
+        )
+        return {"status": "error", "message": str(e)}
+
+
+def _booking_result(result, execution_time):
+    """Tool result for a TimeGlobe booking response"""
+    if result.get("code") == 90:
+        logger.info(
+            f"book_appointment() - user already has 2 appointments - took {execution_time:.2f}s"
+        )
+        return {
+            "status": "success",
+            "booking_result": "you already have 2 appointments in future \
+            in order to make another appointment please cancel one of them.",
+        }
+    elif result.get("code") == 0:
+        order_id = result.get("orderId")
+        logger.info(
+            f"book_appointment() - appointment booked successfully (orderID: {order_id}) - took {execution_time:.2f}s"
+        )
+        return {
+            "status": "success",
+            "booking_result": f"appointment booked successfully orderID is {order_id}",
+        }
+    else:
+        logger.warning(
+            f"book_appointment() - unexpected code: {result.get('code')} - took {execution_time:.2f}s"
+        )
+        return {
+            "status": "error",
+            "message": f"Unexpected response code: {result.get('code')}",
+        }
+
+
 def cancel_appointment(orderId, mobileNumber, siteCd):
     """Cancel an existing appointment"""
     logger.info(f"Tool called: cancel_appointment(orderId={orderId},sitecode={siteCd})")
@@ -181,32 +265,55 @@ def cancel_appointment(orderId, mobileNumber, siteCd):
         result = _get_time_globe_service().cancel_appointment(
             orderId=orderId, mobileNumber=mobileNumber, siteCd=siteCd
         )
+        return _cancellation_result(result, time.time() - start_time)
+    except Exception as e:
         execution_time = time.time() - start_time
+        logger.error(
+            f"Error in cancel_appointment(): {str(e)} - took {execution_time:.2f}s"
+        )
+        return {"status": "error", "message": str(e)}
 
-        if result.get("code") == 0:
-            logger.info(
-                f"cancel_appointment() - appointment cancelled successfully - took {execution_time:.2f}s"
-            )
-            return {
-                "status": "success",
-                "message": "your appointment has been cancelled.",
-            }
-        else:
-            logger.warning(
-                f"cancel_appointment() - invalid appointment ID - took {execution_time:.2f}s"
-            )
-            return {
-                "status": "success",
-                "cancellation_result": "The provided id is not valid appointment id",
-            }
+
+async def acancel_appointment(orderId, mobileNumber, siteCd):
+    """Awaitable cancel_appointment for the async engine"""
+    logger.info(f"Tool called: acancel_appointment(orderId={orderId},sitecode={siteCd})")
+    start_time = time.time()
+    try:
+        if not orderId:
+            logger.warning("acancel_appointment() called without orderId")
+            return {"status": "error", "message": "orderId is required"}
+        result = await _get_time_globe_service().acancel_appointment(
+            orderId=orderId, mobileNumber=mobileNumber, siteCd=siteCd
+        )
+        return _cancellation_result(result, time.time() - start_time)
     except Exception as e:
         execution_time = time.time() - start_time
         logger.error(
-            f"Error in cancel_appointment(): {str(e)} - took {execution_time:.2f}s"
+            f"Error in acancel_appointment(): {str(e)} - took {execution_time:.2f}s"
         )
         return {"status": "error", "message": str(e)}
 
 
+def _cancellation_result(result, execution_time):
+    """Tool result for a TimeGlobe cancellation response"""
+    if result.get("code") == 0:
+        logger.info(
+            f"cancel_appointment() - appointment cancelled successfully - took {execution_time:.2f}s"
+        )
+        return {
+            "status": "success",
+            "message": "your appointment has been cancelled.",
+        }
+    else:
+        logger.warning(
+            f"cancel_appointment() - invalid appointment ID - took {execution_time:.2f}s"
+        )
+        return {
+            "status": "success",
+            "cancellation_result": "The provided id is not valid appointment id",
+        }
+
+
 def get_profile(mobile_number: str):
     """Get the profile data for a given phone number"""
     logger.info(f"Tool called: get_profile(mobile_number={mobile_number})")
@@ -542,11 +649,16 @@ def format_datetime(user_date_time: str) -> str:
     raise ValueError(f"Invalid date-time format: {user_date_time}")
 
 
-def get_response_from_gpt(msg, user_id, _assistant_manager):
+def get_response_from_gpt(msg, user_id, _assistant_manager, turn_id=None):
     logger.info(f"Tool called: get_response_from_gpt(user_id={user_id})")
     start_time = time.time()
     try:
-        response = _assistant_manager.run_conversation(user_id, msg)
+        # Common requests are answered without the LLM
+        fast_reply = intent_router.route(msg, user_id)
+        if fast_reply is not None:
+            _assistant_manager.record_exchange(user_id, msg, fast_reply)
+            return fast_reply
+        response = _assistant_manager.run_conversation(user_id, msg, turn_id=turn_id)
         execution_time = time.time() - start_time
         logger.info(
             f"get_response_from_gpt() for user {user_id} completed in {execution_time:.2f}s"
@@ -558,3 +670,28 @@ def get_response_from_gpt(msg, user_id, _assistant_manager):
             f"Error in get_response_from_gpt(): {str(e)} - took {execution_time:.2f}s"
         )
         return f"Error processing request: {str(e)}"
+
+
+async def aget_response_from_gpt(msg, user_id, _assistant_manager, turn_id=None):
+    """Async variant of get_response_from_gpt for the AsyncAssistantManager."""
+    logger.info(f"Tool called: aget_response_from_gpt(user_id={user_id})")
+    start_time = time.time()
+    try:
+        fast_reply = await asyncio.to_thread(intent_router.route, msg, user_id)
+        if fast_reply is not None:
+            await _assistant_manager.record_exchange(user_id, msg, fast_reply)
+            return fast_reply
+        response = await _assistant_manager.run_conversation(
+            user_id, msg, turn_id=turn_id
+        )
+        execution_time = time.time() - start_time
+        logger.info(
+            f"aget_response_from_gpt() for user {user_id} completed in {execution_time:.2f}s"
+        )
+        return response
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(
+            f"Error in aget_response_from_gpt(): {str(e)} - took {execution_time:.2f}s"
+        )
+        return f"Error processing request: {str(e)}"
@@ -0,0 +1,68 @@
+"""
+Standalone conversation worker.
+
+Claims messages from the ``InboundMessages`` inbox and runs the assistant for
+them, independently of the web process:
+
+    python -m app.worker --workers 8
+"""
+
+import argparse
+import signal
+import threading
+
+from .core.config import settings
+from .db.session import engine
+from .logger import main_logger
+from .models.base import Base
+from .models.conversation_lease import ConversationLeaseModel
+from .models.conversation_message import ConversationMessageModel
+from .models.service_token import ServiceTokenModel
+from .models.cache_generation import CacheGenerationModel
+from .models.thread_usage import ThreadUsageModel
+from .services.active_run_service import active_run_registry
+from .services.message_queue_service import MessageQueueService
+from .services.thread_lifecycle_service import thread_lifecycle
+from .services.thread_pool_service import thread_pool
+from .services.time_globe_service import time_globe_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TimeGlobe conversation worker")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.MESSAGE_WORKER_COUNT,
+        help="Number of worker threads in this process",
+    )
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    service = MessageQueueService(
+        worker_count=args.workers, max_size=settings.MESSAGE_QUEUE_MAX_SIZE
+    )
+    stop_event = threading.Event()
+
+    def _shutdown(signum, frame):
+        main_logger.info(f"Received signal {signum}, shutting down worker")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    active_run_registry.load()
+    thread_pool.start()
+    thread_lifecycle.start()
+    time_globe_tokens.start()
+    service.start()
+    stop_event.wait()
+    service.stop(timeout=settings.INBOX_LEASE_SECONDS)
+    active_run_registry.stop()
+    thread_pool.stop()
+    thread_lifecycle.stop()
+    time_globe_tokens.stop()
+
+
+if __name__ == "__main__":
+    main()
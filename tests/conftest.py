@@ -0,0 +1,55 @@
+import importlib
+import os
+import pkgutil
+import tempfile
+
+import pytest
+
+# Settings are read when ``app`` is imported; point them at a throwaway
+# SQLite database and dummy credentials before any test module imports it
+_test_dir = tempfile.mkdtemp(prefix="timeglobe-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_dir, 'test.db')}"
+for name, value in {
+    "from_whatsapp_number": "whatsapp:+10000000000",
+    "account_sid": "ACtest",
+    "auth_token": "test",
+    "TWILIO_API_URL": "http://twilio.invalid",
+    "WABA_ID": "test",
+    "TIME_GLOBE_LOGIN_USERNAME": "test",
+    "TIME_GLOBE_LOGIN_PASSWORD": "test",
+    "TIME_GLOBE_BASE_URL": "http://timeglobe.invalid",
+    "TWILIO_MESSAGING_SERVICE_SID": "MGtest",
+    "OPENAI_ASSISTANT_ID": "asst_test",
+    "OPENAI_API_KEY": "sk-test",
+    "TIME_GLOBE_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    import app.models
+    from app.db.session import engine
+    from app.models.base import Base
+
+    # Every model must be registered before the mappers are configured
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    """A session on a database emptied before each test."""
+    from app.db.session import SessionLocal
+    from app.models.base import Base
+
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+from app.models.inbound_message import InboundMessageModel
+from app.repositories.inbox_repository import (
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_PROCESSING,
+    InboxRepository,
+)
+
+SENDER = "491700000001"
+OTHER_SENDER = "491700000002"
+
+
+def _make_claimable(db):
+    """Move every coalescing window into the past."""
+    db.query(InboundMessageModel).update(
+        {InboundMessageModel.available_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+
+def test_claims_burst_only_after_coalescing_window(db):
+    repo = InboxRepository(db)
+    for body in ("Hi", "I'd like a haircut", "tomorrow?"):
+        repo.enqueue(SENDER, body, coalesce_window=30, coalesce_max_delay=60)
+
+    assert repo.claim_next("worker-1", lease_seconds=60, max_attempts=3) == []
+
+    _make_claimable(db)
+    batch = repo.claim_next("worker-1", lease_seconds=60, max_attempts=3)
+
+    assert [message.body for message in batch] == ["Hi", "I'd like a haircut", "tomorrow?"]
+    assert {message.status for message in batch} == {STATUS_PROCESSING}
+    assert {message.lease_owner for message in batch} == {"worker-1"}
+
+
+def test_new_message_pushes_back_the_whole_burst(db):
+    repo = InboxRepository(db)
+    first, _ = repo.enqueue(SENDER, "Hi", coalesce_window=5, coalesce_max_delay=60)
+    first_available_at = first.available_at
+
+    repo.enqueue(SENDER, "still typing", coalesce_window=5, coalesce_max_delay=60)
+    db.refresh(first)
+
+    assert first.available_at > first_available_at
+
+
+def test_burst_is_claimed_no_later_than_max_delay(db):
+    repo = InboxRepository(db)
+    first, _ = repo.enqueue(SENDER, "Hi", coalesce_window=30, coalesce_max_delay=10)
+    second, _ = repo.enqueue(SENDER, "again", coalesce_window=30, coalesce_max_delay=10)
+
+    assert second.available_at <= first.created_at + timedelta(seconds=10)
+
+
+def test_without_window_message_is_claimable_at_once(db):
+    repo = InboxRepository(db)
+    repo.enqueue(SENDER, "Hi")
+
+    batch = repo.claim_next("worker-1", lease_seconds=60, max_attempts=3)
+
+    assert [message.body for message in batch] == ["Hi"]
+
+
+def test_burst_does_not_include_other_senders(db):
+    repo = InboxRepository(db)
+    repo.enqueue(SENDER, "Hi")
+    repo.enqueue(OTHER_SENDER, "Hello")
+    repo.enqueue(SENDER, "me again")
+
+    first = repo.claim_next("worker-1", lease_seconds=60, max_attempts=3)
+    second = repo.claim_next("worker-2", lease_seconds=60, max_attempts=3)
+
+    assert [message.body for message in first] == ["Hi", "me again"]
+    assert [message.body for message in second] == ["Hello"]
+
+
+def test_sender_with_turn_in_flight_is_not_claimed_again(db):
+    repo = InboxRepository(db)
+    repo.enqueue(SENDER, "Hi")
+    assert repo.claim_next("worker-1", lease_seconds=60, max_attempts=3)
+
+    repo.enqueue(SENDER, "one more thing")
+
+    assert repo.claim_next("worker-2", lease_seconds=60, max_attempts=3) == []
+
+
+def test_expired_lease_is_claimed_again(db):
+    repo = InboxRepository(db)
+    repo.enqueue(SENDER, "Hi")
+    repo.claim_next("worker-1", lease_seconds=60, max_attempts=3)
+    db.query(InboundMessageModel).update(
+        {InboundMessageModel.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    batch = repo.claim_next("worker-2", lease_seconds=60, max_attempts=3)
+
+    assert [message.lease_owner for message in batch] == ["worker-2"]
+    assert batch[0].attempts == 2
+
+
+def test_release_gives_up_after_max_attempts(db):
+    repo = InboxRepository(db)
+    repo.enqueue(SENDER, "Hi")
+    batch = repo.claim_next("worker-1", lease_seconds=60, max_attempts=2)
+    ids = [message.id for message in batch]
+
+    assert repo.release(ids, "worker-1", "boom", max_attempts=2) is False
+    assert db.get(InboundMessageModel, ids[0]).status == STATUS_PENDING
+
+    repo.claim_next("worker-1", lease_seconds=60, max_attempts=2)
+    assert repo.release(ids, "worker-1", "boom", max_attempts=2) is True
+    db.expire_all()
+    assert db.get(InboundMessageModel, ids[0]).status == STATUS_FAILED
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.agent import AssistantManager
+from app.async_agent import AsyncAssistantManager
+from app.core.config import settings
+
+
+def _call(idx, name, arguments="{}"):
+    return SimpleNamespace(
+        id=f"call_{idx}", function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def _message(output):
+    return json.loads(output["output"]).get("message", "")
+
+
+class _Tools:
+    """Fake tool handlers that record where and in which order they ran."""
+
+    def __init__(self, slow=(), delay=0.5):
+        self.slow = set(slow)
+        self.delay = delay
+        self.events = []
+        self._lock = threading.Lock()
+
+    def handler(self, name):
+        def run(args, user_id):
+            with self._lock:
+                self.events.append(("start", name, threading.current_thread().name))
+            if name in self.slow:
+                time.sleep(self.delay)
+            with self._lock:
+                self.events.append(("end", name, threading.current_thread().name))
+            return {"status": "success", "tool": name}
+
+        return run
+
+    def mapping(self, *names):
+        return {name: self.handler(name) for name in names}
+
+    def started(self):
+        return [name for event, name, _ in self.events if event == "start"]
+
+
+@pytest.fixture
+def tool_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_CALL_TIMEOUT_SECONDS", 0.2)
+    return 0.2
+
+
+@pytest.fixture
+def manager():
+    return AssistantManager("491700000001", "asst_test")
+
+
+def test_outputs_keep_requested_order(manager):
+    tools = _Tools()
+    manager._get_function_mapping = lambda: tools.mapping(
+        "getSites", "getProducts", "bookAppointment"
+    )
+    calls = [_call(0, "getSites"), _call(1, "bookAppointment"), _call(2, "getProducts")]
+
+    outputs = manager._run_tool_calls("thread_1", calls, "491700000001")
+
+    assert [output["tool_call_id"] for output in outputs] == [
+        "call_0",
+        "call_1",
+        "call_2",
+    ]
+    assert [json.loads(output["output"])["tool"] for output in outputs] == [
+        "getSites",
+        "bookAppointment",
+        "getProducts",
+    ]
+
+
+def test_serialized_tools_run_in_order_on_calling_thread(manager):
+    tools = _Tools()
+    manager._get_function_mapping = lambda: tools.mapping(
+        "getProfile", "bookAppointment", "cancelAppointment", "getSites"
+    )
+    calls = [
+        _call(0, "cancelAppointment"),
+        _call(1, "getSites"),
+        _call(2, "getProfile"),
+        _call(3, "bookAppointment"),
+    ]
+
+    manager._run_tool_calls("thread_1", calls, "491700000001")
+
+    serialized = [
+        (event, name, thread)
+        for event, name, thread in tools.events
+        if name != "getSites"
+    ]
+    caller = threading.current_thread().name
+    assert serialized == [
+        ("start", "cancelAppointment", caller),
+        ("end", "cancelAppointment", caller),
+        ("start", "getProfile", caller),
+        ("end", "getProfile", caller),
+        ("start", "bookAppointment", caller),
+        ("end", "bookAppointment", caller),
+    ]
+    reads = [thread for _, name, thread in tools.events if name == "getSites"]
+    assert all(thread != caller for thread in reads)
+
+
+def test_slow_read_times_out_without_holding_back_the_rest(manager, tool_timeout):
+    tools = _Tools(slow={"getSites"})
+    manager._get_function_mapping = lambda: tools.mapping("getSites", "getProducts")
+    calls = [_call(0, "getSites"), _call(1, "getProducts")]
+
+    start = time.time()
+    outputs = manager._run_tool_calls("thread_1", calls, "491700000001")
+
+    assert time.time() - start < tools.delay
+    assert "did not respond" in _message(outputs[0])
+    assert json.loads(outputs[1]["output"])["status"] == "success"
+
+
+def test_slow_write_is_reported_as_unknown_outcome(manager, tool_timeout):
+    tools = _Tools(slow={"bookAppointment"})
+    manager._get_function_mapping = lambda: tools.mapping(
+        "bookAppointment", "getSites"
+    )
+    calls = [_call(0, "bookAppointment"), _call(1, "getSites")]
+
+    outputs = manager._run_tool_calls("thread_1", calls, "491700000001")
+
+    assert "did not respond" in _message(outputs[0])
+    assert "outcome is unknown" in _message(outputs[0])
+
+
+def test_timed_out_write_never_overlaps_the_next_one(manager, tool_timeout):
+    tools = _Tools(slow={"cancelAppointment"})
+    manager._get_function_mapping = lambda: tools.mapping(
+        "cancelAppointment", "bookAppointment"
+    )
+    calls = [_call(0, "cancelAppointment"), _call(1, "bookAppointment")]
+
+    manager._run_tool_calls("thread_1", calls, "491700000001")
+
+    assert [(event, name) for event, name, _ in tools.events] == [
+        ("start", "cancelAppointment"),
+        ("end", "cancelAppointment"),
+        ("start", "bookAppointment"),
+        ("end", "bookAppointment"),
+    ]
+
+
+def test_async_engine_skips_writes_after_a_timeout(manager, tool_timeout):
+    tools = _Tools(slow={"getProfile"})
+    manager._get_function_mapping = lambda: tools.mapping(
+        "getProfile", "updateProfile", "getSites"
+    )
+    async_manager = AsyncAssistantManager("asst_test", client=object())
+    async_manager._sync = manager
+    async_manager._async_function_mapping = {}
+    calls = [_call(0, "getProfile"), _call(1, "getSites"), _call(2, "updateProfile")]
+
+    outputs = asyncio.run(
+        async_manager._run_tool_calls("thread_1", calls, "491700000001")
+    )
+
+    assert "did not respond" in _message(outputs[0])
+    assert json.loads(outputs[1]["output"])["status"] == "success"
+    assert "was not run" in _message(outputs[2])
+    assert "updateProfile" not in tools.started()
@@ -0,0 +1,170 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.utils.tool_output_util import (
+    MAX_TEXT_CHARS,
+    compact,
+    project_suggestions,
+    serialize_tool_output,
+)
+
+
+def _suggestion(begin_ts, employee_id=3, item_no=12, duration=1800000):
+    return {
+        "positions": [
+            {
+                "beginTs": begin_ts,
+                "durationMillis": duration,
+                "employeeId": employee_id,
+                "itemNo": item_no,
+            }
+        ]
+    }
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_OUTPUT_MAX_DAYS", 7)
+    monkeypatch.setattr(settings, "TOOL_OUTPUT_MAX_SLOTS_PER_DAY", 3)
+    monkeypatch.setattr(settings, "TOOL_OUTPUT_MAX_ITEMS", 2)
+
+
+def test_suggestions_are_grouped_by_day_with_shared_fields_hoisted(limits):
+    response = {
+        "code": 0,
+        "suggestions": [
+            _suggestion("2026-10-20T10:30:00.000Z"),
+            _suggestion("2026-10-19T09:00:00.000Z"),
+            _suggestion("2026-10-19T14:15:00.000Z"),
+        ],
+    }
+
+    assert project_suggestions(response) == {
+        "durationMillis": 1800000,
+        "employeeId": 3,
+        "itemNo": 12,
+        "beginTsFormat": "{date}T{time}:00.000Z",
+        "days": [
+            {"date": "2026-10-19", "times": ["09:00", "14:15"]},
+            {"date": "2026-10-20", "times": ["10:30"]},
+        ],
+    }
+
+
+def test_fields_that_differ_stay_on_each_slot(limits):
+    response = {
+        "suggestions": [
+            _suggestion("2026-10-19T09:00:00.000Z", employee_id=3),
+            _suggestion("2026-10-19T09:30:00.000Z", employee_id=5),
+        ]
+    }
+
+    projected = project_suggestions(response)
+
+    assert "beginTsFormat" not in projected
+    assert "employeeId" not in projected
+    assert projected["days"] == [
+        {
+            "date": "2026-10-19",
+            "slots": [
+                {"beginTs": "2026-10-19T09:00:00.000Z", "employeeId": 3},
+                {"beginTs": "2026-10-19T09:30:00.000Z", "employeeId": 5},
+            ],
+        }
+    ]
+
+
+def test_slots_per_day_are_capped_and_spread(limits):
+    times = [f"{hour:02d}:00" for hour in range(8, 18)]
+    response = {
+        "suggestions": [_suggestion(f"2026-10-19T{time}:00.000Z") for time in times]
+    }
+
+    projected = project_suggestions(response)
+
+    assert projected["days"] == [
+        {"date": "2026-10-19", "times": ["08:00", "12:00", "17:00"]}
+    ]
+    assert projected["omitted"] == 7
+
+
+def test_days_are_capped(limits, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_OUTPUT_MAX_DAYS", 1)
+    response = {
+        "suggestions": [
+            _suggestion("2026-10-19T09:00:00.000Z"),
+            _suggestion("2026-10-20T09:00:00.000Z"),
+        ]
+    }
+
+    projected = project_suggestions(response)
+
+    assert [day["date"] for day in projected["days"]] == ["2026-10-19"]
+    assert projected["omitted"] == 1
+
+
+def test_multi_position_slots_keep_their_positions(limits):
+    positions = [
+        {"beginTs": "2026-10-19T09:00:00.000Z", "durationMillis": 1800000,
+         "employeeId": 3, "itemNo": 12},
+        {"beginTs": "2026-10-19T09:30:00.000Z", "durationMillis": 900000,
+         "employeeId": 4, "itemNo": 15},
+    ]
+
+    projected = project_suggestions({"suggestions": [{"positions": positions}]})
+
+    assert "beginTsFormat" not in projected
+    assert projected["days"][0]["slots"][0]["positions"] == positions
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"code": -3},
+        {"suggestions": [{"positions": [{"durationMillis": 1800000}]}]},
+        {"suggestions": ["2026-10-19T09:00:00.000Z"]},
+        "no suggestions",
+    ],
+)
+def test_unexpected_shapes_pass_through(response, limits):
+    assert project_suggestions(response) == response
+
+
+def test_non_zero_code_is_kept(limits):
+    projected = project_suggestions({"code": 5, "suggestions": []})
+
+    assert projected["days"] == []
+    assert projected["code"] == 5
+
+
+def test_products_keep_unknown_fields_and_cut_long_text(limits):
+    description = "x" * (MAX_TEXT_CHARS + 50)
+    result = {
+        "status": "success",
+        "products": {
+            "products": [
+                {"itemNo": 1, "name": "Cut", "newField": True, "description": description},
+                {"itemNo": 2, "name": "Color", "price": None},
+                {"itemNo": 3, "name": "Wash"},
+            ]
+        },
+    }
+
+    compacted = compact("getProducts", result)
+
+    products = compacted["products"]["products"]
+    assert products[0]["newField"] is True
+    assert products[0]["description"] == "x" * MAX_TEXT_CHARS + "..."
+    assert products[1] == {"itemNo": 2, "name": "Color"}
+    assert compacted["products"]["omitted"] == 1
+
+
+def test_serialized_output_is_valid_json_for_unknown_tools():
+    result = {"status": "success", "message": "Grüße", "empty": None}
+
+    assert json.loads(serialize_tool_output("getSites", result)) == {
+        "status": "success",
+        "message": "Grüße",
+    }
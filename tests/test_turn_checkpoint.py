@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.agent import write_calls
+from app.models.turn_checkpoint import TurnCheckpointModel
+from app.services.turn_checkpoint_service import (
+    STAGE_RUN_CREATED,
+    TurnCheckpoint,
+)
+
+SENDER = "491700000001"
+BOOKING_ARGS = '{"siteCd": "salon", "positions": [{"itemNo": 1}]}'
+
+
+def _call(call_id, name="bookAppointment", arguments=BOOKING_ARGS):
+    return SimpleNamespace(
+        id=call_id, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def _output(tool_call, result):
+    return {"tool_call_id": tool_call.id, "output": json.dumps(result)}
+
+
+def test_outputs_are_not_reused_before_resume():
+    checkpoint = TurnCheckpoint(turn_id=None, mobile_number=SENDER)
+    checkpoint.record_run("thread_1", "run_1")
+    booking = _call("call_1")
+    checkpoint.record_tool_outputs([booking], [_output(booking, {"status": "success"})])
+
+    assert checkpoint.reusable_outputs([booking]) == {}
+
+
+def test_persisted_turn_resumes_same_run_with_recorded_outputs(db):
+    checkpoint = TurnCheckpoint.load("turn_1", SENDER)
+    checkpoint.record_run("thread_1", "run_1")
+    booking = _call("call_1")
+    checkpoint.record_tool_outputs(
+        [booking], [_output(booking, {"status": "success", "orderId": 7})]
+    )
+
+    resumed = TurnCheckpoint.load("turn_1", SENDER)
+
+    assert resumed.stage == STAGE_RUN_CREATED
+    assert (resumed.thread_id, resumed.run_id) == ("thread_1", "run_1")
+    reused = resumed.reusable_outputs([booking])
+    assert list(reused) == [0]
+    assert json.loads(reused[0]["output"])["orderId"] == 7
+
+
+def test_replacement_run_reuses_matching_write_once():
+    checkpoint = TurnCheckpoint(turn_id=None, mobile_number=SENDER)
+    checkpoint.record_run("thread_1", "run_1")
+    booking = _call("call_1")
+    checkpoint.record_tool_outputs([booking], [_output(booking, {"status": "success"})])
+    checkpoint.resume()
+
+    checkpoint.record_run("thread_1", "run_2")
+    # Same function and arguments under new tool call IDs, keys reordered
+    retry = _call("call_2", arguments='{"positions": [{"itemNo": 1}], "siteCd": "salon"}')
+    again = _call("call_3")
+
+    reused = checkpoint.reusable_outputs([retry, again])
+
+    assert list(reused) == [0]
+    assert reused[0]["tool_call_id"] == "call_2"
+
+
+def test_write_with_other_arguments_is_not_reused():
+    checkpoint = TurnCheckpoint(turn_id=None, mobile_number=SENDER)
+    checkpoint.record_run("thread_1", "run_1")
+    booking = _call("call_1")
+    checkpoint.record_tool_outputs([booking], [_output(booking, {"status": "success"})])
+    checkpoint.resume()
+
+    checkpoint.record_run("thread_1", "run_2")
+    other = _call("call_2", arguments='{"siteCd": "salon", "positions": [{"itemNo": 2}]}')
+
+    assert checkpoint.reusable_outputs([other]) == {}
+
+
+def test_write_calls_filters_out_reads():
+    calls = [
+        _call("call_1", name="getSites", arguments="{}"),
+        _call("call_2"),
+        _call("call_3", name="getProfile", arguments="{}"),
+        _call("call_4", name="cancelAppointment", arguments='{"orderId": 7}'),
+    ]
+    outputs = [_output(call, {"status": "success"}) for call in calls]
+
+    writes, write_outputs = write_calls(calls, outputs)
+
+    assert [call.id for call in writes] == ["call_2", "call_4"]
+    assert [output["tool_call_id"] for output in write_outputs] == ["call_2", "call_4"]
+
+
+def test_discard_and_garbage_collection(db):
+    TurnCheckpoint.load("turn_old", SENDER).record_run("thread_1", "run_1")
+    TurnCheckpoint.load("turn_new", SENDER).record_run("thread_2", "run_2")
+    TurnCheckpoint.load("turn_done", SENDER).record_run("thread_3", "run_3")
+    db.query(TurnCheckpointModel).filter_by(turn_id="turn_old").update(
+        {TurnCheckpointModel.updated_at: datetime.utcnow() - timedelta(hours=25)}
+    )
+    db.commit()
+
+    TurnCheckpoint.discard("turn_done")
+    assert TurnCheckpoint.collect_garbage(max_age_hours=24) == 1
+
+    db.expire_all()
+    assert [row.turn_id for row in db.query(TurnCheckpointModel)] == ["turn_new"]